@@ -0,0 +1,120 @@
+"""
+Helpers shared by the benchmark scripts in this directory. None of this is
+shipped with the concord package.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import resource
+import subprocess
+
+def make_tree(root, num_files, file_size, compressible=True, fanout=100):
+    """ Creates 'num_files' files of 'file_size' bytes under 'root', spread
+    over nested directories holding at most 'fanout' entries each"""
+    rand = random.Random(42)
+    words = ['concord', 'stream', 'operator', 'record', 'kafka', 'mesos']
+    for i in xrange(num_files):
+        parts = []
+        n = i // fanout
+        while n > 0:
+            parts.append('d%d' % (n % fanout))
+            n //= fanout
+        directory = os.path.join(root, *reversed(parts)) if parts else root
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(os.path.join(directory, 'f%d' % i), 'wb') as f:
+            if compressible:
+                line = ' '.join(rand.choice(words) for _ in xrange(12)) + '\n'
+                f.write((line * (file_size // len(line) + 1))[:file_size])
+            else:
+                f.write(os.urandom(file_size))
+
+def peak_rss_bytes():
+    """ Peak resident set size of the current process"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on linux and bytes on OS X
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+def timed(fn, *args, **kwargs):
+    start = time.time()
+    result = fn(*args, **kwargs)
+    return result, time.time() - start
+
+def best_of(repeat, fn, *args):
+    """ Fastest of 'repeat' timed calls of fn(*args)"""
+    return min(timed(fn, *args)[1] for _ in xrange(repeat))
+
+def encode(protocol, thrift_struct):
+    """ Serializes 'thrift_struct' with the thrift protocol class 'protocol'"""
+    from thrift.transport import TTransport
+    transport = TTransport.TMemoryBuffer()
+    thrift_struct.write(protocol(transport))
+    return transport.getvalue()
+
+def decode(protocol, cls, data):
+    """ Reads a 'cls' out of 'data' with the thrift protocol class
+    'protocol'"""
+    from thrift.transport import TTransport
+    thrift_struct = cls()
+    thrift_struct.read(protocol(TTransport.TMemoryBuffer(data)))
+    return thrift_struct
+
+def run_isolated(script, args):
+    """ Runs 'script' in a fresh interpreter so that peak RSS is measured per
+    case. The script is expected to print a single JSON object"""
+    out = subprocess.check_output([sys.executable, script] + args)
+    return json.loads(out.strip().split('\n')[-1])
+
+def print_table(header, rows):
+    widths = [max(len(str(r[i])) for r in [header] + rows)
+              for i in xrange(len(header))]
+    for row in [header] + rows:
+        print '  '.join(str(c).ljust(w) for c, w in zip(row, widths))
+
+def make_topology_metadata(num_computations, tasks_per_computation):
+    """ Synthetic TopologyMetadata shaped like a real cluster's, every task
+    carries a fully populated ExecutorTaskInfoHelper"""
+    from concord.internal.thrift.ttypes import (
+        TopologyMetadata, PhysicalComputationLayout,
+        PhysicalComputationMetadata, ExecutorTaskInfoHelper, StreamMetadata,
+        Endpoint)
+    rand = random.Random(42)
+    computations = {}
+    for c in xrange(num_computations):
+        name = 'computation-%d' % c
+        nodes = []
+        for t in xrange(tasks_per_computation):
+            endpoint = lambda port: Endpoint(ip='10.0.%d.%d' % (c % 256, t % 256),
+                                             port=port)
+            helper = ExecutorTaskInfoHelper(
+                user='concord', frameworkVModule='', scheduler=endpoint(11219),
+                proxy=endpoint(31000 + t), client=endpoint(32000 + t),
+                router=endpoint(33000 + t), execName='run_%s.sh' % name,
+                folder='/var/lib/mesos/slaves/%d' % t,
+                computationAliasName=name,
+                clientArguments=['--kafka-topic', name, '--partitions', '32'],
+                environmentExtra=['GLOG_v=1', 'LD_LIBRARY_PATH=/usr/local/lib'],
+                dockerContainer='concord/runtime:0.3.%d' % (c % 10))
+            nodes.append(PhysicalComputationMetadata(
+                taskId='%s-%08x' % (name, rand.getrandbits(32)),
+                slaveId='20160101-000000-%d-S%d' % (c, t % 64),
+                cpus=0.5, mem=2048, disk=10240, taskHelper=helper,
+                needsReconciliation=rand.random() < 0.01, killed=False))
+        istreams = [StreamMetadata(name='computation-%d' % (c - 1))] if c else []
+        computations[name] = PhysicalComputationLayout(
+            name=name, istreams=istreams, ostreams=[name], nodes=nodes)
+    return TopologyMetadata(version=1, computations=computations,
+                            frameworkID='20160101-000000-0000',
+                            kafkaBrokerList='10.0.0.1:9092,10.0.0.2:9092')
+
+def current_rss_bytes():
+    """ Resident set size right now, falls back to the peak where /proc is
+    missing"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except IOError:
+        return peak_rss_bytes()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Memory held by a large topology once decoded: thrift structs as produced by
+bytes_to_thrift against concord.compact_metadata. Reports resident memory
+kept after the encoded bytes are freed, and the peak while decoding, each
+case in its own process.
+
+    $ python benchmarks/compact_metadata.py --computations 100 --tasks 100
+"""
+
+import gc
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import (make_topology_metadata, peak_rss_bytes, current_rss_bytes,
+                    timed, run_isolated, print_table)
+from concord import thrift_utils
+from concord.compact_metadata import compact_metadata
+from concord.utils import human_readable_units
+from concord.internal.thrift.ttypes import TopologyMetadata
+
+def thrift(data):
+    meta = TopologyMetadata()
+    thrift_utils.bytes_to_thrift(data, meta)
+    return meta
+
+MODES = { 'thrift': thrift, 'compact': compact_metadata }
+
+def run_case(mode, path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    gc.collect()
+    baseline = current_rss_bytes()
+    meta, elapsed = timed(MODES[mode], data)
+    del data
+    gc.collect()
+    tasks = sum(len(c.nodes) for c in meta.computations.values())
+    print json.dumps({ 'seconds': elapsed, 'tasks': tasks,
+                       'retained': current_rss_bytes() - baseline,
+                       'peak': peak_rss_bytes() - baseline })
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--computations', type=int, default=100)
+    parser.add_argument('--tasks', type=int, default=100,
+                        help='Tasks per computation')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.run_case:
+        return run_case(options.run_case, options.path)
+
+    root = tempfile.mkdtemp()
+    try:
+        path = os.path.join(root, 'metadata')
+        with open(path, 'wb') as f:
+            f.write(thrift_utils.thrift_to_bytes(
+                make_topology_metadata(options.computations, options.tasks)))
+        print 'TopologyMetadata of %d tasks, %s encoded' % (
+            options.computations * options.tasks,
+            human_readable_units(os.path.getsize(path)))
+        rows = []
+        for mode in ['thrift', 'compact']:
+            r = run_isolated(__file__, ['--run-case', mode, '--path', path])
+            rows.append([mode, r['tasks'], '%.3fs' % r['seconds'],
+                         human_readable_units(r['retained']),
+                         human_readable_units(r['peak'])])
+        print_table(['model', 'tasks', 'decode time', 'retained', 'peak'],
+                    rows)
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Decodes a large synthetic TopologyMetadata the way each command needs it:
+everything (graph), task ids only (kill --all) and computation names only
+(first prompt of interactive kill). Full decodes go through
+concord.thrift_utils, partial ones through concord.lazy_metadata. Each case
+runs in its own process to measure its peak RSS.
+
+    $ python benchmarks/lazy_metadata.py --computations 40 --tasks 50
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import (make_topology_metadata, peak_rss_bytes, timed,
+                    run_isolated, print_table)
+from concord import thrift_utils, lazy_metadata
+from concord.utils import human_readable_units
+from concord.internal.thrift.ttypes import TopologyMetadata
+
+def full(data):
+    meta = TopologyMetadata()
+    thrift_utils.bytes_to_thrift(data, meta)
+    return [n.taskId for c in meta.computations.values() for n in c.nodes]
+
+def task_ids(data):
+    meta = lazy_metadata.decode_metadata(data, ['taskId'])
+    return [n.taskId for c in meta.computations.values() for n in c.nodes]
+
+def names(data):
+    meta = lazy_metadata.decode_metadata(data, ['taskId', 'cpus', 'mem'])
+    return sorted(meta.computations)
+
+MODES = { 'full': full, 'task_ids': task_ids, 'names': names }
+
+def run_case(mode, path, plain):
+    if plain:
+        thrift_utils.fastbinary = lazy_metadata.fastbinary = None
+    with open(path, 'rb') as f:
+        data = f.read()
+    baseline = peak_rss_bytes()
+    result, elapsed = timed(MODES[mode], data)
+    print json.dumps({ 'seconds': elapsed, 'items': len(result),
+                       'rss': peak_rss_bytes() - baseline })
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--computations', type=int, default=40)
+    parser.add_argument('--tasks', type=int, default=50,
+                        help='Tasks per computation')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    parser.add_argument('--plain', action='store_true', help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.run_case:
+        return run_case(options.run_case, options.path, options.plain)
+
+    root = tempfile.mkdtemp()
+    try:
+        path = os.path.join(root, 'metadata')
+        with open(path, 'wb') as f:
+            f.write(thrift_utils.thrift_to_bytes(
+                make_topology_metadata(options.computations, options.tasks)))
+        print 'TopologyMetadata of %d tasks, %s' % (
+            options.computations * options.tasks,
+            human_readable_units(os.path.getsize(path)))
+        rows = []
+        for plain in [False, True]:
+            for mode in ['full', 'task_ids', 'names']:
+                args = ['--run-case', mode, '--path', path]
+                r = run_isolated(__file__, args + (['--plain'] if plain else []))
+                rows.append([mode, 'python' if plain else 'fastbinary',
+                             r['items'], '%.4fs' % r['seconds'],
+                             human_readable_units(r['rss'])])
+        print_table(['decode', 'codec', 'items', 'time', 'rss growth'], rows)
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == '__main__':
+    main()
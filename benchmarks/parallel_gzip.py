@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Compares tarfile's single threaded "w:gz" against concord.slug.build_slug
+with a varying number of compression workers.
+
+    $ python benchmarks/parallel_gzip.py --files 64 --file-size 4194304
+"""
+
+import os
+import sys
+import gzip
+import shutil
+import tarfile
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import make_tree, timed, print_table
+from concord.utils import human_readable_units
+from concord.compression import cpu_count
+from concord.slug import build_slug
+
+def tarfile_gz(files):
+    handle, tar_name = tempfile.mkstemp(suffix='.tar.gz')
+    os.close(handle)
+    try:
+        with tarfile.open(tar_name, "w:gz") as tar:
+            for name in files:
+                tar.add(name)
+        return os.path.getsize(tar_name)
+    finally:
+        os.remove(tar_name)
+
+def parallel_gz(files, workers):
+    return build_slug(files, workers=workers)
+
+def verify(slug):
+    """ Makes sure what we produced is a valid gzip stream"""
+    try:
+        slug.fileobj.seek(0)
+        with gzip.GzipFile(fileobj=slug.fileobj, mode='rb') as gz:
+            for chunk in iter(lambda: gz.read(1 << 20), ''):
+                pass
+    finally:
+        slug.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=64)
+    parser.add_argument('--file-size', type=int, default=4 << 20)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted(set([1, 2, 4, cpu_count()])))
+    options = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    current_dir = os.getcwd()
+    try:
+        make_tree(os.path.join(root, 'tree'), options.files, options.file_size)
+        os.chdir(root)
+        size, baseline = timed(tarfile_gz, ['tree'])
+        rows = [['tarfile w:gz', '%.2fs' % baseline, '1.00x',
+                 human_readable_units(size)]]
+        for workers in options.workers:
+            slug, elapsed = timed(parallel_gz, ['tree'], workers)
+            size = slug.size
+            verify(slug)
+            rows.append(['parallel x%d' % workers, '%.2fs' % elapsed,
+                         '%.2fx' % (baseline / elapsed),
+                         human_readable_units(size)])
+        print_table(['compressor', 'wall time', 'speedup', 'slug size'], rows)
+    finally:
+        os.chdir(current_dir)
+        shutil.rmtree(root)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+Compares the original temp-file slug path (write tar.gz into the working
+directory, read it back, delete it) against concord.slug.build_slug.
+Reports wall time and peak RSS for each, measured in separate processes.
+
+    $ python benchmarks/slug_build.py --files 200 --file-size 1048576
+"""
+
+import os
+import sys
+import json
+import uuid
+import shutil
+import tarfile
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import make_tree, peak_rss_bytes, timed, run_isolated, print_table
+from concord.utils import human_readable_units
+from concord.slug import build_slug
+
+def legacy_build(files):
+    tar_name = os.path.abspath("concord_slug_" + str(uuid.uuid4()) + ".tar.gz")
+    with tarfile.open(tar_name, "w:gz") as tar:
+        for name in files:
+            tar.add(name)
+    slug = open(tar_name, "rb").read()
+    os.remove(tar_name)
+    return slug
+
+def streaming_build(files):
+    slug = build_slug(files)
+    try:
+        return slug.read()
+    finally:
+        slug.close()
+
+MODES = { 'legacy': legacy_build, 'streaming': streaming_build }
+
+def run_case(mode, root):
+    os.chdir(root)
+    slug, elapsed = timed(MODES[mode], ['tree'])
+    print json.dumps({ 'mode': mode, 'seconds': elapsed, 'size': len(slug),
+                       'peak_rss': peak_rss_bytes() })
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--file-size', type=int, default=1 << 20)
+    parser.add_argument('--incompressible', action='store_true')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    parser.add_argument('--root', help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.run_case:
+        return run_case(options.run_case, options.root)
+
+    root = tempfile.mkdtemp()
+    try:
+        make_tree(os.path.join(root, 'tree'), options.files, options.file_size,
+                  compressible=not options.incompressible)
+        rows = []
+        for mode in sorted(MODES):
+            r = run_isolated(__file__, ['--run-case', mode, '--root', root])
+            rows.append([mode, '%.2fs' % r['seconds'],
+                         human_readable_units(r['size']),
+                         human_readable_units(r['peak_rss'])])
+        print_table(['mode', 'wall time', 'slug size', 'peak rss'], rows)
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == '__main__':
+    main()
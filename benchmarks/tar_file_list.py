@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+Compares the original listdir/flat_map based tar_file_list, which expands
+everything before filtering, against the current pruning walker. The
+synthetic tree mimics an operator checkout: a small source tree next to
+large .git and node_modules directories that are black listed.
+
+    $ python benchmarks/tar_file_list.py --files 200000
+"""
+
+import os
+import re
+import sys
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import make_tree, timed, print_table
+from concord.functional_utils import flat_map, split_predicate
+from concord.deploy import tar_file_list
+
+def legacy_tar_file_list(white_list, black_list):
+    def expand_white_list(path):
+        if os.path.isfile(path):
+            return [path]
+        files, directories = split_predicate(lambda x: os.path.isfile(x), os.listdir(path))
+        return files + flat_map(lambda x: expand_white_list(path + '/' + x), directories)
+
+    white_list = flat_map(lambda x: expand_white_list(x), set(white_list))
+    black_list = map(re.compile, set(black_list))
+
+    def exclude_matches(path):
+        def on_black_list(component):
+            return any(map(lambda x: x.match(component) != None, black_list))
+        path_components = path.split('/')
+        if len(path_components) > 0 and path_components[0] == '.':
+            path_components = path_components[1:-1]
+        return not any(map(on_black_list, path_components))
+
+    return filter(exclude_matches, white_list)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=200000)
+    parser.add_argument('--source-fraction', type=float, default=0.1)
+    options = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    current_dir = os.getcwd()
+    try:
+        source = int(options.files * options.source_fraction)
+        excluded = (options.files - source) // 2
+        print 'Creating %d files...' % options.files
+        make_tree(os.path.join(root, 'op', 'src'), source, 16)
+        make_tree(os.path.join(root, 'op', '.git'), excluded, 16)
+        make_tree(os.path.join(root, 'op', 'node_modules'), excluded, 16)
+        os.chdir(root)
+
+        white_list = ['op']
+        black_list = ['.git', 'node_modules', '.*\\.pyc']
+        legacy, legacy_time = timed(legacy_tar_file_list, white_list,
+                                    black_list)
+        current, current_time = timed(lambda: list(
+            tar_file_list(white_list, black_list)))
+        assert sorted(legacy) == sorted(current)
+        print_table(['implementation', 'wall time', 'files kept'],
+                    [['legacy', '%.2fs' % legacy_time, len(legacy)],
+                     ['scandir walker', '%.2fs' % current_time, len(current)]])
+    finally:
+        os.chdir(current_dir)
+        shutil.rmtree(root)
+
+if __name__ == '__main__':
+    main()
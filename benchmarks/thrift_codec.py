@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Decodes a large synthetic TopologyMetadata and encodes a large
+BoltComputationRequest with TBinaryProtocol and with
+TBinaryProtocolAccelerated, which hands the work to the fastbinary C
+extension. Both produce the same bytes.
+
+Accelerated encoding returns the whole struct as a string before writing
+it, which costs an extra copy of a slug. concord.zero_copy never encodes
+the slug through the protocol so this only matters for its fallback.
+
+    $ python benchmarks/thrift_codec.py --computations 40 --tasks 50
+"""
+
+import os
+import sys
+import copy
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import (make_topology_metadata, print_table, best_of, encode,
+                    decode)
+from concord.utils import human_readable_units
+from concord.internal.thrift.ttypes import (TopologyMetadata,
+                                            BoltComputationRequest)
+from thrift.protocol import TBinaryProtocol
+try:
+    from thrift.protocol import fastbinary
+except ImportError:
+    fastbinary = None
+
+PROTOCOLS = { 'binary': TBinaryProtocol.TBinaryProtocol,
+              'accelerated': TBinaryProtocol.TBinaryProtocolAccelerated }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--computations', type=int, default=40)
+    parser.add_argument('--tasks', type=int, default=50,
+                        help='Tasks per computation')
+    parser.add_argument('--slug-size', type=int, default=64 << 20,
+                        help='Slug of the second request, deploys stream '
+                        'the slug and never encode it this way')
+    parser.add_argument('--args', type=int, default=10000,
+                        help='executorArgs of the request')
+    parser.add_argument('--repeat', type=int, default=5)
+    options = parser.parse_args()
+    if fastbinary is None:
+        print 'fastbinary is not available, accelerated is the same as binary'
+
+    meta = make_topology_metadata(options.computations, options.tasks)
+    data = encode(TBinaryProtocol.TBinaryProtocol, meta)
+    request = BoltComputationRequest(
+        name='benchmark',
+        executorArgs=['--flag-%d=value' % i for i in xrange(options.args)])
+    with_slug = copy.copy(request)
+    with_slug.slug = os.urandom(1 << 20) * (options.slug_size >> 20)
+    encoded_size = lambda s: len(encode(TBinaryProtocol.TBinaryProtocol, s))
+
+    rows = []
+    baseline = {}
+    for name in ['binary', 'accelerated']:
+        protocol = PROTOCOLS[name]
+        assert decode(protocol, TopologyMetadata, data) == meta
+        assert encode(protocol, meta) == data
+        for case, fn, args, size in [
+                ('decode TopologyMetadata', decode, (TopologyMetadata, data),
+                 len(data)),
+                ('encode BoltComputationRequest', encode, (request,),
+                 encoded_size(request)),
+                ('encode BoltComputationRequest with slug', encode,
+                 (with_slug,), encoded_size(with_slug))]:
+            seconds = best_of(options.repeat, fn, protocol, *args)
+            baseline.setdefault(case, seconds)
+            rows.append([case, name, human_readable_units(size),
+                         '%.4fs' % seconds,
+                         '%.1fx' % (baseline[case] / max(seconds, 1e-9))])
+    print_table(['case', 'protocol', 'size', 'best time', 'speedup'], rows)
+
+if __name__ == '__main__':
+    main()
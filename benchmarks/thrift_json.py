@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Renders a large synthetic TopologyMetadata and a BoltComputationRequest
+carrying a slug as JSON, with json.dumps over __dict__ as thrift_to_json
+used to and with concord.thrift_json. The old rendering dumps the slug,
+the new one writes its size and sha256. A real slug is gzip data that
+json.dumps cannot encode at all, the slug here is ascii so that both run.
+
+    $ python benchmarks/thrift_json.py --computations 100 --tasks 100
+"""
+
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import make_topology_metadata, print_table, best_of
+from concord.utils import human_readable_units
+from concord.internal.thrift.ttypes import BoltComputationRequest
+from concord.thrift_json import thrift_to_json, write_json
+
+def dict_json(thrift_struct):
+    return json.dumps(thrift_struct, default=lambda o: o.__dict__,
+                      sort_keys=True, indent=4)
+
+def spec_json(thrift_struct):
+    return thrift_to_json(thrift_struct)
+
+def spec_json_to_file(thrift_struct):
+    with open(os.devnull, 'w') as out:
+        write_json(thrift_struct, out)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--computations', type=int, default=100)
+    parser.add_argument('--tasks', type=int, default=100,
+                        help='Tasks per computation')
+    parser.add_argument('--slug-size', type=int, default=16 << 20)
+    parser.add_argument('--repeat', type=int, default=3)
+    options = parser.parse_args()
+
+    meta = make_topology_metadata(options.computations, options.tasks)
+    request = BoltComputationRequest(name='benchmark', instances=1,
+                                     slug='x' * options.slug_size)
+    rows = []
+    for case, thrift_struct in [('TopologyMetadata', meta),
+                                ('BoltComputationRequest', request)]:
+        baseline = None
+        for name, fn in [('json.dumps __dict__', dict_json),
+                         ('thrift_to_json', spec_json),
+                         ('write_json', spec_json_to_file)]:
+            seconds = best_of(options.repeat, fn, thrift_struct)
+            baseline = baseline or seconds
+            output = fn(thrift_struct)
+            rows.append([case, name,
+                         human_readable_units(len(output)) if output else '-',
+                         '%.4fs' % seconds,
+                         '%.1fx' % (baseline / max(seconds, 1e-9))])
+    print_table(['case', 'encoder', 'output', 'best time', 'speedup'], rows)
+
+if __name__ == '__main__':
+    main()
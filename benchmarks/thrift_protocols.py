@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""
+Compares the protocols the cli can speak to the scheduler, see
+thrift_utils.PROTOCOLS. For each: encoded size and encode/decode time of a
+typical deploy request and of a large TopologyMetadata, then round trips of
+killTask and deployComputation to a scheduler stub on the loopback
+interface, with the slug streamed by concord.zero_copy.
+
+TCompactProtocol has no C extension in this thrift, it trades CPU for bytes
+and only pays off where the network, not the cli, is the bottleneck.
+
+    $ python benchmarks/thrift_protocols.py --computations 40 --tasks 50
+"""
+
+import os
+import sys
+import socket
+import argparse
+import threading
+from StringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import (make_topology_metadata, print_table, best_of, encode,
+                    decode)
+from concord.utils import human_readable_units
+from concord.internal.thrift.ttypes import (TopologyMetadata,
+                                            BoltComputationRequest,
+                                            ExecutorTaskInfoHelper, Endpoint)
+from concord.internal.thrift import BoltSchedulerService
+from concord.thrift_utils import protocol_class, open_sched_service_client
+from concord import zero_copy
+from thrift.transport import TSocket, TTransport
+
+PROTOCOLS = ['binary', 'accelerated', 'compact']
+
+class Slug(object):
+    """ The parts of concord.slug.Slug zero_copy reads"""
+    def __init__(self, data):
+        self.data = data
+        self.size = len(data)
+
+    def chunks(self, chunk_size):
+        stream = StringIO(self.data)
+        return iter(lambda: stream.read(chunk_size), '')
+
+class Handler(object):
+    def killTask(self, task_id):
+        pass
+
+    def deployComputation(self, request):
+        pass
+
+def serve(protocol):
+    """ Starts a scheduler stub speaking 'protocol', returns its port"""
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(5)
+    processor = BoltSchedulerService.Processor(Handler())
+    def loop():
+        while True:
+            conn, _ = sock.accept()
+            trans = TSocket.TSocket()
+            trans.handle = conn
+            proto = protocol_class(protocol)(TTransport.TFramedTransport(trans))
+            try:
+                while True:
+                    processor.process(proto, proto)
+            except Exception:
+                conn.close()
+    thread = threading.Thread(target=loop)
+    thread.daemon = True
+    thread.start()
+    return sock.getsockname()[1]
+
+def deploy_request(num_args):
+    endpoint = Endpoint(ip='10.0.0.1', port=11219)
+    return BoltComputationRequest(
+        name='word-counter', instances=4, cpus=0.5, mem=2048, disk=10240,
+        taskHelper=ExecutorTaskInfoHelper(
+            user='concord', scheduler=endpoint, proxy=endpoint,
+            client=endpoint, router=endpoint, execName='run.sh',
+            folder='word-counter', computationAliasName='word-counter',
+            clientArguments=['--kafka-topic=words-%d' % i
+                             for i in xrange(num_args)],
+            environmentExtra=['GLOG_v=1'], dockerContainer=''))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--computations', type=int, default=40)
+    parser.add_argument('--tasks', type=int, default=50,
+                        help='Tasks per computation')
+    parser.add_argument('--args', type=int, default=20,
+                        help='clientArguments of the deploy request')
+    parser.add_argument('--slug-size', type=int, default=8 << 20)
+    parser.add_argument('--calls', type=int, default=200,
+                        help='killTask round trips timed')
+    parser.add_argument('--repeat', type=int, default=5)
+    options = parser.parse_args()
+
+    payloads = [('BoltComputationRequest', deploy_request(options.args)),
+                ('TopologyMetadata', make_topology_metadata(
+                    options.computations, options.tasks))]
+    rows = []
+    for case, thrift_struct in payloads:
+        for name in PROTOCOLS:
+            protocol = protocol_class(name)
+            data = encode(protocol, thrift_struct)
+            assert decode(protocol, thrift_struct.__class__, data) == \
+                thrift_struct
+            rows.append([case, name, human_readable_units(len(data)),
+                         '%.4fs' % best_of(options.repeat, encode, protocol,
+                                           thrift_struct),
+                         '%.4fs' % best_of(options.repeat, decode, protocol,
+                                           thrift_struct.__class__, data)])
+    print_table(['payload', 'protocol', 'size', 'encode', 'decode'], rows)
+    print
+
+    slug = Slug(os.urandom(options.slug_size))
+    rows = []
+    for protocol in PROTOCOLS:
+        cli, sock = open_sched_service_client('127.0.0.1', serve(protocol),
+                                              protocol=protocol)
+        def kills():
+            for i in xrange(options.calls):
+                cli.killTask('task-%d' % i)
+        kill_seconds = best_of(options.repeat, kills) / options.calls
+        request = deploy_request(options.args)
+        deploy_seconds = best_of(options.repeat,
+                                 lambda: zero_copy.deploy_computation(
+                                     cli, request, slug, sock=sock))
+        cli._oprot.trans.close()
+        rows.append([protocol, '%.1fus' % (kill_seconds * 1e6),
+                     '%.4fs' % deploy_seconds])
+    print_table(['protocol', 'killTask round trip',
+                 'deployComputation, %s slug' %
+                 human_readable_units(slug.size)], rows)
+
+if __name__ == '__main__':
+    main()
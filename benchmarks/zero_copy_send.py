@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Sends a deployComputation call carrying a slug of the given size over a
+local socket. Compares the regular client call, which needs the slug as a
+string, with concord.zero_copy. Reports wall time and peak RSS for each,
+measured in separate processes.
+
+    $ python benchmarks/zero_copy_send.py --size 268435456
+"""
+
+import os
+import sys
+import json
+import socket
+import shutil
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import peak_rss_bytes, timed, run_isolated, print_table
+from concord.utils import human_readable_units
+from concord.slug import Slug
+from concord import zero_copy
+from concord.internal.thrift import BoltSchedulerService
+from concord.internal.thrift.ttypes import BoltComputationRequest
+from thrift.protocol import TBinaryProtocol
+from thrift.transport import TSocket, TTransport
+
+def drain(conn, counter):
+    while True:
+        data = conn.recv(1 << 20)
+        if not data:
+            return
+        counter[0] += len(data)
+
+def connected_client():
+    """ Client whose socket is drained by a background thread"""
+    ours, theirs = socket.socketpair()
+    counter = [0]
+    thread = threading.Thread(target=drain, args=(theirs, counter))
+    thread.daemon = True
+    thread.start()
+    sock = TSocket.TSocket()
+    sock.handle = ours
+    cli = BoltSchedulerService.Client(TBinaryProtocol.TBinaryProtocol(
+        TTransport.TFramedTransport(sock)))
+    return cli, sock, ours, thread, counter
+
+def legacy_send(cli, sock, slug):
+    req = BoltComputationRequest(name='benchmark')
+    req.slug = slug.read()
+    cli.send_deployComputation(req)
+
+def zero_copy_send(cli, sock, slug):
+    req = BoltComputationRequest(name='benchmark')
+    # Same as zero_copy.deploy_computation minus waiting for a reply
+    zero_copy.send_deploy_computation(cli, req, slug, sock=sock)
+
+MODES = { 'legacy': legacy_send, 'zero_copy': zero_copy_send }
+
+def run_case(mode, path):
+    slug = Slug(open(path, 'rb'), os.path.getsize(path), 0)
+    cli, sock, ours, thread, counter = connected_client()
+    _, elapsed = timed(MODES[mode], cli, sock, slug)
+    ours.shutdown(socket.SHUT_WR)
+    thread.join()
+    print json.dumps({ 'mode': mode, 'seconds': elapsed, 'sent': counter[0],
+                       'peak_rss': peak_rss_bytes() })
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=256 << 20)
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.run_case:
+        return run_case(options.run_case, options.path)
+
+    root = tempfile.mkdtemp()
+    try:
+        path = os.path.join(root, 'slug')
+        with open(path, 'wb') as f:
+            for _ in xrange(0, options.size, 1 << 20):
+                f.write(os.urandom(1 << 20))
+        rows = []
+        for mode in sorted(MODES):
+            r = run_isolated(__file__, ['--run-case', mode, '--path', path])
+            rows.append([mode, '%.2fs' % r['seconds'],
+                         human_readable_units(r['sent']),
+                         human_readable_units(r['peak_rss'])])
+        print_table(['mode', 'wall time', 'bytes sent', 'peak rss'], rows)
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == '__main__':
+    main()
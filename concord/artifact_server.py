@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+"""
+Publishes slugs to an HTTP location so that deploy requests only carry
+their URL. Executors download the slug themselves, in parallel, instead of
+the scheduler holding and redistributing the bytes.
+
+Any server accepting PUT and serving the files back with GET works as the
+manifest 'fetch_url'. A minimal one is included for testing:
+
+    concord artifacts --port 8000 --dir /tmp/slugs
+"""
+
+import os
+import hashlib
+import urllib2
+import argparse
+import tempfile
+import threading
+import BaseHTTPServer
+import SimpleHTTPServer
+from SocketServer import ThreadingMixIn
+from concord.compression import CODECS
+from concord.utils import build_logger, concord_home_path, human_readable_units
+
+logger = build_logger('cmd.artifact_server')
+
+# Expected digest of an upload, checked by the server before storing it
+DIGEST_HEADER = 'X-Concord-Slug-Digest'
+COPY_CHUNK = 1024 * 1024
+DEFAULT_PORT = 8000
+
+def artifact_name(slug):
+    """ Slugs are stored under their digest, so an upload never replaces
+    what an executor may be downloading"""
+    return slug.digest.split(':', 1)[1] + CODECS[slug.codec].extension
+
+def slug_url(base_url, slug):
+    return base_url.rstrip('/') + '/' + artifact_name(slug)
+
+class _Request(urllib2.Request):
+    def __init__(self, url, method, data=None, headers={}):
+        urllib2.Request.__init__(self, url, data, headers)
+        self.method = method
+
+    def get_method(self):
+        return self.method
+
+def artifact_exists(url, size):
+    """ Whether 'url' already holds 'size' bytes, any error counts as no"""
+    try:
+        response = urllib2.urlopen(_Request(url, 'HEAD'))
+        return int(response.info().getheader('Content-Length', -1)) == size
+    except (urllib2.URLError, ValueError):
+        return False
+
+def publish_slug(base_url, slug):
+    """ PUTs 'slug' under 'base_url' unless it is already there and returns
+    the URL executors should fetch it from. The body is streamed from the
+    slug file, it is never read into memory as a whole"""
+    url = slug_url(base_url, slug)
+    if artifact_exists(url, slug.size):
+        logger.info("Slug already published at %s", url)
+        return url
+    logger.info("Uploading %s slug to %s", human_readable_units(slug.size), url)
+    slug.fileobj.seek(0)
+    request = _Request(url, 'PUT', slug.fileobj,
+                       { 'Content-Length': str(slug.size),
+                         'Content-Type': 'application/octet-stream',
+                         DIGEST_HEADER: slug.digest })
+    try:
+        urllib2.urlopen(request).close()
+    finally:
+        slug.fileobj.seek(0)
+    return url
+
+class ArtifactHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
+    """ Serves the files of a single flat directory and stores PUT bodies
+    into it. Uploads land in a temporary file and are renamed into place
+    once complete, GETs never see a partial slug"""
+    def translate_path(self, path):
+        name = self.artifact()
+        directory = self.server.directory
+        return directory if name is None else os.path.join(directory, name)
+
+    def artifact(self):
+        name = self.path.split('?', 1)[0].split('#', 1)[0].strip('/')
+        if name == '' or '/' in name or name.startswith('.'):
+            return None
+        return name
+
+    def do_PUT(self):
+        name = self.artifact()
+        if name is None:
+            self.send_error(400, "Artifacts are stored at the root")
+            return
+        length = int(self.headers.getheader('Content-Length', -1))
+        if length < 0:
+            self.send_error(411)
+            return
+        handle, tmp_path = tempfile.mkstemp(dir=self.server.directory,
+                                            prefix='.upload_')
+        digest = hashlib.sha256()
+        error = None
+        try:
+            with os.fdopen(handle, 'wb') as out:
+                remaining = length
+                while remaining > 0:
+                    chunk = self.rfile.read(min(COPY_CHUNK, remaining))
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+                    remaining -= len(chunk)
+            expected = self.headers.getheader(DIGEST_HEADER)
+            if remaining > 0:
+                error = "Upload truncated"
+            elif expected and expected != 'sha256:' + digest.hexdigest():
+                error = "Digest mismatch"
+            else:
+                # mkstemp creates the file 0600, artifacts are served to
+                # whoever can read the directory
+                os.chmod(tmp_path, 0644)
+                os.rename(tmp_path, os.path.join(self.server.directory, name))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        # Only answer once the temporary file is gone
+        if error is not None:
+            self.send_error(400, error)
+        else:
+            self.send_response(201)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    def log_message(self, fmt, *args):
+        logger.debug("%s %s", self.address_string(), fmt % args)
+
+class ArtifactServer(ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, directory):
+        BaseHTTPServer.HTTPServer.__init__(self, address, ArtifactHandler)
+        self.directory = os.path.abspath(directory)
+
+def start_server(directory, host='', port=0):
+    """ Serves 'directory' from a background thread, port 0 picks a free
+    one. Returns the server, call shutdown() to stop it"""
+    server = ArtifactServer((host, port), directory)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+def generate_options():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-p", "--port", type=int, default=DEFAULT_PORT,
+                        help="Port to listen on")
+    parser.add_argument("-b", "--bind", default="",
+                        help="Address to listen on, all interfaces by default")
+    parser.add_argument("-d", "--dir", dest="directory",
+                        help="Directory holding the slugs, defaults to "
+                        "~/.concord/artifacts")
+    return parser
+
+def main():
+    parser = generate_options()
+    options = parser.parse_args()
+    directory = options.directory or \
+        os.path.dirname(concord_home_path('artifacts', 'x'))
+    if not os.path.isdir(directory):
+        parser.error("Not a directory: " + directory)
+    server = ArtifactServer((options.bind, options.port), directory)
+    logger.info("Serving %s on port %d, use 'fetch_url': "
+                "'http://<this host>:%d/' in deploy manifests", directory,
+                server.server_address[1], server.server_address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Kills many tasks at once. Kills run on a bounded pool of threads, each with
+its own scheduler connection taken from a SchedulerPool, optionally capped to
+a number of kills per second so a large topology does not flood the
+scheduler. Every task gets its own result, a failed kill never stops the
+others:
+
+    results = kill_tasks(pool, 'localhost:2181', '/concord', task_ids)
+    print results_table(results)
+"""
+
+import sys
+import time
+import threading
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+from terminaltables import AsciiTable
+from concord.scheduler_client import RETRYABLE_ERRORS
+from concord.utils import build_logger
+
+logger = build_logger('cmd.bulk_kill')
+
+DEFAULT_CONCURRENCY = 16
+
+# 'error' is None when the kill went through, 'attempts' counts retries on
+# connection failures
+KillResult = namedtuple('KillResult',
+                        ['task_id', 'error', 'attempts', 'seconds'])
+
+class RateLimiter(object):
+    """ Spaces calls to acquire() at least 1/'rate' seconds apart, across
+    threads"""
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.lock = threading.Lock()
+        self.next = 0
+
+    def acquire(self):
+        with self.lock:
+            now = time.time()
+            at = max(now, self.next)
+            self.next = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+def describe(error):
+    """ BoltError and thrift exceptions keep their text in attributes, str()
+    of a TTransportException without a message is 'None'"""
+    text = getattr(error, 'reason', None) or getattr(error, 'message', None) \
+        or str(error)
+    if text in ('', 'None'):
+        return error.__class__.__name__
+    return "%s: %s" % (error.__class__.__name__, text)
+
+def kill_tasks(pool, zkurl, zkpath, task_ids, concurrency=DEFAULT_CONCURRENCY,
+               rate=None):
+    """ Sends killTask for every id in 'task_ids' using clients of the
+    SchedulerPool 'pool', at most 'concurrency' at a time and 'rate' per
+    second when given. Returns a KillResult per task, in order"""
+    limiter = RateLimiter(rate) if rate else None
+    done = [0]
+    lock = threading.Lock()
+
+    def kill_one(task_id):
+        if limiter is not None:
+            limiter.acquire()
+        start = time.time()
+        error = None
+        attempts = 0
+        try:
+            cli = pool.acquire(zkurl, zkpath)
+        except Exception as e:
+            cli, error = None, e
+        if cli is not None:
+            try:
+                cli.killTask(task_id)
+            except Exception as e:
+                error = e
+            # Read before the client goes back to the pool, another thread
+            # may take it and start a call of its own
+            attempts = cli.attempts
+        elapsed = time.time() - start
+        if cli is not None:
+            # The client closed itself when the connection broke, errors
+            # from the scheduler leave it usable
+            pool.release(zkurl, zkpath, cli,
+                         not isinstance(error, RETRYABLE_ERRORS))
+        with lock:
+            done[0] += 1
+            count = done[0]
+        if error is None:
+            logger.info("Killed task %s (%d/%d)", task_id, count,
+                        len(task_ids))
+        else:
+            logger.error("Could not kill task %s (%d/%d): %s", task_id, count,
+                         len(task_ids), describe(error))
+        return KillResult(task_id, None if error is None else describe(error),
+                          attempts, elapsed)
+
+    if len(task_ids) == 0:
+        return []
+    workers = ThreadPool(max(1, min(concurrency, len(task_ids))))
+    try:
+        # A timeout so that ctrl-c reaches the main thread
+        return workers.map_async(kill_one, task_ids).get(sys.maxint)
+    finally:
+        workers.close()
+        workers.join()
+
+def failed(results):
+    return [r for r in results if r.error is not None]
+
+def results_table(results):
+    table = [["Task id", "Attempts", "Time", "Result"]]
+    for result in results:
+        table.append([result.task_id, str(result.attempts),
+                      "%.2fs" % result.seconds,
+                      "OK" if result.error is None else
+                      "FAILED: %s" % result.error])
+    errors = len(failed(results))
+    return "%s\nKilled %d of %d tasks, %d failed" % (
+        AsciiTable(table).table, len(results) - errors, len(results), errors)
+
+def results_json(results):
+    return [dict(r._asdict(), ok=r.error is None) for r in results]
@@ -0,0 +1,149 @@
+"""
+Compact, read-only copy of a TopologyMetadata for commands that hold a large
+topology in memory. Thrift structs carry a __dict__ each and a copy of every
+string they were decoded from; here records use __slots__, strings are
+interned and equal endpoints, streams and argument lists are one shared
+tuple. Attribute names are those of the thrift structs so code reading
+either works unchanged:
+
+    meta = compact_metadata(data)
+    meta.computations['word-counter'].nodes[0].taskHelper.client.ip
+"""
+
+from collections import namedtuple
+from concord.lazy_metadata import decode_metadata
+
+Endpoint = namedtuple('Endpoint', ['ip', 'port'])
+StreamMetadata = namedtuple('StreamMetadata', ['name', 'grouping'])
+
+class _Record(object):
+    """ Immutable record, fields are set once by the constructor"""
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        set_field, get = object.__setattr__, fields.get
+        for name in self.__slots__:
+            set_field(self, name, get(name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is read-only" % self.__class__.__name__)
+
+    def __eq__(self, other):
+        return self.__class__ is other.__class__ and \
+            all(getattr(self, n) == getattr(other, n) for n in self.__slots__)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, ', '.join(
+            '%s=%r' % (n, getattr(self, n)) for n in self.__slots__))
+
+class TaskHelper(_Record):
+    __slots__ = ('frameworkLoggingLevel', 'user', 'frameworkVModule',
+                 'scheduler', 'proxy', 'client', 'execName', 'folder',
+                 'computationAliasName', 'clientArguments', 'environmentExtra',
+                 'dockerContainer', 'retries', 'router')
+
+class Task(_Record):
+    __slots__ = ('taskId', 'slaveId', 'cpus', 'mem', 'disk', 'taskHelper',
+                 'needsReconciliation', 'killed')
+
+class Computation(_Record):
+    __slots__ = ('name', 'istreams', 'ostreams', 'nodes')
+
+class Metadata(_Record):
+    __slots__ = ('version', 'computations', 'frameworkID', 'kafkaBrokerList')
+
+class Interner(object):
+    """ Hands out one shared instance per distinct string, tuple or record
+    value. Thrift decodes strings as str, which intern() accepts"""
+    def __init__(self):
+        self.values = {}
+        self.endpoints = {}
+
+    def string(self, value):
+        return None if value is None else intern(value)
+
+    def shared(self, value):
+        # Keyed by type too, namedtuples compare equal to plain tuples
+        return self.values.setdefault((type(value), value), value)
+
+    def strings(self, values):
+        if values is None:
+            return None
+        return self.shared(tuple(map(intern, values)))
+
+    def endpoint(self, endpoint):
+        if endpoint is None:
+            return None
+        key = (endpoint.ip, endpoint.port)
+        shared = self.endpoints.get(key)
+        if shared is None:
+            shared = Endpoint(self.string(endpoint.ip), endpoint.port)
+            self.endpoints[key] = shared
+        return shared
+
+    def stream(self, stream):
+        return self.shared(StreamMetadata(self.string(stream.name),
+                                          stream.grouping))
+
+def _task_helper(helper, interner):
+    if helper is None:
+        return None
+    return TaskHelper(
+        frameworkLoggingLevel=helper.frameworkLoggingLevel,
+        user=interner.string(helper.user),
+        frameworkVModule=interner.string(helper.frameworkVModule),
+        scheduler=interner.endpoint(helper.scheduler),
+        proxy=interner.endpoint(helper.proxy),
+        client=interner.endpoint(helper.client),
+        execName=interner.string(helper.execName),
+        folder=interner.string(helper.folder),
+        computationAliasName=interner.string(helper.computationAliasName),
+        clientArguments=interner.strings(helper.clientArguments),
+        environmentExtra=interner.strings(helper.environmentExtra),
+        dockerContainer=interner.string(helper.dockerContainer),
+        retries=helper.retries,
+        router=interner.endpoint(helper.router))
+
+def _task(node, interner):
+    return Task(taskId=interner.string(node.taskId),
+                slaveId=interner.string(node.slaveId),
+                cpus=node.cpus, mem=node.mem, disk=node.disk,
+                taskHelper=_task_helper(node.taskHelper, interner),
+                needsReconciliation=node.needsReconciliation,
+                killed=node.killed)
+
+def _computation(layout, interner):
+    return Computation(
+        name=interner.string(layout.name),
+        istreams=tuple(interner.stream(s) for s in layout.istreams or []),
+        ostreams=interner.strings(layout.ostreams or []),
+        nodes=tuple(_task(n, interner) for n in layout.nodes or []))
+
+def _metadata(meta, computations):
+    return Metadata(version=meta.version, computations=computations,
+                    frameworkID=meta.frameworkID,
+                    kafkaBrokerList=meta.kafkaBrokerList)
+
+def compact(meta):
+    """ Compact copy of the decoded TopologyMetadata 'meta'"""
+    if meta is None:
+        return None
+    interner = Interner()
+    return _metadata(meta, dict(
+        (interner.string(name), _computation(layout, interner))
+        for name, layout in (meta.computations or {}).iteritems()))
+
+def compact_metadata(data):
+    """ Compact metadata straight from the znode contents 'data'. The nodes
+    of one computation are decoded at a time and dropped once converted, the
+    full thrift tree is never held in memory"""
+    meta = decode_metadata(data)
+    interner = Interner()
+    computations = {}
+    while meta.computations:
+        name, layout = meta.computations.popitem()
+        computations[interner.string(name)] = _computation(layout, interner)
+    return _metadata(meta, computations)
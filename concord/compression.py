@@ -0,0 +1,288 @@
+"""
+Compression codecs used to build slugs. gzip and none are always available,
+xz, zstd and lz4 are used when their python bindings are installed.
+"""
+
+import gzip
+import time
+import zlib
+import struct
+import multiprocessing
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4frame
+except ImportError:
+    lz4frame = None
+
+# Amount of uncompressed input handed to each worker at a time
+BLOCK_SIZE = 1024 * 1024
+DEFAULT_LEVEL = 6
+
+def cpu_count():
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+def _deflate_block(block, level, last):
+    """ Raw deflate of one block. Every block but the last ends with a sync
+    flush so that the outputs can simply be concatenated"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(block) + \
+        compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+class ParallelGzipWriter(object):
+    """ Write only file object that gzips its input on a pool of threads,
+    the same way pigz does. Input is cut into fixed size blocks which are
+    deflated independently and stitched back together in order as a single
+    gzip member. zlib releases the GIL so threads scale across cores.
+    close() must be called to write the gzip trailer, it does not close the
+    underlying file object"""
+    def __init__(self, fileobj, workers=None, level=DEFAULT_LEVEL,
+                 block_size=BLOCK_SIZE, mtime=0):
+        self.fileobj = fileobj
+        self.level = level
+        self.block_size = block_size
+        self.workers = workers or cpu_count()
+        # A single worker deflates in the calling thread
+        self.pool = ThreadPool(self.workers) if self.workers > 1 else None
+        # Bounds memory to a couple of blocks per worker
+        self.max_pending = self.workers * 2
+        self.pending = deque()
+        self.buf = []
+        self.buffered = 0
+        self.crc = zlib.crc32('')
+        self.size = 0
+        self.closed = False
+        self.fileobj.write('\037\213\010\000' + struct.pack('<L', mtime) +
+                           '\000\377')
+
+    def write(self, data):
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        self.buf.append(data)
+        self.buffered += len(data)
+        while self.buffered >= self.block_size:
+            data = ''.join(self.buf)
+            self.buf = [data[self.block_size:]]
+            self.buffered = len(self.buf[0])
+            self._submit(data[:self.block_size], False)
+
+    def _submit(self, block, last):
+        if self.pool is None:
+            self.fileobj.write(_deflate_block(block, self.level, last))
+            return
+        self.pending.append(self.pool.apply_async(
+            _deflate_block, (block, self.level, last)))
+        while len(self.pending) > self.max_pending:
+            self.fileobj.write(self.pending.popleft().get())
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._submit(''.join(self.buf), True)
+            while self.pending:
+                self.fileobj.write(self.pending.popleft().get())
+            self.fileobj.write(struct.pack('<LL', self.crc & 0xffffffffL,
+                                           self.size & 0xffffffffL))
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+class StreamWriter(object):
+    """ Adapts a compressor object (compress/flush) to a write only file
+    object. Like ParallelGzipWriter, close() leaves 'fileobj' open"""
+    def __init__(self, fileobj, compressor, header=''):
+        self.fileobj = fileobj
+        self.compressor = compressor
+        self.closed = False
+        if header:
+            self.fileobj.write(header)
+
+    def write(self, data):
+        out = self.compressor.compress(data)
+        if out:
+            self.fileobj.write(out)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.fileobj.write(self.compressor.flush())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+class _Passthrough(object):
+    def compress(self, data):
+        return data
+
+    def flush(self):
+        return ''
+
+def _none_writer(fileobj, level, workers, mtime, deterministic):
+    return StreamWriter(fileobj, _Passthrough())
+
+def _gzip_writer(fileobj, level, workers, mtime, deterministic):
+    # With one worker the pool is only overhead, plain gzip is used unless
+    # the output must match the one built with several workers
+    if (workers or cpu_count()) == 1 and not deterministic:
+        return gzip.GzipFile(filename='', mode='wb', compresslevel=level,
+                             fileobj=fileobj, mtime=mtime)
+    return ParallelGzipWriter(fileobj, workers, level, mtime=mtime)
+
+def _xz_writer(fileobj, level, workers, mtime, deterministic):
+    return StreamWriter(fileobj, lzma.LZMACompressor(preset=level))
+
+# zstd always takes its multi threaded path, even with a single worker, so
+# that the output does not depend on the number of workers
+def _zstd_writer(fileobj, level, workers, mtime, deterministic):
+    return StreamWriter(fileobj, zstandard.ZstdCompressor(
+        level=level, threads=workers or cpu_count()).compressobj())
+
+def _lz4_writer(fileobj, level, workers, mtime, deterministic):
+    compressor = lz4frame.LZ4FrameCompressor(compression_level=level)
+    return StreamWriter(fileobj, compressor, header=compressor.begin())
+
+class Codec(object):
+    def __init__(self, name, extension, levels, default_level, writer,
+                 available, parallel, module):
+        self.name = name
+        self.extension = extension
+        self.levels = levels
+        self.default_level = default_level
+        self.writer = writer
+        self.available = available
+        # Whether the codec spreads work across the compress_workers
+        self.parallel = parallel
+        # Python package needed when not available
+        self.module = module
+
+CODECS = dict((c.name, c) for c in [
+    Codec('none', '.tar', [0], 0, _none_writer, True, False, None),
+    Codec('gzip', '.tar.gz', range(1, 10), DEFAULT_LEVEL, _gzip_writer,
+          True, True, None),
+    Codec('xz', '.tar.xz', range(0, 10), 6, _xz_writer,
+          lzma is not None, False, 'backports.lzma'),
+    Codec('zstd', '.tar.zst', range(1, 23), 3, _zstd_writer,
+          zstandard is not None, True, 'zstandard'),
+    Codec('lz4', '.tar.lz4', range(0, 17), 0, _lz4_writer,
+          lz4frame is not None, False, 'lz4')])
+
+DEFAULT_CODEC = 'gzip'
+AUTO = 'auto'
+
+def parse_codec(spec):
+    """ Parses 'name' or 'name:level', i.e. 'gzip:9'. Raises ValueError
+    when the codec is unknown, not installed or the level is out of range"""
+    name, _, level = str(spec).partition(':')
+    if name == AUTO and level == '':
+        return (AUTO, None)
+    if name not in CODECS:
+        raise ValueError("Unknown compression codec '%s', valid codecs are: %s"
+                         % (name, ", ".join(sorted(CODECS.keys() + [AUTO]))))
+    codec = CODECS[name]
+    if not codec.available:
+        raise ValueError("Compression codec '%s' requires the python package"
+                         " '%s'" % (name, codec.module))
+    if level == '':
+        return (name, codec.default_level)
+    if not level.isdigit() or int(level) not in codec.levels:
+        raise ValueError("Compression level for '%s' must be in %d..%d" %
+                         (name, codec.levels[0], codec.levels[-1]))
+    return (name, int(level))
+
+def open_writer(fileobj, name, level, workers=1, mtime=0, deterministic=False):
+    """ Returns a write only file object compressing into 'fileobj'. A
+    'deterministic' writer gives the same output whatever the number of
+    workers"""
+    return CODECS[name].writer(fileobj, level, workers, mtime, deterministic)
+
+# Candidates tried by choose_codec, cheap to expensive
+AUTO_CANDIDATES = ['none', 'lz4', 'zstd:1', 'zstd:3', 'gzip:1', 'gzip:6',
+                   'xz:6']
+SAMPLE_BYTES = 4 * 1024 * 1024
+SAMPLE_FILES = 64
+
+def sample_files(files):
+    """ Reads the beginning of up to SAMPLE_FILES files, evenly spread over
+    the list, until SAMPLE_BYTES have been collected"""
+    if len(files) == 0:
+        return ''
+    step = max(1, len(files) // SAMPLE_FILES)
+    picked = files[::step][:SAMPLE_FILES]
+    per_file = max(4096, SAMPLE_BYTES // len(picked))
+    chunks = []
+    for path in picked:
+        with open(path, 'rb') as f:
+            chunks.append(f.read(per_file))
+    return ''.join(chunks)
+
+class _Sink(object):
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+
+def choose_codec(files, sizes, bandwidth, workers=1):
+    """ Compresses a sample of 'files' with every available candidate and
+    returns the (name, level) that minimises compress time plus transfer
+    time of the whole slug at 'bandwidth' bytes per second"""
+    sample = sample_files(files)
+    total = float(sum(sizes))
+    if len(sample) == 0 or total == 0:
+        return (DEFAULT_CODEC, CODECS[DEFAULT_CODEC].default_level)
+
+    workers = workers or cpu_count()
+    best = None
+    for spec in AUTO_CANDIDATES:
+        name, _, level = spec.partition(':')
+        codec = CODECS[name]
+        if not codec.available:
+            continue
+        level = int(level) if level else codec.default_level
+        sink = _Sink()
+        start = time.time()
+        # Single threaded on purpose, scaled by workers below
+        with open_writer(sink, name, level) as writer:
+            writer.write(sample)
+        elapsed = max(time.time() - start, 1e-6)
+        speed = len(sample) / elapsed * (workers if codec.parallel else 1)
+        ratio = sink.size / float(len(sample))
+        estimate = total / speed + total * ratio / bandwidth
+        if best is None or estimate < best[0]:
+            best = (estimate, name, level)
+    return best[1:]
@@ -3,6 +3,7 @@ import os #environ
 import sys
 import concord.kill_task, concord.print_graph, concord.runway
 import concord.marathon, concord.deploy, concord.config
+import concord.artifact_server
 from concord import constants
 from argparse import ArgumentParser
 from pkg_resources import resource_string
@@ -17,7 +18,8 @@ SUBPROGRAMS = {
     'kill': concord.kill_task.main,
     'graph': concord.print_graph.main,
     'marathon': concord.marathon.main,
-    'deploy': concord.deploy.main    
+    'deploy': concord.deploy.main,
+    'artifacts': concord.artifact_server.main
 }
 
 def generate_options():
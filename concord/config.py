@@ -55,6 +55,7 @@ def write_defaults(new_defaults, current, writepath):
     if new_defaults is not None:
         if not validate_config_params(new_defaults):
             raise Exception("Attempting to set unrecognized parameter")
+        validate_config(new_defaults, 'the new settings')
         current.update(new_defaults)
 
     with open(writepath , 'w') as outfile:
@@ -99,10 +100,13 @@ def main():
         fetch_config(os.getcwd(), show)
     else:
         argsdict = pairs_todict(options.parameters)
-        if options.which == 'init':
-            init(options.config, argsdict)
-        elif options.which == 'set':
-            fetch_config(os.getcwd(), partial(write_defaults, argsdict))
+        try:
+            if options.which == 'init':
+                init(options.config, argsdict)
+            elif options.which == 'set':
+                fetch_config(os.getcwd(), partial(write_defaults, argsdict))
+        except ValueError as e:
+            parser.error(str(e))
 
 if __name__ == '__main__':
     main()
@@ -15,6 +15,7 @@ POSITIONAL = """
   graph\t\tCreate a graphical representation of the current topology
   marathon\tCreate a marathon application from given parameters
   config\tSet global CLI defaults
+  artifacts\tServe slugs over HTTP for deploys using fetch_url
 """
 
 USAGE = BASE_USAGE + POSITIONAL
@@ -30,4 +31,7 @@ def dcos_config_data():
     config_data = {}
     config_data['zookeeper_hosts'] = util.get_config().get('concord.zookeeper_hosts')
     config_data['zookeeper_path'] = util.get_config().get('concord.zk_path')
+    protocol = util.get_config().get('concord.scheduler_protocol')
+    if protocol is not None:
+        config_data['scheduler_protocol'] = protocol
     return config_data
@@ -0,0 +1,75 @@
+"""
+Delta deploys. Remembers the per file digests of the last full slug deployed
+for each computation and builds patch slugs holding only what changed since.
+A patch always applies on top of that last full slug, so executors only ever
+need to keep one base around.
+"""
+
+import os
+import json
+import time
+import hashlib
+from concord.slug_cache import file_digest
+from concord.utils import (build_logger, concord_home_path,
+                           human_readable_units, write_atomic, load_json)
+
+logger = build_logger('cmd.delta')
+
+# Name of the entry describing the patch, added to the root of a patch slug
+DELTA_MANIFEST = '.concord_delta.json'
+# Ship a full slug once a patch would carry more than this share of the bytes
+MAX_DELTA_RATIO = 0.5
+
+def file_manifest(files, previous=None, root=''):
+    """ Returns { path: [size, mtime, sha1] } for 'files', relative to
+    'root'. Digests from the 'previous' manifest are reused for files whose
+    size and mtime match"""
+    previous = previous or {}
+    manifest = {}
+    for path in files:
+        st = os.stat(os.path.join(root, path))
+        old = previous.get(path)
+        if old is not None and old[0] == st.st_size and old[1] == st.st_mtime:
+            manifest[path] = old
+        else:
+            manifest[path] = [st.st_size, st.st_mtime,
+                              file_digest(os.path.join(root, path))]
+    return manifest
+
+def diff(base, current):
+    """ Returns (changed, removed): paths added or modified in 'current' and
+    paths that are gone since 'base'"""
+    changed = sorted(p for p, entry in current.iteritems()
+                     if p not in base or base[p][2] != entry[2])
+    removed = sorted(p for p in base if p not in current)
+    return (changed, removed)
+
+def patch_manifest(base_digest, changed, removed):
+    """ Contents of DELTA_MANIFEST for the executor"""
+    return json.dumps({ 'base': base_digest, 'changed': changed,
+                        'removed': removed }, sort_keys=True)
+
+def worth_patching(changed, manifest):
+    total = sum(entry[0] for entry in manifest.itervalues())
+    patched = sum(manifest[p][0] for p in changed)
+    logger.info("Delta carries %d files, %s of %s", len(changed),
+                human_readable_units(patched), human_readable_units(total))
+    return total == 0 or patched <= total * MAX_DELTA_RATIO
+
+def _base_path(zookeeper_hosts, zookeeper_path, name):
+    key = hashlib.sha1('\0'.join([zookeeper_hosts, zookeeper_path, name]))
+    return concord_home_path('deployed', key.hexdigest() + '.files.json')
+
+def load_base(zookeeper_hosts, zookeeper_path, name):
+    """ Returns { 'digest': ..., 'files': manifest } of the last full slug
+    deployed for 'name' or None, a full slug is then needed"""
+    base = load_json(_base_path(zookeeper_hosts, zookeeper_path, name))
+    if not isinstance(base, dict) or 'digest' not in base or \
+            'files' not in base:
+        return None
+    return base
+
+def save_base(zookeeper_hosts, zookeeper_path, name, digest, manifest):
+    write_atomic(_base_path(zookeeper_hosts, zookeeper_path, name),
+                 json.dumps({ 'digest': digest, 'files': manifest,
+                              'time': time.time() }))
@@ -35,20 +35,67 @@ Example of configuration file
     "update_binary": true,
     "execute_as_user": "agallego",
     "docker_container": "concord/client_devbox",
-    "force_pull_container": "true"
+    "force_pull_container": "true",
+    "slug_cache": true,
+    "slug_cache_digests": false,
+    "slug_cache_max_mb": 1024,
+    "skip_unchanged_upload": false,
+    "compress_workers": 4,
+    "compression": "gzip:6",
+    "deterministic_slug": true,
+    "send_slug_digest": true,
+    "delta": false
 }
+
+A .concordignore file next to the manifest excludes files from the slug
+using gitignore syntax, i.e. '/build/', '*.o' or '!keep.o'
+
+With slug_cache set, built slugs are kept in ~/.concord/slugs, up to
+slug_cache_max_mb in total, and an unchanged redeploy skips the tar step.
+It is off by default since every new slug is written there once more.
+
+The sha256 digest of the slug is logged and passed to the executor as
+--slug_digest. Executors that predate the flag reject it, set
+send_slug_digest to false to deploy to them. The digest is still sent with
+deterministic_slug, fetch_url or delta, which rely on it.
+
+When fetch_url is set, i.e. "http://artifacts.local:8000/slugs/", the slug
+is uploaded there with a PUT and the request only carries its URL and
+digest, executors download it themselves. See concord.artifact_server
+
+Several manifests, directories of manifests or globs may be given at once,
+i.e: concord deploy topology/ 'extra/*.json'. They are deployed concurrently
+and a table of results is printed at the end. A topology manifest describes
+several computations and the streams linking them, consumers are then
+deployed before their producers, see concord.topology.
 """
 
 import os
 import re
+import sys
+import glob
 import json
-import tarfile
+import time
 import logging
 import argparse
-import uuid
-from kazoo.client import KazooClient
+from terminaltables import AsciiTable
+try:
+    from os import scandir
+except ImportError:
+    from scandir import scandir
 from concord.internal.thrift.ttypes import *
 from concord.utils import *
+from concord.slug import build_slug
+from concord.compression import (parse_codec, choose_codec, AUTO,
+                                 DEFAULT_CODEC)
+from concord import slug_cache, delta
+from concord.ignore import IgnoreMatcher, IGNORE_FILENAME
+from concord.timings import DeployTimings, HISTORY_FILENAME
+from concord.artifact_server import publish_slug
+from concord.progress import ProgressBar
+from concord.scheduler_client import SchedulerPool
+from concord.topology import (Topology, TopologyNode, TopologyError,
+                              STREAM_KEYS)
 from concord.thrift_utils import *
 from concord.functional_utils import *
 
@@ -69,9 +116,28 @@ DEFAULTS = dict(
     docker_container = "",
     force_pull_container = True,
     retries = 0,
-    executor_args = []
+    executor_args = [],
+    slug_cache = False,
+    slug_cache_digests = False,
+    slug_cache_max_mb = slug_cache.DEFAULT_MAX_MB,
+    skip_unchanged_upload = False,
+    compress_workers = 0,
+    compression = DEFAULT_CODEC,
+    deterministic_slug = False,
+    send_slug_digest = True,
+    delta = False,
+    fetch_url = ""
 )
 
+# Assumed upload speed for automatic codec selection before any was measured
+DEFAULT_BANDWIDTH = 10 * 1024 * 1024
+# Uploads smaller than this say more about latency than bandwidth
+MIN_THROUGHPUT_SAMPLE = 1024 * 1024
+# Manifests deployed at once when several are given
+DEFAULT_CONCURRENCY = 4
+# Seconds the scheduler may go without accepting any of the upload
+DEFAULT_SEND_TIMEOUT = 60
+
 def validate_json_raw_config(dictionary, parser):
     valid_keys = ["executable_arguments", "docker_container",
                   "fetch_url", "mem", "disk", "cpus", "retries",
@@ -80,7 +146,10 @@ def validate_json_raw_config(dictionary, parser):
                   "zookeeper_hosts", "exclude_compress_files",
                   "update_binary", "execute_as_user",
                   "docker_container", "force_pull_container",
-                  "executor_args"]
+                  "executor_args", "slug_cache", "slug_cache_digests",
+                  "slug_cache_max_mb", "skip_unchanged_upload",
+                  "compress_workers", "compression", "deterministic_slug",
+                  "send_slug_digest", "delta"]
     reqs = ['compress_files', 'executable_name', 'computation_name',
             'zookeeper_hosts', 'zookeeper_path']
 
@@ -99,6 +168,22 @@ def validate_json_raw_config(dictionary, parser):
             contents = json.dumps(dictionary, indent=4, separators=(',', ': '))
             parser.error("Please specify: " + k + ", parsed file: " + contents)
 
+    if "compression" in dictionary:
+        try:
+            parse_codec(dictionary["compression"])
+        except ValueError as e:
+            parser.error(str(e))
+
+    max_mb = dictionary.get("slug_cache_max_mb", 1)
+    if not isinstance(max_mb, int) or max_mb < 1:
+        parser.error("slug_cache_max_mb must be a positive number of "
+                     "megabytes")
+
+    fetch_url = dictionary.get("fetch_url", "")
+    if fetch_url and not re.match('https?://', fetch_url):
+        parser.error("fetch_url must be an http:// or https:// location: " +
+                     fetch_url)
+
 
 def parseFile(filename, parser):
     if os.path.splitext(filename)[1] != '.json':
@@ -108,6 +193,9 @@ def parseFile(filename, parser):
     with open(filename) as data_file:
         data = json.load(data_file)
 
+    return parse_manifest(data, parser)
+
+def parse_manifest(data, parser):
     validate_json_raw_config(data, parser)
 
     conf = DEFAULTS.copy()
@@ -119,39 +207,171 @@ def parseFile(filename, parser):
 
     return conf
 
+def parse_topology(filename, data, parser):
+    """ Returns a TopologyNode per computation of a topology manifest, see
+    concord.topology for the format"""
+    defaults = dict((k, v) for k, v in data.iteritems() if k != "computations")
+    nodes = []
+    for entry in data["computations"]:
+        streams = {}
+        for key in STREAM_KEYS:
+            streams[key] = entry.get(key, [])
+            if not isinstance(streams[key], list):
+                parser.error("'%s' must be a list of stream names in %s" %
+                             (key, filename))
+        entry = dict((k, v) for k, v in entry.iteritems()
+                     if k not in STREAM_KEYS)
+        config = filename
+        if "manifest" in entry:
+            config = os.path.join(os.path.dirname(filename),
+                                  entry.pop("manifest"))
+            if len(entry) > 0:
+                parser.error("Only streams may be given next to 'manifest', "
+                             "found: " + ", ".join(sorted(entry)))
+            with open(config) as data_file:
+                entry = json.load(data_file)
+        manifest = defaults.copy()
+        manifest.update(entry)
+        request = parse_manifest(manifest, parser)
+        nodes.append(TopologyNode(request["computation_name"], request, config,
+                                  **streams))
+    return nodes
+
+def parse_nodes(filename, parser):
+    """ Reads a manifest or a topology manifest"""
+    if os.path.splitext(filename)[1] != '.json':
+        raise Exception('config file must end in .json')
+    with open(filename) as data_file:
+        data = json.load(data_file)
+    if "computations" in data:
+        return parse_topology(filename, data, parser)
+    request = parse_manifest(data, parser)
+    return [TopologyNode(request["computation_name"], request, filename)]
+
 def generate_options():
     parser = argparse.ArgumentParser()
-    parser.add_argument("config", metavar="config-file", action="store",
-                        help="i.e: ./src/config.json")
+    parser.add_argument("config", metavar="config-file", nargs="+",
+                        help="i.e: ./src/config.json, a topology manifest, a"
+                        " directory of manifests or a glob")
+    parser.add_argument("-j", "--concurrency", type=int,
+                        default=DEFAULT_CONCURRENCY,
+                        help="Number of manifests deployed at once")
+    parser.add_argument("--send-timeout", type=float,
+                        default=DEFAULT_SEND_TIMEOUT, metavar="SECONDS",
+                        help="Give up when the scheduler accepts no data for"
+                        " this long, 0 waits forever")
+    parser.add_argument("--recv-timeout", type=float, default=0,
+                        metavar="SECONDS",
+                        help="Give up when the scheduler does not answer for"
+                        " this long, 0 waits forever (default)")
+    parser.add_argument("--protocol", choices=PROTOCOLS,
+                        help="Thrift protocol spoken to the scheduler, auto"
+                        " uses compact when the scheduler supports it."
+                        " Defaults to the scheduler_protocol setting")
+    parser.add_argument("--no-progress", dest="progress",
+                        action="store_false",
+                        help="Do not draw a progress bar of the upload")
+    parser.add_argument("--timings", action="store_true",
+                        help="Print a JSON summary of the time spent in each phase")
+    parser.add_argument("--timings-history", metavar="history-file",
+                        nargs="?", const=True,
+                        help="Append the timings summary to a JSON lines file,"
+                        " defaults to ~/.concord/" + HISTORY_FILENAME)
     return parser
 
 def validate_options(options, parser):
     if not options.config:
         parser.error("need to specify config file")
-
-def tar_file_list(white_list, black_list):
+    if options.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if options.send_timeout < 0 or options.recv_timeout < 0:
+        parser.error("Timeouts cannot be negative")
+    default_options(options, parser)
+
+def expand_configs(paths, parser):
+    """ Resolves the positional arguments to a list of manifests, a
+    directory stands for the .json files it holds"""
+    configs = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = sorted(glob.glob(os.path.join(path, '*.json')))
+        elif glob.has_magic(path):
+            matches = sorted(glob.glob(path))
+        else:
+            matches = [path]
+        if len(matches) == 0:
+            parser.error("No manifest found in: " + path)
+        configs.extend(matches)
+    seen = set()
+    return [c for c in configs if os.path.abspath(c) not in seen
+            and not seen.add(os.path.abspath(c))]
+
+def _list_dir(path):
+    """ Returns (name, is_dir) for every entry in 'path'. Uses scandir so
+    that the file type comes from the directory listing instead of an extra
+    stat per entry"""
+    return [(e.name, e.is_dir()) for e in scandir(path)]
+
+def compile_black_list(black_list):
+    """ Compiles each of the black_list regexes once. They are kept apart so
+    that backreferences and group names mean what they do on their own"""
+    return [re.compile(p) for p in sorted(set(black_list))]
+
+def tar_file_list(white_list, black_list, ignore=None, root=''):
     """
     Add files/dirs in the white_list. When you encounter something in the
     blacklist, exclude it. This is useful when adding a subdirectory containing
     many files, some of which you wish to exclude. The black_list should be
-    formatted as regular expressions.
+    formatted as regular expressions, a path is excluded when any of its
+    components matches. 'ignore' is an optional IgnoreMatcher applied to
+    paths relative to 'root'. Excluded directories are never
+    descended into. Paths are relative to 'root', the current directory by
+    default. Returns a generator.
     """
-
-    def expand_white_list(path):
-        if os.path.isfile(path):
-            return [path]
-        files, directories = split_predicate(lambda x: os.path.isfile(x), os.listdir(path))
-        return files + flat_map(lambda x: expand_white_list(path + '/' + x), directories)
-
-    # set is useful for deduping
-    white_list = flat_map(lambda x: expand_white_list(x), set(white_list))
-    black_list = map(re.compile, set(black_list))
-
-    # Return paths that don't contain any matches against any pieces of the path
-    def exclude_matches(path):
-        def on_black_list(component):
-            return any(map(lambda x: x.match(component) != None, black_list))
-
+    patterns = compile_black_list(black_list)
+
+    def relative(path):
+        # Paths outside of 'root' are not subject to 'ignore'
+        rel = os.path.relpath(os.path.join(root, path), root or '.')
+        return None if rel.startswith('..') else ('' if rel == '.' else rel)
+
+    def on_ignore_list(rel, is_dir):
+        return ignore is not None and rel is not None and \
+            ignore.match(rel, is_dir)
+
+    def on_black_list(component):
+        # Empty and '.' components are not names, skip them
+        return component not in ('', '.') and \
+            any(p.match(component) is not None for p in patterns)
+
+    def walk(directory):
+        # Iterative depth first walk, files of a directory come before the
+        # contents of its sub directories
+        stack = [(directory, relative(directory) if ignore else None)]
+        while stack:
+            path, rel = stack.pop()
+            subdirs = []
+            for name, is_dir in sorted(_list_dir(os.path.join(root, path))):
+                if on_black_list(name):
+                    continue
+                rel_name = None if rel is None else \
+                    (rel + '/' + name if rel else name)
+                if on_ignore_list(rel_name, is_dir):
+                    continue
+                if is_dir:
+                    subdirs.append((path + '/' + name, rel_name))
+                else:
+                    yield path + '/' + name
+            stack.extend(reversed(subdirs))
+
+    seen = set()
+    def unseen(path):
+        if path in seen:
+            return False
+        seen.add(path)
+        return True
+
+    for path in sorted(set(white_list)):
         path_components = path.split('/')
         # We cannot guarantee that in mesos we'll have even read access to
         # parent dirs. So we cannot support compressing files wihtout flattening
@@ -164,34 +384,149 @@ def tar_file_list(white_list, black_list):
             raise Exception("\n\n==> Relative paths that do not start from this %s" %
                          "directory are not supported, bad path: %s \n" % path)
 
-        # Truncate by one if relative dir is prepended with a '.'
-        if len(path_components) > 0 and path_components[0] == '.':
-            path_components = path_components[1:-1]
-        return not any(map(on_black_list, path_components))
+        if any(map(on_black_list, path_components)):
+            continue
+        if ignore is not None:
+            rel = relative(path)
+            if rel and ignore.ignored(rel,
+                                      os.path.isdir(os.path.join(root, path))):
+                continue
+        if os.path.isdir(os.path.join(root, path)):
+            for f in walk(path.rstrip('/')):
+                if unseen(f):
+                    yield f
+        elif unseen(path):
+            yield path
+
+def select_codec(request, tar_files, root=''):
+    """ Returns the (codec, level) to build the slug with, measuring a sample
+    of the files when compression is 'auto'"""
+    codec, level = parse_codec(request["compression"])
+    if codec != AUTO:
+        return (codec, level)
+    bandwidth = slug_cache.last_throughput(request["zookeeper_hosts"],
+                                           request["zookeeper_path"])
+    if bandwidth is None:
+        bandwidth = DEFAULT_BANDWIDTH
+    paths = [os.path.join(root, f) for f in tar_files]
+    codec, level = choose_codec(paths, map(os.path.getsize, paths),
+                                bandwidth, request["compress_workers"])
+    logger.info("Selected %s:%d compression for a %s/s link", codec, level,
+                human_readable_units(bandwidth))
+    return (codec, level)
+
+def record_slug_build(timings, slug):
+    """ Splits the slug build time into tar and compression phases"""
+    timings.record("tar", slug.elapsed - slug.compress_seconds, slug.tar_bytes)
+    timings.record("compress", slug.compress_seconds, slug.size)
+
+def build_delta_slug(request, tar_files, codec, level, timings, root=''):
+    """ Returns a patch slug against the last full slug deployed for this
+    computation or None when a full slug has to be sent. In the latter case
+    the file manifest is returned so it can be recorded after the deploy"""
+    base = delta.load_base(request["zookeeper_hosts"],
+                           request["zookeeper_path"],
+                           request["computation_name"])
+    with timings.phase("delta_manifest"):
+        manifest = delta.file_manifest(tar_files, base and base['files'], root)
+    if base is None:
+        logger.info("No base slug for delta, sending a full slug")
+        return (None, manifest)
+    changed, removed = delta.diff(base['files'], manifest)
+    if not delta.worth_patching(changed, manifest):
+        logger.info("Too much changed for a delta, sending a full slug")
+        return (None, manifest)
+
+    logger.info("Sending delta against %s: %d changed, %d removed",
+                base['digest'], len(changed), len(removed))
+    contents = delta.patch_manifest(base['digest'], changed, removed)
+    slug = build_slug(changed, codec=codec, level=level,
+                      workers=request["compress_workers"],
+                      deterministic=request["deterministic_slug"],
+                      extra_entries=[(delta.DELTA_MANIFEST, contents)],
+                      root=root)
+    slug.delta_base = base['digest']
+    record_slug_build(timings, slug)
+    return (slug, None)
+
+def build_request_slug(request, timings, root=''):
+    """ Tars up the files named in the manifest, reusing the previously built
+    slug when none of them changed. In delta mode only the files changed
+    since the last full slug are sent. Manifest paths are relative to
+    'root', the directory of the manifest"""
+    with timings.phase("collect_files"):
+        ignore_path = os.path.join(root, IGNORE_FILENAME)
+        ignore = IgnoreMatcher.from_file(ignore_path)
+        if ignore is not None:
+            logger.debug("Applying patterns from %s",
+                         os.path.abspath(ignore_path))
+        tar_files = list(tar_file_list(request["compress_files"],
+                                       request["exclude_compress_files"],
+                                       ignore, root))
+    timings.info["files"] = len(tar_files)
 
-    return filter(exclude_matches, white_list)
+    if len(tar_files) == 0: raise Exception("Nothing to tar.gz :'(")
+    codec, level = None, None
+    manifest = None
+    if request["delta"]:
+        with timings.phase("select_codec"):
+            codec, level = select_codec(request, tar_files, root)
+        slug, manifest = build_delta_slug(request, tar_files, codec, level,
+                                          timings, root)
+        if slug is not None:
+            logger.info("Size of delta slug is: %s",
+                        human_readable_units(slug.size))
+            return slug
+
+    key = None
+    slug = None
+    if request["slug_cache"]:
+        salt = "%s:%s" % (request["compression"], request["deterministic_slug"])
+        with timings.phase("cache_lookup"):
+            key = slug_cache.fingerprint(tar_files,
+                                         request["slug_cache_digests"],
+                                         salt=salt, root=root)
+            slug = slug_cache.lookup(key)
+        timings.info["cache_hit"] = slug is not None
+
+    if slug is None:
+        if codec is None:
+            with timings.phase("select_codec"):
+                codec, level = select_codec(request, tar_files, root)
+        slug = build_slug(tar_files, codec=codec, level=level,
+                          workers=request["compress_workers"],
+                          deterministic=request["deterministic_slug"],
+                          root=root)
+        record_slug_build(timings, slug)
+        logger.info("Size of tar file is: %s", human_readable_units(slug.size))
+        if key is not None:
+            with timings.phase("cache_store", slug.size):
+                slug_cache.store(key, slug,
+                                 request["slug_cache_max_mb"] * 1024 * 1024)
+    logger.info("Slug digest: %s", slug.digest)
+    slug.file_manifest = manifest
+    return slug
+
+def slug_executor_args(slug, url=None, delta=False, send_digest=True):
+    """ Flags telling the executor how to verify and unpack the slug. gzip is
+    what every executor expects so it is left implicit. 'url' is where the
+    executor downloads the slug from when it is not part of the request.
+    Without 'send_digest', for executors that reject flags they do not know,
+    the digest is only sent when the executor downloads the slug or keeps it
+    as the base of later 'delta' deploys"""
+    args = []
+    if send_digest or url is not None or delta:
+        args.append("--slug_digest=" + slug.digest)
+    if url is not None:
+        args.append("--slug_url=" + url)
+    if slug.codec != DEFAULT_CODEC:
+        args.append("--slug_codec=" + slug.codec)
+    if slug.delta_base is not None:
+        args.append("--slug_delta_base=" + slug.delta_base)
+    return args
 
 def build_thrift_request(request):
     logger.debug("JSON Request: %s" % json.dumps(request, indent=4, separators=(',', ': ')))
-    tar_files = tar_file_list(request["compress_files"],
-                              request["exclude_compress_files"])
-
-    if len(tar_files) == 0: raise Exception("Nothing to tar.gz :'(")
-    tar_name = os.path.abspath("concord_slug_" + str(uuid.uuid4()) + ".tar.gz")
-    if os.path.exists(tar_name): logger.debug("%s exists! overriding" % tar_name)
-    logger.debug("Created tar file: %s", tar_name)
-    with tarfile.open(tar_name, "w:gz") as tar:
-        for name in tar_files:
-            logger.info("Adding tarfile: %s" % name)
-            tar.add(name)
-
-    logger.debug("Reading slug into memory")
-    slug = open(tar_name, "rb").read()
-    logger.info("Size of tar file is: %s", human_readable_units(len(slug)))
-    if os.path.exists(tar_name):
-        logger.debug("Removing slug %s", tar_name)
-        os.remove(tar_name)
-
     logger.debug("Making request object")
     req = BoltComputationRequest()
     req.name = request["computation_name"]
@@ -214,30 +549,194 @@ def build_thrift_request(request):
     req.taskHelper.user = request["execute_as_user"]
     req.taskHelper.dockerContainer = request["docker_container"]
     logger.info("Thrift Request: %s" % thrift_to_json(req))
-    req.slug = slug
     return req
 
-def register(request, config):
-    with ContextDirMgr(config):
+def register(request, config, timings=None, pool=None, progress=True,
+             protocol=DEFAULT_PROTOCOL):
+    """ Deploys the computation described by 'request', read from the
+    manifest 'config'. Returns the DeployTimings of the run, 'timings' can be
+    passed to collect into an existing one. Safe to call from several threads
+    sharing a SchedulerPool, which is left open for the caller to close.
+    Without a pool one speaking 'protocol' is used for this deploy.
+    'progress' draws a progress bar of the upload on a terminal, otherwise
+    it is logged periodically"""
+    if timings is None:
+        timings = DeployTimings(request["computation_name"])
+    owned = pool is None
+    if owned:
+        pool = SchedulerPool(protocol=protocol)
+    try:
+        return deploy_request(request, config, timings, pool, progress)
+    finally:
+        timings.finish()
+        if owned:
+            pool.close()
+
+def deploy_request(request, config, timings, pool, progress):
+    # Never chdir, other threads may be building their own slugs
+    root = os.path.dirname(os.path.abspath(config))
+    slug = build_request_slug(request, timings, root)
+    timings.info.update(slug_digest=slug.digest, slug_size=slug.size,
+                        codec=slug.codec, delta_base=slug.delta_base)
+    try:
         req = build_thrift_request(request)
+        url = None
+        if request["fetch_url"]:
+            with timings.phase("publish_slug", slug.size):
+                url = publish_slug(request["fetch_url"], slug)
+            timings.info["slug_url"] = url
+        # Deterministic slugs exist to be compared, they always carry it
+        req.executorArgs = req.executorArgs + slug_executor_args(
+            slug, url, request["delta"],
+            request["send_slug_digest"] or request["deterministic_slug"])
         logger.debug("Getting master ip from zookeeper")
-        ip = get_zookeeper_master_ip(
-            request["zookeeper_hosts"], request["zookeeper_path"])
-        (addr, port) = ip.split(":")
+        hosts, path = request["zookeeper_hosts"], request["zookeeper_path"]
+        with timings.phase("zk_leader_lookup"):
+            ip = pool.leader(hosts, path)
 
         logger.info("Sending computation to: %s" % ip)
 
-        cli = get_sched_service_client(addr,int(port))
-        logger.debug("Sending request to scheduler")
-        cli.deployComputation(req)
-        logger.debug("Done sending request to server")
-        logger.info("Verify with the mesos host: %s that the service is running" % addr)
+        cli = pool.acquire(hosts, path)
+        reusable = False
+        meter = bar = None
+        try:
+            with timings.phase("scheduler_connect"):
+                cli.connect()
+            send_slug = False
+            if url is not None:
+                logger.info("Executors will fetch the slug from %s", url)
+            elif request["skip_unchanged_upload"] and \
+                    slug_cache.deployed_unchanged(request, slug):
+                logger.info("Slug %s is the last one deployed from here, "
+                            "skipping upload", slug.digest)
+                req.forceUpdateBinary = False
+            else:
+                send_slug = True
+
+            logger.debug("Sending request to scheduler")
+            if send_slug and cli.meter is not None:
+                bar = ProgressBar(request["computation_name"], slug.size,
+                                  progress)
+            start = time.time()
+            # The slug is streamed from disk, never held in memory as a whole.
+            # Sending again after a leader change restarts the bar
+            cli.deploy_computation(req, slug if send_slug else None, bar)
+            elapsed = time.time() - start
+            meter = cli.meter
+            reusable = True
+        finally:
+            if bar is not None and cli.meter is not None:
+                bar.finish(cli.meter.sent)
+            timings.info["scheduler"] = cli.address
+            pool.release(hosts, path, cli, reusable)
+    finally:
+        slug.close()
+    timings.record("deploy_rpc", elapsed, slug.size if send_slug else 0)
+    logger.debug("Done sending request to server")
+    if meter is not None:
+        upload = meter.send_seconds()
+        timings.record("upload", upload, meter.sent)
+        timings.record("await_reply", max(elapsed - upload, 0))
+        if meter.sent >= MIN_THROUGHPUT_SAMPLE:
+            # Time spent by the scheduler handling the call is left out
+            rate = meter.sent / max(upload, 1e-6)
+            timings.info["upload_bytes_per_sec"] = round(rate)
+            logger.info("Uploaded %s at %s/s", human_readable_units(meter.sent),
+                        human_readable_units(rate))
+            slug_cache.record_throughput(request["zookeeper_hosts"],
+                                         request["zookeeper_path"],
+                                         meter.sent, upload)
+    if slug.digest is not None:
+        slug_cache.record_deploy(request["zookeeper_hosts"],
+                                 request["zookeeper_path"],
+                                 request["computation_name"], slug.digest)
+    if slug.file_manifest is not None:
+        delta.save_base(request["zookeeper_hosts"],
+                        request["zookeeper_path"],
+                        request["computation_name"], slug.digest,
+                        slug.file_manifest)
+    logger.info("Verify with the mesos host: %s that the service is running" %
+                cli.address.split(":")[0])
+    return timings
+
+def register_all(topology, concurrency, pool):
+    """ Deploys every computation of 'topology' on a bounded pool of threads
+    sharing zookeeper sessions and scheduler connections, consumers before
+    their producers. A failure only stops the computations feeding the one
+    that failed. Returns (timings, error) per node, in order, timings are
+    None for skipped computations"""
+    logger.info("Deploy order: %s", " | ".join(
+        ", ".join(level) for level in topology.levels()))
+    timings = {}
+    def deploy_one(node):
+        # Started here so that the time spent waiting on consumers is not
+        # counted, skipped computations have no timings
+        timings[node.name] = DeployTimings(node.name)
+        try:
+            # Concurrent progress bars would overwrite each other
+            return register(node.request, node.config, timings[node.name],
+                            pool, progress=False)
+        except Exception:
+            logger.exception("Failed to deploy %s", node.config)
+            raise
+    results = topology.run(deploy_one, concurrency)
+    return [(timings.get(node.name), results[node.name][1])
+            for node in topology.nodes]
+
+def results_table(topology, results):
+    table = [["Computation", "Manifest", "Scheduler", "Slug", "Time",
+              "Result"]]
+    for node, (timings, error) in zip(topology.nodes, results):
+        if timings is None:
+            table.append([node.name, node.config, "", "", "",
+                          "SKIPPED: %s" % error])
+            continue
+        summary = timings.summary()
+        table.append([node.name, node.config,
+                      summary.get("scheduler", ""),
+                      human_readable_units(summary["slug_size"])
+                      if "slug_size" in summary else "",
+                      "%.2fs" % summary["total_seconds"],
+                      "OK" if error is None else "FAILED: %s" % error])
+    return AsciiTable(table).table
 
 def main():
     parser = generate_options()
     options = parser.parse_args()
     validate_options(options,parser)
-    register(parseFile(options.config, parser), options.config)
+    configs = expand_configs(options.config, parser)
+    nodes = flat_map(lambda c: parse_nodes(c, parser), configs)
+    try:
+        topology = Topology(nodes)
+        topology.check()
+    except TopologyError as e:
+        parser.error(str(e))
+
+    pool = SchedulerPool(options.send_timeout or None,
+                         options.recv_timeout or None,
+                         protocol=options.protocol)
+    try:
+        if len(nodes) == 1:
+            node = nodes[0]
+            results = [(register(node.request, node.config, pool=pool,
+                                 progress=options.progress), None)]
+        else:
+            results = register_all(topology, options.concurrency, pool)
+            print results_table(topology, results)
+    finally:
+        pool.close()
+
+    deployed = [timings for timings, _ in results if timings is not None]
+    if options.timings:
+        summaries = [timings.summary() for timings in deployed]
+        print json.dumps(summaries[0] if len(summaries) == 1 else summaries,
+                         indent=4, sort_keys=True, separators=(',', ': '))
+    if options.timings_history:
+        path = options.timings_history
+        for timings in deployed:
+            timings.append_history(None if path is True else path)
+    if any(error is not None for _, error in results):
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,135 @@
+"""
+gitignore style matching for .concordignore files, see
+https://git-scm.com/docs/gitignore for the pattern format. Paths are
+matched relative to the directory holding the deploy manifest.
+"""
+
+import os
+import re
+
+IGNORE_FILENAME = '.concordignore'
+
+def _translate_glob(glob):
+    """ Translates the body of a gitignore pattern into a regex, '*' and '?'
+    never match a '/' but '**' spans directories"""
+    i, n = 0, len(glob)
+    out = []
+    while i < n:
+        c = glob[i]
+        if glob.startswith('**/', i) and (i == 0 or glob[i - 1] == '/'):
+            out.append('(?:.*/)?')
+            i += 3
+        elif glob.startswith('/**', i) and i + 3 == n:
+            out.append('/.*')
+            i += 3
+        elif glob.startswith('**', i):
+            out.append('.*')
+            i += 2
+        elif c == '*':
+            out.append('[^/]*')
+            i += 1
+        elif c == '?':
+            out.append('[^/]')
+            i += 1
+        elif c == '[':
+            j = glob.find(']', i + 2)
+            if j == -1:
+                out.append('\\[')
+                i += 1
+                continue
+            body = glob[i + 1:j]
+            if body[0] == '!':
+                body = '^' + body[1:]
+            out.append('[' + body.replace('\\', '\\\\') + ']')
+            i = j + 1
+        elif c == '\\' and i + 1 < n:
+            out.append(re.escape(glob[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return ''.join(out)
+
+def parse_pattern(line):
+    """ Returns (regex, negated, dir_only) for one line of an ignore file or
+    None for blank lines and comments"""
+    line = line.rstrip('\n').rstrip('\r')
+    # Trailing spaces are ignored unless escaped
+    while line.endswith(' ') and not line.endswith('\\ '):
+        line = line[:-1]
+    if line == '' or line.startswith('#'):
+        return None
+    negated = line.startswith('!')
+    if negated:
+        line = line[1:]
+    elif line.startswith('\\!') or line.startswith('\\#'):
+        line = line[1:]
+    dir_only = line.endswith('/')
+    line = line.rstrip('/')
+    if line == '':
+        return None
+    # A slash anywhere but the end anchors the pattern to the root
+    if '/' in line:
+        regex = _translate_glob(line.lstrip('/'))
+    else:
+        regex = '(?:.*/)?' + _translate_glob(line)
+    return (regex, negated, dir_only)
+
+class _Run(object):
+    """ Consecutive patterns sharing the same polarity, compiled together"""
+    def __init__(self, negated):
+        self.negated = negated
+        self.any = []
+        self.dirs = []
+
+    def compile(self):
+        def combine(regexes):
+            if len(regexes) == 0:
+                return None
+            return re.compile('(?:%s)\\Z' % '|'.join(regexes))
+        self.files_re = combine(self.any)
+        self.dirs_re = combine(self.any + self.dirs)
+
+class IgnoreMatcher(object):
+    """ Compiled form of an ignore file. The last pattern matching a path
+    decides, so runs of same polarity patterns are tried newest first and
+    the first hit wins. Without negations this is a single regex match"""
+    def __init__(self, lines):
+        self.runs = []
+        for line in lines:
+            parsed = parse_pattern(line)
+            if parsed is None:
+                continue
+            regex, negated, dir_only = parsed
+            if len(self.runs) == 0 or self.runs[-1].negated != negated:
+                self.runs.append(_Run(negated))
+            (self.runs[-1].dirs if dir_only else self.runs[-1].any).append(regex)
+        for run in self.runs:
+            run.compile()
+        self.runs.reverse()
+
+    @classmethod
+    def from_file(cls, path):
+        """ Returns None when 'path' does not exist"""
+        if not os.path.isfile(path):
+            return None
+        with open(path) as ignore_file:
+            return cls(ignore_file.readlines())
+
+    def match(self, path, is_dir=False):
+        """ Whether the patterns exclude 'path' itself, its parent
+        directories are not looked at"""
+        for run in self.runs:
+            regex = run.dirs_re if is_dir else run.files_re
+            if regex is not None and regex.match(path):
+                return not run.negated
+        return False
+
+    def ignored(self, path, is_dir=False):
+        """ Whether 'path' is excluded, either itself or because one of its
+        parent directories is. Costs one match per path component"""
+        components = [c for c in path.split('/') if c not in ('', '.')]
+        for i in xrange(1, len(components)):
+            if self.match('/'.join(components[:i]), True):
+                return True
+        return len(components) > 0 and self.match('/'.join(components), is_dir)
@@ -1,10 +1,18 @@
 #!/usr/bin/env python
+import re
 import sys
-import thrift
+import json
 import logging
 import argparse
+from functools import partial
 from concord.utils import *
 from concord.thrift_utils import *
+from concord.metadata_cache import DEFAULT_TTL
+from concord.lazy_metadata import decode_metadata
+from concord.scheduler_client import SchedulerPool, DEFAULT_RETRIES
+from concord.bulk_kill import *
+from concord.task_index import TaskIndex, INDEX_FIELDS
+from concord.topology_watcher import TopologyWatcher
 from concord.functional_utils import *
 from terminaltables import AsciiTable
 
@@ -30,38 +38,130 @@ def generate_options():
                         ,"--all"
                         ,help="Kill all computations"
                         ,action="store_true")
+    parser.add_argument("--cache-ttl"
+                        ,dest="cache_ttl"
+                        ,type=int
+                        ,help="Seconds a local copy of the metadata is reused "
+                        "for while unchanged on zookeeper, default %d" %
+                        DEFAULT_TTL)
+    parser.add_argument("--no-cache"
+                        ,dest="cache_ttl"
+                        ,help="Always download the metadata"
+                        ,action="store_const"
+                        ,const=None)
+    parser.add_argument("--protocol"
+                        ,choices=PROTOCOLS
+                        ,help="Thrift protocol spoken to the scheduler, "
+                        "defaults to the scheduler_protocol setting"
+                        ,action="store")
+    parser.add_argument("-j"
+                        ,"--concurrency"
+                        ,type=int
+                        ,default=DEFAULT_CONCURRENCY
+                        ,help="Number of tasks killed at once, default %d" %
+                        DEFAULT_CONCURRENCY)
+    parser.add_argument("--rate"
+                        ,type=float
+                        ,metavar="KILLS-PER-SECOND"
+                        ,help="Cap on the kills sent per second")
+    parser.add_argument("--retries"
+                        ,type=int
+                        ,default=DEFAULT_RETRIES
+                        ,help="Retries per task when the scheduler connection "
+                        "fails, default %d" % DEFAULT_RETRIES)
+    parser.add_argument("--json"
+                        ,help="Print a JSON report instead of the table"
+                        ,action="store_true")
+    selectors = parser.add_argument_group(
+        "selectors", "Kill the tasks matching all of these")
+    selectors.add_argument("--computation"
+                           ,metavar="REGEX"
+                           ,help="Computations whose name the regex is found "
+                           "in")
+    selectors.add_argument("--slave"
+                           ,metavar="SLAVE"
+                           ,help="Tasks on a mesos slave, by slave id or host "
+                           "ip")
+    selectors.add_argument("--reconciling"
+                           ,help="Tasks waiting for reconciliation"
+                           ,action="store_true")
+    selectors.add_argument("--mem-gt"
+                           ,dest="mem_gt"
+                           ,type=int
+                           ,metavar="MB"
+                           ,help="Tasks with more memory than this")
+    selectors.add_argument("--docker"
+                           ,metavar="IMAGE[:TAG]"
+                           ,help="Tasks running a docker container, any tag "
+                           "when none is given")
+    parser.add_argument("--dry-run"
+                        ,dest="dry_run"
+                        ,help="List the tasks --all or the selectors match "
+                        "without killing them"
+                        ,action="store_true")
+    parser.set_defaults(cache_ttl=DEFAULT_TTL)
     return parser
 
+SELECTORS = ['computation', 'slave', 'reconciling', 'mem_gt', 'docker']
+
+def selectors(options):
+    """ The selector options given, as arguments of TaskIndex.select"""
+    return dict((name, getattr(options, name)) for name in SELECTORS
+                if getattr(options, name) not in (None, False))
+
 def validate_options(options, parser):
     if options.all and options.task_id:
         parser.error('You are using task_id and passing the all flag')
-    default_options(options)
+    if selectors(options) and (options.all or options.task_id):
+        parser.error('Selectors cannot be combined with --all or --task_id')
+    if options.dry_run and not (options.all or selectors(options)):
+        parser.error('--dry-run needs --all or a selector')
+    if options.computation is not None:
+        try:
+            re.compile(options.computation)
+        except re.error as e:
+            parser.error('Invalid --computation regex: %s' % e)
+    if options.concurrency < 1:
+        parser.error('--concurrency must be at least 1')
+    if options.rate is not None and options.rate <= 0:
+        parser.error('--rate must be positive')
+    if options.retries < 0:
+        parser.error('--retries cannot be negative')
+    default_options(options, parser)
 
-def kill(zookeeper, zk_path, task_ids):
+def kill(zookeeper, zk_path, task_ids, protocol=DEFAULT_PROTOCOL,
+         concurrency=DEFAULT_CONCURRENCY, rate=None, retries=DEFAULT_RETRIES):
+    """ Kills 'task_ids', see bulk_kill.kill_tasks. Returns a KillResult per
+    task"""
     if len(task_ids) == 0:
         logger.info('Kill received an empty list of task_ids')
-        return
-    logger.info("Getting master ip from zookeeper")
-    ip = get_zookeeper_master_ip(zookeeper, zk_path)
-    logger.info("Found leader at: %s" % ip)
-    (addr, port) = ip.split(":")
-    logger.info("Initiating connection to scheduler")
-    cli = get_sched_service_client(addr,int(port))
-    logger.info("Sending request to scheduler")
+        return []
+    pool = SchedulerPool(retries=retries, protocol=protocol)
     try:
-        for task_id in task_ids:
-            logger.info('Sending request to kill task: %s', task_id)
-            cli.killTask(task_id)
-    except thrift.Thrift.TApplicationException as e:
-        leftover = task_ids[task_ids.index(task_id):]
-        logger.error("Error killing task: %s" % task_id)
-        logger.error("Tasks that could not be killed... %s" % ", ".join(leftover))
-        logger.exception(e)
+        logger.info("Getting master ip from zookeeper")
+        ip = pool.leader(zookeeper, zk_path)
+        logger.info("Found leader at: %s" % ip)
+        # Follows the leader, kills interrupted by a fail over are retried
+        logger.info("Sending requests to kill %d tasks", len(task_ids))
+        results = kill_tasks(pool, zookeeper, zk_path, task_ids, concurrency,
+                             rate)
+    finally:
+        pool.close()
     logger.info("Done sending request to server")
+    return results
+
+def report(results, as_json=False):
+    if as_json:
+        print json.dumps(results_json(results), indent=4, sort_keys=True,
+                         separators=(',', ': '))
+    elif results:
+        print results_table(results)
 
-def collect_taskids(zookeeper, zkpath):
+def collect_taskids(zookeeper, zkpath, cache_ttl=None):
     """ Querys zk for topology metadata and returns a list of task_ids"""
-    meta = get_zookeeper_metadata(zookeeper, zkpath)
+    meta = get_zookeeper_metadata(zookeeper, zkpath, cache_ttl,
+                                  partial(decode_metadata,
+                                          node_fields=['taskId']))
     if meta is None or len(meta.computations) == 0:
         return []
 
@@ -69,6 +169,42 @@ def collect_taskids(zookeeper, zkpath):
     return flatten([list(d.taskId for d in c.nodes) \
                     for c in meta.computations.values()])
 
+def select_tasks(zookeeper, zkpath, cache_ttl=None, **criteria):
+    """ Tasks matching 'criteria', see TaskIndex.select"""
+    meta = get_zookeeper_metadata(zookeeper, zkpath, cache_ttl,
+                                  partial(decode_metadata,
+                                          node_fields=INDEX_FIELDS))
+    if meta is None:
+        return []
+    return TaskIndex(meta).select(**criteria)
+
+def task_dict(task):
+    node, helper = task.node, task.node.taskHelper
+    return { 'computation': task.computation,
+             'task_id': node.taskId,
+             'slave_id': node.slaveId,
+             'host': helper.client.ip if helper and helper.client else None,
+             'cpus': node.cpus,
+             'mem': node.mem,
+             'docker': helper.dockerContainer if helper else None,
+             'reconciling': bool(node.needsReconciliation) }
+
+def print_tasks(tasks, as_json=False):
+    rows = map(task_dict, tasks)
+    if as_json:
+        print json.dumps(rows, indent=4, sort_keys=True,
+                         separators=(',', ': '))
+        return
+    table = [['Computation', 'Task id', 'Slave', 'Host', 'cpus', 'mem',
+              'Docker', 'Reconciling']]
+    for row in rows:
+        table.append([row['computation'], row['task_id'],
+                      row['slave_id'] or '', row['host'] or '',
+                      str(row['cpus']), str(row['mem']), row['docker'] or '',
+                      'yes' if row['reconciling'] else ''])
+    print AsciiTable(table).table
+    print '%d tasks match' % len(rows)
+
 def parse_input(iterable, user_input):
     """ Parses user input and either will abort or return the data at
     a given index or indicies or range"""
@@ -121,6 +257,11 @@ def prompt_selection(iterable, heading, printer):
 
     return parse_input(iterable, inpt)
 
+NODE_PROMPT_FIELDS = ['taskId', 'cpus', 'mem']
+
+# Seconds to wait for the first read of the topology
+WATCH_TIMEOUT = 30
+
 def prompt_nodes(pcomp_metadata):
     def pcomp_printable(pcomp_metadata):
         return [pcomp_metadata.taskId,
@@ -146,40 +287,87 @@ def prompt_computations(pcomp_layout):
     selection = prompt_selection(pcomp_layout, header, layout_printable)
     return flatten(map(lambda c: c.nodes, selection))
 
-def interactive_mode(zookeeper, zk_path):
+def interactive_mode(zookeeper, zk_path, **kill_options):
     """ presents to the user an easy to use prompt so that they may selectively
-    search through computations and eventually choose a concord node to kill"""
+    search through computations and eventually choose a concord node to kill.
+    The topology is watched while the prompts wait, changes are printed and
+    selected tasks that are gone by the end are not killed"""
     print 'Querying zookeeper for cluster topology...'
-    meta = get_zookeeper_metadata(zookeeper, zk_path)
+    def changed(meta, diff):
+        if diff:
+            print '\nTopology changed: %s' % diff
 
-    # Exit on failure, or if no computations exist
-    if meta == None:
+    try:
+        # Only what the prompts show, nodes are decoded once a computation
+        # is picked
+        watcher = TopologyWatcher(zookeeper, zk_path,
+                                  decode=partial(decode_metadata,
+                                                 node_fields=NODE_PROMPT_FIELDS))
+    except Exception as e:
+        logger.exception(e)
         logger.critical('Could not connect to zk')
-        return
-    elif meta.computations == None or len(meta.computations) == 0:
-        logger.info('No computations to report')
-        return
+        return []
+    try:
+        meta = watcher.wait(WATCH_TIMEOUT)
+
+        # Exit on failure, or if no computations exist
+        if meta == None:
+            logger.critical('Could not read the topology from zk')
+            return []
+        elif meta.computations == None or len(meta.computations) == 0:
+            logger.info('No computations to report')
+            return []
+
+        # Registered after the first read, which is not a change
+        watcher.add_callback(changed)
+        selection = meta.computations.values()
+        user_path = [prompt_computations, prompt_nodes]
+        for current_action in user_path:
+            selection = current_action(selection)
 
-    selection = meta.computations.values()
-    user_path = [prompt_computations, prompt_nodes]
-    for current_action in user_path:
-        selection = current_action(selection)
+        live = watcher.task_ids()
+        gone = [task_id for task_id in selection if task_id not in live]
+        if gone:
+            logger.warning("Not killing %d tasks that no longer exist: %s",
+                           len(gone), ", ".join(gone))
+        selection = [task_id for task_id in selection if task_id in live]
+    finally:
+        watcher.stop()
 
     # Terminate selected node
-    kill(zookeeper, zk_path, selection)
+    return kill(zookeeper, zk_path, selection, **kill_options)
 
 def main():
     parser = generate_options()
     options = parser.parse_args()
     validate_options(options, parser)
 
-    if options.all:
-        kill(options.zookeeper, options.zk_path,
-             collect_taskids(options.zookeeper, options.zk_path))
+    kill_options = dict(protocol=options.protocol,
+                        concurrency=options.concurrency, rate=options.rate,
+                        retries=options.retries)
+    criteria = selectors(options)
+    if criteria or options.dry_run:
+        tasks = select_tasks(options.zookeeper, options.zk_path,
+                             options.cache_ttl, **criteria)
+        if options.dry_run:
+            print_tasks(tasks, options.json)
+            return
+        logger.info("%d tasks match", len(tasks))
+        results = kill(options.zookeeper, options.zk_path,
+                       [task.node.taskId for task in tasks], **kill_options)
+    elif options.all:
+        results = kill(options.zookeeper, options.zk_path,
+                       collect_taskids(options.zookeeper, options.zk_path,
+                                       options.cache_ttl), **kill_options)
     elif options.task_id:
-        kill(options.zookeeper, options.zk_path, [options.task_id])
+        results = kill(options.zookeeper, options.zk_path, [options.task_id],
+                       **kill_options)
     else:
-        interactive_mode(options.zookeeper, options.zk_path)
+        results = interactive_mode(options.zookeeper, options.zk_path,
+                                   **kill_options)
+    report(results, options.json)
+    if failed(results):
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,223 @@
+"""
+Partial decoding of TopologyMetadata. Commands that only list computations
+or collect task ids do not need every node's ExecutorTaskInfoHelper, with
+its argument and environment lists, built as python objects.
+
+Fields left out of a thrift_spec are skipped on the wire, by the fastbinary
+extension when it is available and by walking the raw bytes otherwise.
+Computations remember where their PhysicalComputationLayout starts and
+decode their nodes on first access:
+
+    meta = decode_metadata(data, node_fields=['taskId'])
+    ids = [n.taskId for c in meta.computations.values() for n in c.nodes]
+"""
+
+import struct
+from concord.internal.thrift.ttypes import (TopologyMetadata,
+                                            PhysicalComputationLayout,
+                                            PhysicalComputationMetadata)
+from thrift.Thrift import TType
+from thrift.transport import TTransport
+try:
+    from thrift.protocol import fastbinary
+except ImportError:
+    fastbinary = None
+
+def prune_spec(spec, fields):
+    """ Copy of the thrift_spec 'spec' keeping only 'fields'. Fields of
+    nested structs are dotted, 'taskHelper.execName' keeps execName alone.
+    A struct field listed without a dot is kept whole"""
+    nested = {}
+    for field in fields:
+        name, _, rest = field.partition('.')
+        nested.setdefault(name, []).append(rest)
+    pruned = [None] * len(spec)
+    for i, entry in enumerate(spec):
+        if entry is None or entry[2] not in nested:
+            continue
+        subfields = nested[entry[2]]
+        if '' in subfields:
+            pruned[i] = entry
+        else:
+            pruned[i] = entry[:3] + (_prune_args(entry[1], entry[3],
+                                                 subfields),) + entry[4:]
+    return tuple(pruned)
+
+def _prune_args(ttype, args, fields):
+    """ Prunes the struct inside a struct, list, set or map type"""
+    if ttype == TType.STRUCT:
+        return (args[0], prune_spec(args[1], fields))
+    if ttype in (TType.LIST, TType.SET):
+        return (args[0], _prune_args(args[0], args[1], fields))
+    if ttype == TType.MAP:
+        return args[:3] + (_prune_args(args[2], args[3], fields),)
+    raise ValueError("Fields %s of a non struct field" % ", ".join(fields))
+
+# Readers over the raw bytes, faster than going through TBinaryProtocol
+_I32 = struct.Struct('!i')
+_LIST = struct.Struct('!bi')
+_MAP = struct.Struct('!bbi')
+_FIELD = struct.Struct('!bh')
+_FIXED = { TType.BOOL: struct.Struct('!?'), TType.BYTE: struct.Struct('!b'),
+           TType.I16: struct.Struct('!h'), TType.I32: _I32,
+           TType.I64: struct.Struct('!q'), TType.DOUBLE: struct.Struct('!d') }
+
+def _skip(data, pos, ttype):
+    """ Position right after the value of type 'ttype' at 'pos'"""
+    if ttype in _FIXED:
+        return pos + _FIXED[ttype].size
+    if ttype == TType.STRING:
+        return pos + 4 + _I32.unpack_from(data, pos)[0]
+    if ttype == TType.STRUCT:
+        while True:
+            ftype = ord(data[pos])
+            if ftype == TType.STOP:
+                return pos + 1
+            pos = _skip(data, pos + 3, ftype)
+    if ttype in (TType.LIST, TType.SET):
+        etype, size = _LIST.unpack_from(data, pos)
+        pos += 5
+        if etype in _FIXED:
+            return pos + size * _FIXED[etype].size
+        for _ in xrange(size):
+            pos = _skip(data, pos, etype)
+        return pos
+    if ttype == TType.MAP:
+        ktype, vtype, size = _MAP.unpack_from(data, pos)
+        pos += 6
+        for _ in xrange(size):
+            pos = _skip(data, _skip(data, pos, ktype), vtype)
+        return pos
+    raise ValueError("Unknown thrift type %d" % ttype)
+
+def _read_value(data, pos, ttype, args):
+    """ Returns (value, position after it)"""
+    if ttype in _FIXED:
+        fixed = _FIXED[ttype]
+        return fixed.unpack_from(data, pos)[0], pos + fixed.size
+    if ttype == TType.STRING:
+        end = pos + 4 + _I32.unpack_from(data, pos)[0]
+        return data[pos + 4:end], end
+    if ttype == TType.STRUCT:
+        return _read_struct(data, pos, args[0](), args[1])
+    if ttype in (TType.LIST, TType.SET):
+        etype, size = _LIST.unpack_from(data, pos)
+        pos += 5
+        values = []
+        for _ in xrange(size):
+            value, pos = _read_value(data, pos, etype, args[1])
+            values.append(value)
+        return (values if ttype == TType.LIST else set(values)), pos
+    ktype, vtype, size = _MAP.unpack_from(data, pos)
+    pos += 6
+    values = {}
+    for _ in xrange(size):
+        key, pos = _read_value(data, pos, ktype, args[1])
+        values[key], pos = _read_value(data, pos, vtype, args[3])
+    return values, pos
+
+def _read_struct(data, pos, obj, spec):
+    """ Pure python equivalent of fastbinary.decode_binary"""
+    while True:
+        ftype = ord(data[pos])
+        if ftype == TType.STOP:
+            return obj, pos + 1
+        _, fid = _FIELD.unpack_from(data, pos)
+        pos += 3
+        entry = spec[fid] if 0 <= fid < len(spec) else None
+        if entry is None or entry[1] != ftype:
+            pos = _skip(data, pos, ftype)
+        else:
+            value, pos = _read_value(data, pos, ftype, entry[3])
+            setattr(obj, entry[2], value)
+
+def decode_struct(data, pos, cls, spec):
+    """ Reads a 'cls' at 'pos' in 'data' following 'spec', which may be
+    pruned. Fields outside of it keep their default value. Returns the
+    struct and the position right after it"""
+    obj = cls()
+    if fastbinary is None:
+        return _read_struct(data, pos, obj, spec)
+    trans = TTransport.TMemoryBuffer(data)
+    trans.cstringio_buf.seek(pos)
+    fastbinary.decode_binary(obj, trans, (cls, spec))
+    return obj, trans.cstringio_buf.tell()
+
+class LazyComputationLayout(object):
+    """ PhysicalComputationLayout whose nodes are decoded on first access"""
+    def __init__(self, layout, data, start, end, nodes_spec):
+        self.name = layout.name
+        self.istreams = layout.istreams
+        self.ostreams = layout.ostreams
+        # Where the layout is in the encoded metadata
+        self._at = (data, start, end)
+        self._nodes_spec = nodes_spec
+        self._nodes = None
+
+    @property
+    def nodes(self):
+        # Read once, another thread may be decoding the nodes as well
+        at = self._at
+        if at is not None:
+            data, start, _ = at
+            layout, _ = decode_struct(data, start, PhysicalComputationLayout,
+                                      self._nodes_spec)
+            self._nodes = layout.nodes
+            # The encoded metadata may go once every computation is decoded
+            self._at = None
+        return self._nodes
+
+    def encoded(self):
+        """ The bytes of the layout in the encoded metadata, None once its
+        nodes were decoded. Equal bytes mean equal nodes"""
+        at = self._at
+        if at is None:
+            return None
+        data, start, end = at
+        return buffer(data, start, end - start)
+
+_NODES = PhysicalComputationLayout.thrift_spec[4]
+_LAYOUT_SPEC = prune_spec(PhysicalComputationLayout.thrift_spec,
+                          ['name', 'istreams', 'ostreams'])
+
+def decode_metadata(data, node_fields=None):
+    """ TopologyMetadata from 'data' where computations decode their nodes
+    when first accessed, with only 'node_fields' of each
+    PhysicalComputationMetadata filled in, see prune_spec. All fields when
+    'node_fields' is None"""
+    node_spec = PhysicalComputationMetadata.thrift_spec
+    if node_fields is not None:
+        node_spec = prune_spec(node_spec, node_fields)
+    nodes_spec = [None] * len(_LAYOUT_SPEC)
+    nodes_spec[4] = _NODES[:3] + ((TType.STRUCT,
+                                   (PhysicalComputationMetadata, node_spec)),) \
+        + _NODES[4:]
+    nodes_spec = tuple(nodes_spec)
+
+    spec = TopologyMetadata.thrift_spec
+    meta = TopologyMetadata()
+    pos = 0
+    while True:
+        ftype = ord(data[pos])
+        if ftype == TType.STOP:
+            break
+        _, fid = _FIELD.unpack_from(data, pos)
+        pos += 3
+        if fid == 2 and ftype == TType.MAP:
+            _, _, size = _MAP.unpack_from(data, pos)
+            pos += 6
+            meta.computations = {}
+            for _ in xrange(size):
+                name, start = _read_value(data, pos, TType.STRING, None)
+                layout, pos = decode_struct(data, start,
+                                            PhysicalComputationLayout,
+                                            _LAYOUT_SPEC)
+                meta.computations[name] = LazyComputationLayout(
+                    layout, data, start, pos, nodes_spec)
+        elif 0 <= fid < len(spec) and spec[fid] is not None and \
+                spec[fid][1] == ftype:
+            value, pos = _read_value(data, pos, ftype, spec[fid][3])
+            setattr(meta, spec[fid][2], value)
+        else:
+            pos = _skip(data, pos, ftype)
+    return meta
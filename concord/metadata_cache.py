@@ -0,0 +1,86 @@
+"""
+Local copy of the TopologyMetadata znode of each cluster. The metadata of a
+large topology runs into megabytes, downloading and decoding it on every
+graph or kill is the bulk of their run time. Entries hold the raw bytes,
+the decoded struct and the znode Stat; a later run only asks zookeeper for
+the Stat and keeps the local copy when the znode has not been written since.
+"""
+
+import os
+import json
+import time
+import hashlib
+import cPickle as pickle
+from concord.utils import (build_logger, concord_home_path,
+                           human_readable_units, write_atomic)
+
+logger = build_logger('cmd.metadata_cache')
+
+# Seconds an entry is trusted for, older entries are downloaded again even
+# if the znode looks unchanged
+DEFAULT_TTL = 3600
+# Stat fields that change whenever the znode is rewritten or recreated
+STAT_KEYS = ['czxid', 'mzxid', 'version', 'data_length']
+
+def _cache_path(zookeeper_hosts, zookeeper_path, extension):
+    key = hashlib.sha1('\0'.join([zookeeper_hosts, zookeeper_path]))
+    return concord_home_path('metadata', key.hexdigest() + extension)
+
+def stat_dict(stat):
+    return dict((k, getattr(stat, k)) for k in STAT_KEYS)
+
+def lookup(zookeeper_hosts, zookeeper_path, stat, ttl=DEFAULT_TTL,
+           load_decoded=True):
+    """ Returns (raw bytes, decoded) when the cached entry matches 'stat' and
+    is younger than 'ttl' seconds, None otherwise. 'decoded' is None when
+    only the raw bytes could be read back or 'load_decoded' is False"""
+    meta_path = _cache_path(zookeeper_hosts, zookeeper_path, '.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as meta_file:
+        meta = json.load(meta_file)
+    age = time.time() - meta['fetched']
+    if age > ttl:
+        logger.debug("Cached metadata of %s is %ds old, refreshing",
+                     zookeeper_path, age)
+        return None
+    if meta['stat'] != stat_dict(stat):
+        logger.debug("Metadata of %s changed since it was cached",
+                     zookeeper_path)
+        return None
+    with open(_cache_path(zookeeper_hosts, zookeeper_path, '.bin'),
+              'rb') as data_file:
+        data = data_file.read()
+    if len(data) != stat.data_length:
+        logger.warning("Cached metadata of %s is corrupt, ignoring it",
+                       zookeeper_path)
+        return None
+    decoded = None
+    pickle_path = _cache_path(zookeeper_hosts, zookeeper_path, '.pickle')
+    if load_decoded and os.path.exists(pickle_path):
+        try:
+            with open(pickle_path, 'rb') as pickle_file:
+                decoded = pickle.load(pickle_file)
+        except Exception as e:
+            # Written by another version of the cli, the raw bytes still work
+            logger.debug("Could not load decoded metadata: %s", e)
+    logger.info("Using cached metadata of %s (%s, version %d)",
+                zookeeper_path, human_readable_units(len(data)), stat.version)
+    return (data, decoded)
+
+def store(zookeeper_hosts, zookeeper_path, data, stat, decoded):
+    """ Caches the znode contents 'data', read along with 'stat', and the
+    struct decoded from it if given"""
+    meta_path = _cache_path(zookeeper_hosts, zookeeper_path, '.json')
+    # Without the .json the other files are never read, drop it first so a
+    # crash halfway leaves no mismatched entry behind
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    write_atomic(_cache_path(zookeeper_hosts, zookeeper_path, '.bin'), data)
+    pickle_path = _cache_path(zookeeper_hosts, zookeeper_path, '.pickle')
+    if decoded is not None:
+        write_atomic(pickle_path, pickle.dumps(decoded, pickle.HIGHEST_PROTOCOL))
+    elif os.path.exists(pickle_path):
+        os.remove(pickle_path)
+    write_atomic(meta_path, json.dumps({ 'stat': stat_dict(stat),
+                                         'fetched': time.time() }))
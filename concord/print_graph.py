@@ -1,11 +1,11 @@
 #!/usr/bin/env python
 from optparse import OptionParser
 from graphviz import Digraph
-from kazoo.client import KazooClient
 from concord.internal.thrift.ttypes import *
 from operator import attrgetter
 
 import json
+import time
 import logging
 
 from thrift.protocol import TJSONProtocol, TBinaryProtocol
@@ -13,6 +13,9 @@ from thrift.transport import TTransport
 
 from concord.utils import *
 from concord.thrift_utils import *
+from concord.metadata_cache import DEFAULT_TTL
+from concord.compact_metadata import compact_metadata
+from concord.topology_watcher import TopologyWatcher
 
 logger = build_logger('cmd.print_graph')
 
@@ -30,6 +33,16 @@ def generate_options():
     parser.add_option("-f", "--file", help="output file",
                       default="dependency_graph",
                       action="store", dest="filename")
+    parser.add_option("--cache-ttl", dest="cache_ttl", type="int",
+                      help="Seconds a local copy of the metadata is reused "
+                      "for while unchanged on zookeeper, default %d" %
+                      DEFAULT_TTL)
+    parser.add_option("--no-cache", dest="cache_ttl", action="store_const",
+                      const=None, help="Always download the metadata")
+    parser.add_option("-w", "--watch", action="store_true", dest="watch",
+                      help="Render the graph again each time the topology "
+                      "changes, until interrupted")
+    parser.set_defaults(cache_ttl=DEFAULT_TTL)
     return parser
 
 
@@ -52,7 +65,8 @@ def print_physical(node, name):
             node.taskHelper.dockerContainer, node.needsReconciliation)
 
 def print_single_stream(s):
-    return json.dumps(s, default=lambda o: o.__dict__, indent=4)
+    # Thrift struct or compact_metadata.StreamMetadata
+    return json.dumps({ 'name': s.name, 'grouping': s.grouping }, indent=4)
 
 def print_edge(comp1, comp2, dot):
     for streamMetadata in comp1.istreams:
@@ -64,10 +78,12 @@ def print_edge(comp1, comp2, dot):
                     dot.edge(node2.taskId, node1.taskId,
                              label=print_single_stream(streamMetadata))
 
-def print_dot(meta, filename):
+def print_dot(meta, filename, view=True):
+    """ Renders the graph of 'meta' to 'filename'. False when there was
+    nothing to render"""
     if meta == None or meta.computations == None:
         logger.error('No graph to trace')
-        return
+        return False
 
     dot = Digraph(comment='Concord Systems',
                   node_attr={"shape":"rectangle",
@@ -85,15 +101,39 @@ def print_dot(meta, filename):
             print_edge(comp1, comp2, dot)
 
     logger.info("Graph generated, rendering now")
-    dot.render(filename, view=True, cleanup=True)
+    dot.render(filename, view=view, cleanup=True)
+    return True
+
+def watch_dot(zookeeper, zk_path, filename):
+    """ Renders the graph each time the topology changes until ctrl-c, the
+    viewer is only opened by the first render that produced a graph"""
+    shown = [False]
+    def changed(meta, diff):
+        if shown[0]:
+            logger.info("Topology changed: %s", diff)
+        if print_dot(meta, filename, view=not shown[0]):
+            shown[0] = True
+
+    watcher = TopologyWatcher(zookeeper, zk_path, changed, compact_metadata)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
 
 
 def main():
     parser = generate_options()
     (options, args) = parser.parse_args()
-    default_options(options)
+    default_options(options, parser)
 
-    print_dot(get_zookeeper_metadata(options.zookeeper, options.zk_path),
+    if options.watch:
+        watch_dot(options.zookeeper, options.zk_path, options.filename)
+        return
+    print_dot(get_zookeeper_metadata(options.zookeeper, options.zk_path,
+                                     options.cache_ttl, compact_metadata),
               options.filename)
 
 if __name__ == "__main__":
@@ -0,0 +1,152 @@
+"""
+Byte counting around the scheduler socket: a progress bar for long uploads,
+separate send and receive timeouts and the effective upload throughput.
+"""
+
+import sys
+import time
+import socket
+from concord.utils import build_logger, human_readable_units
+from thrift.transport.TTransport import TTransportException
+
+logger = build_logger('cmd.progress')
+
+# Most bytes passed to send() at once, keeps the bar moving on large writes
+SEND_SLICE = 256 * 1024
+# Seconds between redraws of the bar and between log lines without a tty
+REDRAW_INTERVAL = 0.2
+LOG_INTERVAL = 10
+BAR_WIDTH = 30
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return "%d:%02d:%02d" % (hours, minutes, seconds)
+    return "%02d:%02d" % (minutes, seconds)
+
+class ProgressBar(object):
+    """ Reports how much of 'total' bytes went out. Draws a bar on 'stream'
+    when interactive and it is a terminal, logs a line every LOG_INTERVAL
+    seconds otherwise"""
+    def __init__(self, label, total, interactive=True, stream=sys.stderr):
+        self.label = label
+        self.total = max(total, 1)
+        self.stream = stream
+        self.interactive = interactive and stream.isatty()
+        self.start = time.time()
+        # The first log line comes after LOG_INTERVAL, the bar shows at once
+        self.last = 0 if self.interactive else self.start
+
+    def stats(self, done):
+        elapsed = max(time.time() - self.start, 1e-6)
+        rate = done / elapsed
+        remaining = max(self.total - done, 0)
+        eta = remaining / rate if rate > 0 else None
+        return (min(done, self.total), rate, eta)
+
+    def update(self, done, final=False):
+        now = time.time()
+        interval = REDRAW_INTERVAL if self.interactive else LOG_INTERVAL
+        if not final and now - self.last < interval:
+            return
+        self.last = now
+        done, rate, eta = self.stats(done)
+        if self.interactive:
+            filled = BAR_WIDTH * done // self.total
+            self.stream.write("\r%s [%s%s] %3d%% %s/%s %s/s ETA %s " % (
+                self.label, '#' * filled, ' ' * (BAR_WIDTH - filled),
+                100 * done // self.total, human_readable_units(done),
+                human_readable_units(self.total), human_readable_units(rate),
+                format_eta(eta)))
+            if final:
+                self.stream.write("\n")
+            self.stream.flush()
+        else:
+            logger.info("%s: sent %s of %s at %s/s, ETA %s", self.label,
+                        human_readable_units(done),
+                        human_readable_units(self.total),
+                        human_readable_units(rate), format_eta(eta))
+
+    def finish(self, done):
+        self.update(done, final=True)
+
+class MeteredSocket(object):
+    """ Stands in for the socket of a TSocket. Counts the bytes going each
+    way and applies 'send_timeout' and 'recv_timeout' seconds to writes and
+    reads, None waits forever. A timeout is the longest the peer may go
+    without accepting or sending a single byte"""
+    def __init__(self, sock, send_timeout=None, recv_timeout=None):
+        self.sock = sock
+        self.send_timeout = send_timeout
+        self.recv_timeout = recv_timeout
+        self.timeout = sock.gettimeout()
+        self.watch(None)
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+    def watch(self, progress):
+        """ Resets the counters and reports sends to 'progress' from now on"""
+        self.progress = progress
+        self.sent = 0
+        self.received = 0
+        self.first_send = None
+        self.last_send = None
+
+    def send_seconds(self):
+        if self.first_send is None:
+            return 0.0
+        return self.last_send - self.first_send
+
+    def _settimeout(self, timeout):
+        if timeout != self.timeout:
+            self.sock.settimeout(timeout)
+            self.timeout = timeout
+
+    def _sent(self, n):
+        now = time.time()
+        if self.first_send is None:
+            self.first_send = now
+        self.last_send = now
+        self.sent += n
+        if self.progress is not None:
+            self.progress.update(self.sent)
+
+    def _timed_out(self, direction, timeout):
+        raise TTransportException(
+            TTransportException.TIMED_OUT,
+            "Scheduler did not %s a byte in %ss, %s sent, %s received" % (
+                direction, timeout, human_readable_units(self.sent),
+                human_readable_units(self.received)))
+
+    def send(self, data):
+        self._settimeout(self.send_timeout)
+        try:
+            n = self.sock.send(data)
+        except socket.timeout:
+            self._timed_out("accept", self.send_timeout)
+        self._sent(n)
+        return n
+
+    def sendall(self, data):
+        self._settimeout(self.send_timeout)
+        view = memoryview(data)
+        try:
+            while len(view) > 0:
+                n = self.sock.send(view[:SEND_SLICE])
+                self._sent(n)
+                view = view[n:]
+        except socket.timeout:
+            self._timed_out("accept", self.send_timeout)
+
+    def recv(self, size):
+        self._settimeout(self.recv_timeout)
+        try:
+            data = self.sock.recv(size)
+        except socket.timeout:
+            self._timed_out("send", self.recv_timeout)
+        self.received += len(data)
+        return data
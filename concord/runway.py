@@ -19,6 +19,7 @@ from concord.deploy import (parseFile, register)
 from concord.functional_utils import (find_first_of, flat_map)
 from concord.utils import (build_logger, default_options, docker_metadata)
 from concord.utils import CONCORD_DEFAULTS
+from concord.thrift_utils import PROTOCOLS
 
 logger = build_logger('cmd.runway')
 
@@ -44,6 +45,9 @@ def generate_options():
                         help="i.e: 1.2.3.4:2181,2.3.4.5:2181", action="store")
     parser.add_argument("-r", "--repository", metavar="repo-url", action="store",
                         help="URL to a runway repository")
+    parser.add_argument("--protocol", choices=PROTOCOLS,
+                        help="Thrift protocol spoken to the scheduler,"
+                        " defaults to the scheduler_protocol setting")
     return parser
 
 def validate_enrich_metadata(metadata):
@@ -218,7 +222,8 @@ def runway_deploy(connector, ver, parser, options):
     logger.debug("Runway Manifest options: ")
     logger.debug(str(runway_manifest))
     try:
-        register(parseFile(tmp_manifest, parser), tmp_manifest)
+        register(parseFile(tmp_manifest, parser), tmp_manifest,
+                 protocol=options.protocol)
     except Exception as e:
         logger.critical("Error when attempting to deploy operator: " + str(e))
     finally:
@@ -239,7 +244,7 @@ def construct_runway_url(repo_url):
 def main():
     parser = generate_options()
     options = parser.parse_args()
-    default_options(options)
+    default_options(options, parser)
     runway_url = construct_runway_url(options.repository)
 
     # 1. Parse runway metadata, ensure it is matches with hub.docker.com, present list to user
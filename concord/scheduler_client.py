@@ -0,0 +1,205 @@
+"""
+Scheduler client that follows the leader. The address in
+<zk_path>/masterip is watched, so a fail over is noticed as it happens.
+Calls that broke off because the leader went away are retried against the
+new one with jittered exponential backoff.
+"""
+
+import time
+import random
+import socket
+import threading
+from kazoo.recipe.watchers import DataWatch
+from concord import zero_copy
+from concord.thrift_utils import open_sched_service_client, DEFAULT_PROTOCOL
+from concord.zk_utils import zk_session
+from concord.utils import build_logger
+from thrift.transport.TTransport import TTransportException
+
+logger = build_logger('cmd.scheduler_client')
+
+# Connection level failures, BoltError and TApplicationException come from
+# the scheduler itself and are never retried
+RETRYABLE_ERRORS = (TTransportException, socket.error, EOFError)
+DEFAULT_RETRIES = 5
+BASE_BACKOFF = 0.5
+MAX_BACKOFF = 10.0
+# Seconds to wait for a scheduler to be elected
+LEADER_TIMEOUT = 15
+
+def backoff(attempt):
+    """ 'Full jitter': uniform in [0, min(cap, base * 2^attempt)], clients
+    retrying together do not all hit the new leader at the same moment"""
+    return random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt))
+
+class LeaderWatch(object):
+    """ The current scheduler address, kept up to date by a zookeeper watch
+    on <zk_path>/masterip. 'zk' must be started"""
+    def __init__(self, zk, zk_path):
+        self.path = zk_path + '/masterip'
+        self.cond = threading.Condition()
+        self.address = None
+        # Calls _changed right away with the current value
+        DataWatch(zk, self.path, self._changed)
+
+    def _changed(self, data, stat):
+        address = str(data) if data else None
+        with self.cond:
+            if address != self.address:
+                if self.address is not None:
+                    logger.warning("Scheduler leader moved from %s to %s",
+                                   self.address, address or "nowhere")
+                self.address = address
+            self.cond.notify_all()
+
+    def wait(self, timeout=LEADER_TIMEOUT):
+        """ Returns 'host:port' of the leader, waiting up to 'timeout'
+        seconds for one to be elected"""
+        deadline = time.time() + timeout
+        with self.cond:
+            while self.address is None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TTransportException(
+                        TTransportException.NOT_OPEN,
+                        "No scheduler leader found at " + self.path)
+                self.cond.wait(remaining)
+            return self.address
+
+class SchedulerClient(object):
+    """ Connects to whichever scheduler 'leader' points to and reconnects
+    when that changes. Idempotent calls are retried up to 'retries' times on
+    connection failures. Not thread safe, use one per thread. 'protocol' is
+    one of thrift_utils.PROTOCOLS"""
+    def __init__(self, leader, send_timeout=None, recv_timeout=None,
+                 retries=DEFAULT_RETRIES, protocol=DEFAULT_PROTOCOL):
+        self.leader = leader
+        self.send_timeout = send_timeout
+        self.recv_timeout = recv_timeout
+        self.retries = retries
+        self.protocol = protocol
+        self.address = None
+        self.client = None
+        # TSocket of the current connection, its handle is a MeteredSocket
+        self.socket = None
+        self.meter = None
+        # Tries the last call took
+        self.attempts = 0
+
+    def connect(self):
+        """ Returns the thrift client for the current leader"""
+        address = self.leader.wait()
+        if self.client is not None and address == self.address:
+            return self.client
+        self.close()
+        host, port = address.split(':')
+        logger.debug("Connecting to scheduler at %s", address)
+        self.client, self.socket = open_sched_service_client(
+            host, int(port), self.send_timeout, self.recv_timeout,
+            self.protocol)
+        self.address = address
+        self.meter = self.socket.handle
+        return self.client
+
+    def close(self):
+        if self.client is not None:
+            self.client._oprot.trans.close()
+        self.client = None
+        self.socket = None
+        self.meter = None
+
+    def _retrying(self, name, attempt):
+        for i in xrange(self.retries + 1):
+            self.attempts = i + 1
+            try:
+                return attempt(self.connect())
+            except RETRYABLE_ERRORS as e:
+                address = self.address
+                self.close()
+                if i == self.retries:
+                    raise
+                delay = backoff(i)
+                logger.warning("%s on scheduler %s failed: %s, retrying in "
+                               "%.1fs", name, address, e, delay)
+                time.sleep(delay)
+
+    def killTask(self, task_id):
+        return self._retrying('killTask', lambda cli: cli.killTask(task_id))
+
+    def getComputationSlug(self, computation_name):
+        return self._retrying('getComputationSlug',
+                              lambda cli: cli.getComputationSlug(
+                                  computation_name))
+
+    def deploy_computation(self, req, slug=None, progress=None):
+        """ Sends 'req', streaming the contents of 'slug' as req.slug when
+        given. The scheduler only acts on a call once it has the whole
+        frame, so failures while sending are retried. Once sent, failures
+        are raised since the deploy may have gone through"""
+        def send(cli):
+            if self.meter is not None:
+                self.meter.watch(progress)
+            if slug is None:
+                cli.send_deployComputation(req)
+            else:
+                zero_copy.send_deploy_computation(cli, req, slug,
+                                                  sock=self.socket)
+        self._retrying('deployComputation', send)
+        try:
+            return self.client.recv_deployComputation()
+        except RETRYABLE_ERRORS:
+            self.close()
+            raise
+
+class SchedulerPool(object):
+    """ Scheduler clients shared between threads. The leader of each
+    (hosts, path) is watched once, on the zookeeper session shared by the
+    process. A client is handed to one thread at a time and returned to the
+    pool once it is done with it. Timeouts and protocol apply to every
+    client, see get_sched_service_client"""
+    def __init__(self, send_timeout=None, recv_timeout=None,
+                 retries=DEFAULT_RETRIES, protocol=DEFAULT_PROTOCOL):
+        self.send_timeout = send_timeout
+        self.recv_timeout = recv_timeout
+        self.retries = retries
+        self.protocol = protocol
+        self.lock = threading.Lock()
+        self.watches = {}
+        self.idle = {}
+
+    def watch(self, zkurl, zkpath):
+        with self.lock:
+            key = (zkurl, zkpath)
+            if key not in self.watches:
+                self.watches[key] = LeaderWatch(zk_session(zkurl), zkpath)
+            return self.watches[key]
+
+    def leader(self, zkurl, zkpath):
+        """ Returns the 'host:port' of the current scheduler"""
+        return self.watch(zkurl, zkpath).wait()
+
+    def acquire(self, zkurl, zkpath):
+        """ Returns a SchedulerClient for the caller's exclusive use until it
+        is given back with release()"""
+        with self.lock:
+            idle = self.idle.get((zkurl, zkpath))
+            if idle:
+                return idle.pop()
+        return SchedulerClient(self.watch(zkurl, zkpath), self.send_timeout,
+                               self.recv_timeout, self.retries, self.protocol)
+
+    def release(self, zkurl, zkpath, cli, reusable=True):
+        """ Returns 'cli' to the pool, a client whose last call failed should
+        not be reused and is closed instead"""
+        if not reusable:
+            cli.close()
+            return
+        with self.lock:
+            self.idle.setdefault((zkurl, zkpath), []).append(cli)
+
+    def close(self):
+        with self.lock:
+            for clients in self.idle.itervalues():
+                for cli in clients:
+                    cli.close()
+            self.idle = {}
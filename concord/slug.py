@@ -0,0 +1,176 @@
+"""
+Builds the compressed tarball (the 'slug') that is shipped to the scheduler
+alongside a BoltComputationRequest.
+"""
+
+import os
+import time
+import hashlib
+import tarfile
+import tempfile
+from cStringIO import StringIO
+from concord.compression import open_writer, DEFAULT_CODEC, DEFAULT_LEVEL
+from concord.utils import build_logger, human_readable_units
+
+logger = build_logger('cmd.slug')
+
+# Slugs smaller than this are kept in memory, bigger ones spill to a temp file
+SPOOL_THRESHOLD = 16 * 1024 * 1024
+# Largest piece of a slug held in memory at once by chunks()
+CHUNK_SIZE = 1024 * 1024
+
+def source_date_epoch():
+    """ Timestamp stamped on every entry of a deterministic slug, honours
+    https://reproducible-builds.org/specs/source-date-epoch/"""
+    return int(os.environ.get('SOURCE_DATE_EPOCH', 0))
+
+class Slug(object):
+    """ Handle to a built slug. 'fileobj' is positioned at the start of the
+    archive and is owned by this object, call close() when finished"""
+    def __init__(self, fileobj, size, elapsed, digest=None,
+                 codec=DEFAULT_CODEC):
+        self.fileobj = fileobj
+        self.size = size
+        self.elapsed = elapsed
+        self.digest = digest
+        self.codec = codec
+        # Digest of the full slug this one patches, see concord.delta
+        self.delta_base = None
+        # Per file digests to remember once a full slug is deployed
+        self.file_manifest = None
+        # Uncompressed size and time spent compressing, for DeployTimings
+        self.tar_bytes = None
+        self.compress_seconds = None
+
+    def chunks(self, chunk_size=CHUNK_SIZE):
+        """ Iterates over the contents of the slug without reading it whole.
+        Chunks are read into the same buffer each time, so memory stays at
+        one chunk however big the slug is. A chunk is only valid until the
+        next one is requested"""
+        self.fileobj.seek(0)
+        readinto = getattr(self.fileobj, 'readinto', None)
+        try:
+            if readinto is None:
+                # cStringIO and other in memory files
+                for chunk in iter(lambda: self.fileobj.read(chunk_size), ''):
+                    yield chunk
+                return
+            chunk = bytearray(chunk_size)
+            view = memoryview(chunk)
+            while True:
+                n = readinto(chunk)
+                if n == 0:
+                    return
+                yield view[:n]
+        finally:
+            self.fileobj.seek(0)
+
+    def read(self):
+        """ Returns the contents of the slug as a string"""
+        self.fileobj.seek(0)
+        return self.fileobj.read()
+
+    def close(self):
+        self.fileobj.close()
+
+class _DigestWriter(object):
+    """ Hashes everything on its way into 'fileobj'"""
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.hash = hashlib.sha256()
+
+    def write(self, data):
+        self.hash.update(data)
+        self.fileobj.write(data)
+
+    def flush(self):
+        pass
+
+    def digest(self):
+        return 'sha256:' + self.hash.hexdigest()
+
+class _MeteredWriter(object):
+    """ Counts the bytes tar hands to the compressor and the time spent
+    waiting on it"""
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def write(self, data):
+        start = time.time()
+        self.fileobj.write(data)
+        self.seconds += time.time() - start
+        self.bytes += len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        start = time.time()
+        self.fileobj.close()
+        self.seconds += time.time() - start
+
+def build_slug(files, spool_threshold=SPOOL_THRESHOLD, codec=DEFAULT_CODEC,
+               level=DEFAULT_LEVEL, workers=1, deterministic=False,
+               extra_entries=[], root=''):
+    """ Streams a compressed tarball of 'files' into a bounded buffer. Nothing
+    touches the disk unless the archive grows past 'spool_threshold' bytes.
+    See concord.compression for the available codecs. 'extra_entries' is a
+    list of (name, contents) pairs added after the files. 'files' are
+    relative to 'root' and keep that relative name inside the archive.
+
+    In deterministic mode entries are sorted and their timestamps, owners
+    and permissions normalised, so identical sources always produce a
+    byte identical slug with the same digest"""
+    start = time.time()
+    buf = tempfile.SpooledTemporaryFile(max_size=spool_threshold,
+                                        prefix='concord_slug_')
+    hashed = _DigestWriter(buf)
+    mtime = source_date_epoch() if deterministic else int(start)
+    try:
+        out = _MeteredWriter(open_writer(hashed, codec, level, workers, mtime,
+                                         deterministic))
+        try:
+            with tarfile.open(fileobj=out, mode="w|") as tar:
+                if deterministic:
+                    add_files(tar, sorted(files), normalize_tarinfo, root)
+                else:
+                    add_files(tar, files, root=root)
+                for name, contents in extra_entries:
+                    info = tarfile.TarInfo(name)
+                    info.size = len(contents)
+                    info.mtime = mtime
+                    info.mode = 0644
+                    tar.addfile(info, StringIO(contents))
+        finally:
+            out.close()
+    except:
+        buf.close()
+        raise
+
+    size = buf.tell()
+    buf.seek(0)
+    elapsed = time.time() - start
+    logger.debug("Built %s slug of %s in %.2fs (%s)", codec,
+                 human_readable_units(size), elapsed,
+                 "in memory" if size <= spool_threshold else "spilled")
+    slug = Slug(buf, size, elapsed, digest=hashed.digest(), codec=codec)
+    slug.tar_bytes = out.bytes
+    slug.compress_seconds = out.seconds
+    return slug
+
+def normalize_tarinfo(tarinfo):
+    """ Strips everything specific to the machine and checkout from an entry.
+    Permissions are reduced to what git tracks, executable or not"""
+    tarinfo.mtime = source_date_epoch()
+    tarinfo.uid = tarinfo.gid = 0
+    tarinfo.uname = tarinfo.gname = ''
+    if not tarinfo.issym():
+        tarinfo.mode = 0755 if tarinfo.mode & 0111 else 0644
+    return tarinfo
+
+def add_files(tar, files, tarinfo_filter=None, root=''):
+    for name in files:
+        logger.info("Adding tarfile: %s" % name)
+        tar.add(os.path.join(root, name), arcname=name, filter=tarinfo_filter)
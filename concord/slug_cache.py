@@ -0,0 +1,167 @@
+"""
+Content addressed cache of previously built slugs, plus a record of which
+slug was last deployed for each computation. Lets an unchanged redeploy skip
+both the tar step and the upload.
+"""
+
+import os
+import json
+import errno
+import time
+import hashlib
+import tempfile
+from concord.slug import Slug
+from concord.compression import DEFAULT_CODEC
+from concord.utils import (build_logger, concord_home_path,
+                           human_readable_units, write_atomic, load_json)
+
+logger = build_logger('cmd.slug_cache')
+
+# Least recently used slugs are evicted once the cache grows past this, see
+# the slug_cache_max_mb manifest key
+DEFAULT_MAX_MB = 1024
+READ_CHUNK = 1024 * 1024
+
+def file_digest(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), ''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def fingerprint(files, digests=False, salt='', root=''):
+    """ Hash of the file list as it would be tarred: paths, sizes and mtimes
+    and optionally a digest of each file. 'salt' should capture any option
+    that changes the resulting archive, 'files' are relative to 'root'"""
+    h = hashlib.sha1(salt)
+    for path in sorted(files):
+        st = os.stat(os.path.join(root, path))
+        h.update('%s\0%d\0%r\0' % (path, st.st_size, st.st_mtime))
+        if digests:
+            h.update(file_digest(os.path.join(root, path)))
+    return h.hexdigest()
+
+def _slug_path(key):
+    return concord_home_path('slugs', key + '.slug')
+
+def _meta_path(key):
+    return concord_home_path('slugs', key + '.json')
+
+def lookup(key):
+    """ Returns a Slug opened from the cache or None on a miss"""
+    path, meta_path = _slug_path(key), _meta_path(key)
+    if not os.path.exists(path):
+        return None
+    meta = load_json(meta_path)
+    if meta is None:
+        return None
+    if os.path.getsize(path) != meta['size']:
+        logger.warning("Cached slug %s is corrupt, ignoring it", key)
+        return None
+    # Touch so that eviction is least recently used
+    os.utime(path, None)
+    logger.info("Reusing cached slug %s (%s)", key,
+                human_readable_units(meta['size']))
+    return Slug(open(path, 'rb'), meta['size'], 0, digest=meta['digest'],
+                codec=meta.get('codec', DEFAULT_CODEC))
+
+def store(key, slug, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+    """ Copies 'slug' into the cache, which is then trimmed to 'max_bytes'.
+    A slug larger than that is not cached at all"""
+    if slug.size > max_bytes:
+        logger.info("Slug of %s is larger than the cache, not caching it",
+                    human_readable_units(slug.size))
+        return slug
+    path = _slug_path(key)
+    handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(handle, 'wb') as out:
+            slug.fileobj.seek(0)
+            for chunk in iter(lambda: slug.fileobj.read(READ_CHUNK), ''):
+                out.write(chunk)
+        os.rename(tmp_path, path)
+    except:
+        os.remove(tmp_path)
+        raise
+    slug.fileobj.seek(0)
+    write_atomic(_meta_path(key), json.dumps({
+        'size': slug.size, 'digest': slug.digest, 'codec': slug.codec,
+        'created': time.time() }))
+    evict(max_bytes)
+    return slug
+
+def _remove(path):
+    """ Removes 'path' unless another process already did"""
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+def evict(max_bytes):
+    """ Removes the least recently used slugs past 'max_bytes'. Deploys
+    running side by side evict at the same time, files vanishing under one
+    are skipped"""
+    directory = os.path.dirname(_slug_path('x'))
+    slugs = []
+    for name in os.listdir(directory):
+        if not name.endswith('.slug'):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            continue
+        slugs.append((st.st_mtime, st.st_size, path))
+    slugs.sort(reverse=True)
+    total = 0
+    for _, size, path in slugs:
+        total += size
+        if total > max_bytes:
+            logger.debug("Evicting cached slug %s", path)
+            _remove(path)
+            _remove(os.path.splitext(path)[0] + '.json')
+
+def _deploy_record_path(zookeeper_hosts, zookeeper_path, name):
+    key = hashlib.sha1('\0'.join([zookeeper_hosts, zookeeper_path, name]))
+    return concord_home_path('deployed', key.hexdigest() + '.json')
+
+def _throughput_path(zookeeper_hosts, zookeeper_path):
+    key = hashlib.sha1('\0'.join([zookeeper_hosts, zookeeper_path]))
+    return concord_home_path('links', key.hexdigest() + '.json')
+
+def last_throughput(zookeeper_hosts, zookeeper_path):
+    """ Bytes per second of the last sizeable upload to this cluster, None
+    if nothing was measured yet or the record cannot be read"""
+    record = load_json(_throughput_path(zookeeper_hosts, zookeeper_path))
+    if not isinstance(record, dict) or \
+            not isinstance(record.get('bytes_per_sec'), (int, float)):
+        return None
+    return record['bytes_per_sec']
+
+def record_throughput(zookeeper_hosts, zookeeper_path, nbytes, seconds):
+    # Deploys running side by side may record at the same time
+    write_atomic(_throughput_path(zookeeper_hosts, zookeeper_path),
+                 json.dumps({ 'bytes_per_sec': nbytes / max(seconds, 1e-6),
+                              'time': time.time() }))
+
+def last_deploy(zookeeper_hosts, zookeeper_path, name):
+    record = load_json(_deploy_record_path(zookeeper_hosts, zookeeper_path,
+                                           name))
+    return record if isinstance(record, dict) else None
+
+def record_deploy(zookeeper_hosts, zookeeper_path, name, digest):
+    write_atomic(_deploy_record_path(zookeeper_hosts, zookeeper_path, name),
+                 json.dumps({ 'name': name, 'digest': digest,
+                              'time': time.time() }))
+
+def deployed_unchanged(request, slug):
+    """ True when our own record says 'slug' is the last one deployed for
+    this computation on this cluster. Deploys made from elsewhere are not
+    known, so trusting this is left to the manifest. The scheduler is never
+    asked, getComputationSlug would send back the whole slug"""
+    last = last_deploy(request["zookeeper_hosts"], request["zookeeper_path"],
+                       request["computation_name"])
+    return last is not None and last.get('digest') == slug.digest
@@ -0,0 +1,118 @@
+"""
+Lookup of the tasks of a topology by the properties kill selects them on.
+The index is built in one pass over the metadata. A selection starts from
+the smallest list of candidates the index has for its criteria and only
+checks the other criteria on those, so its cost follows the number of
+matches rather than the size of the topology:
+
+    index = TaskIndex(decode_metadata(data, node_fields=INDEX_FIELDS))
+    tasks = index.select(computation='^word-', reconciling=True)
+"""
+
+import re
+import bisect
+from collections import namedtuple
+
+# Node fields the index reads, to decode nothing else
+INDEX_FIELDS = ['taskId', 'slaveId', 'cpus', 'mem', 'needsReconciliation',
+                'taskHelper.dockerContainer', 'taskHelper.client']
+
+IndexedTask = namedtuple('IndexedTask', ['computation', 'node'])
+
+def docker_image(container):
+    """ 'image' of 'image:tag', a registry port is not a tag"""
+    image, _, tag = container.rpartition(':')
+    return image if image and '/' not in tag else container
+
+def _host(node):
+    helper = node.taskHelper
+    return helper.client.ip if helper and helper.client else None
+
+def _container_keys(node):
+    """ Keys of the task in TaskIndex.by_container"""
+    container = node.taskHelper.dockerContainer if node.taskHelper else None
+    if not container:
+        return []
+    image = docker_image(container)
+    return [container] if image == container else [container, image]
+
+class TaskIndex(object):
+    """ Tasks of a TopologyMetadata by computation, slave, docker container
+    and memory"""
+    def __init__(self, meta):
+        self.by_computation = {}
+        # Slave ids and the ip of the host the task runs on
+        self.by_slave = {}
+        # Full container names and images without their tag
+        self.by_container = {}
+        self.reconciling = []
+        # (mem, task), sorted for --mem-gt
+        self.by_mem = []
+        for name, layout in sorted((meta.computations or {}).iteritems()):
+            tasks = [IndexedTask(name, node) for node in layout.nodes or []]
+            self.by_computation[name] = tasks
+            for task in tasks:
+                self._add(task)
+        self.by_mem.sort(key=lambda entry: entry[0])
+        self.mems = [mem for mem, _ in self.by_mem]
+
+    def _add(self, task):
+        node = task.node
+        for slave in set([node.slaveId, _host(node)]) - set([None]):
+            self.by_slave.setdefault(slave, []).append(task)
+        for key in _container_keys(node):
+            self.by_container.setdefault(key, []).append(task)
+        if node.needsReconciliation:
+            self.reconciling.append(task)
+        if node.mem is not None:
+            self.by_mem.append((node.mem, task))
+
+    def __len__(self):
+        return sum(len(tasks) for tasks in self.by_computation.itervalues())
+
+    def computations(self, pattern):
+        """ Names of the computations 'pattern' is found in"""
+        regex = re.compile(pattern)
+        return [name for name in sorted(self.by_computation)
+                if regex.search(name)]
+
+    def select(self, computation=None, slave=None, reconciling=False,
+               mem_gt=None, docker=None):
+        """ Tasks matching every criteria given: a regex searched for in the
+        computation name, a slave id or host ip, needsReconciliation set,
+        more than 'mem_gt' memory and a docker container, 'image:tag' or any
+        tag of 'image'. Every task when none is given. Sorted by computation
+        then task id"""
+        # (size, function listing them), only the smallest list is built
+        candidates = []
+        checks = []
+        def indexed(tasks):
+            candidates.append((len(tasks), lambda: tasks))
+        if computation is not None:
+            names = set(self.computations(computation))
+            candidates.append((sum(len(self.by_computation[n]) for n in names),
+                               lambda: [t for n in names
+                                        for t in self.by_computation[n]]))
+            checks.append(lambda t: t.computation in names)
+        if slave is not None:
+            indexed(self.by_slave.get(slave, []))
+            checks.append(lambda t: slave in (t.node.slaveId, _host(t.node)))
+        if reconciling:
+            indexed(self.reconciling)
+            checks.append(lambda t: t.node.needsReconciliation)
+        if mem_gt is not None:
+            start = bisect.bisect_right(self.mems, mem_gt)
+            candidates.append((len(self.mems) - start,
+                               lambda: [t for _, t in self.by_mem[start:]]))
+            checks.append(lambda t: t.node.mem is not None and
+                          t.node.mem > mem_gt)
+        if docker is not None:
+            indexed(self.by_container.get(docker, []))
+            checks.append(lambda t: docker in _container_keys(t.node))
+        if not candidates:
+            candidates.append((len(self), lambda: [
+                t for tasks in self.by_computation.itervalues()
+                for t in tasks]))
+        _, tasks = min(candidates, key=lambda candidate: candidate[0])
+        matches = [t for t in tasks() if all(check(t) for check in checks)]
+        return sorted(matches, key=lambda t: (t.computation, t.node.taskId))
@@ -0,0 +1,185 @@
+"""
+JSON rendering of thrift structs for logs and dumps. Fields are walked in
+thrift_spec order rather than through __dict__, enums are written by name
+and binary fields, the slug above all, are summarized by size and digest
+instead of being dumped. Output is produced piece by piece so that a large
+topology can be written to a file without building the whole string.
+"""
+
+import json
+import hashlib
+from concord.internal.thrift.ttypes import *
+from thrift.Thrift import TType
+
+# I32 fields holding an enum, thrift_spec does not tell them apart
+ENUM_FIELDS = {
+    (StreamMetadata, 'grouping'): StreamGrouping,
+}
+
+# Fields declared as binary in the IDL, thrift_spec calls them strings
+BINARY_FIELDS = set([
+    (BoltComputationRequest, 'slug'),
+    (Record, 'key'),
+    (Record, 'data'),
+])
+
+# Pieces buffered before they are written out by write_json
+FLUSH_PIECES = 4096
+
+_encode_string = json.encoder.encode_basestring_ascii
+
+def binary_summary(value):
+    return '{"size": %d, "sha256": "%s"}' % (
+        len(value), hashlib.sha256(value).hexdigest())
+
+def _string(value):
+    try:
+        return _encode_string(value)
+    except UnicodeDecodeError:
+        # Binary data in a string field
+        return binary_summary(value)
+
+class _Encoder(object):
+    """ Turns values into pieces of JSON appended to 'pieces'. An encoding
+    function is built once per thrift type and reused for every value of
+    that type, 'out' receives the pieces every FLUSH_PIECES"""
+    def __init__(self, indent, out=None):
+        self.indent = indent
+        self.out = out
+        self.pieces = []
+        self.newlines = []
+        self.structs = {}
+
+    def newline(self, level):
+        try:
+            return self.newlines[level]
+        except IndexError:
+            while len(self.newlines) <= level:
+                self.newlines.append('\n' + ' ' * (self.indent *
+                                                   len(self.newlines)))
+            return self.newlines[level]
+
+    def flush(self):
+        if self.out is not None and self.pieces:
+            self.out.write(''.join(self.pieces))
+            del self.pieces[:]
+
+    def value_encoder(self, ttype, args):
+        pieces = self.pieces
+        if ttype == TType.STRUCT:
+            return self.struct_encoder(args[0], args[1])
+        if ttype in (TType.LIST, TType.SET):
+            return self.list_encoder(ttype, args)
+        if ttype == TType.MAP:
+            return self.map_encoder(args)
+        if ttype == TType.STRING:
+            def encode_string(value, level):
+                try:
+                    pieces.append(_encode_string(value))
+                except UnicodeDecodeError:
+                    pieces.append(binary_summary(value))
+            return encode_string
+        if ttype == TType.BOOL:
+            return lambda value, level: pieces.append(
+                'true' if value else 'false')
+        if ttype == TType.DOUBLE:
+            return lambda value, level: pieces.append(repr(float(value)))
+        return lambda value, level: pieces.append(str(value))
+
+    def _items(self, opening, closing, items, encode_item, level):
+        pieces = self.pieces
+        separator = opening + self.newline(level + 1)
+        for item in items:
+            pieces.append(separator)
+            separator = ',' + self.newline(level + 1)
+            encode_item(item, level + 1)
+        if separator[0] == opening:
+            pieces.append(opening + closing)
+        else:
+            pieces.append(self.newline(level) + closing)
+
+    def list_encoder(self, ttype, args):
+        pieces = self.pieces
+        encode_element = self.value_encoder(*args)
+        def encode_item(item, level):
+            if item is None:
+                pieces.append('null')
+            else:
+                encode_element(item, level)
+        def encode(value, level):
+            items = sorted(value) if ttype == TType.SET else value
+            self._items('[', ']', items, encode_item, level)
+        return encode
+
+    def map_encoder(self, args):
+        pieces = self.pieces
+        ktype, _, vtype, vargs = args
+        encode_value = self.value_encoder(vtype, vargs)
+        def encode_item(item, level):
+            key, value = item
+            # JSON object keys are strings
+            pieces.append((_string(key) if ktype == TType.STRING
+                           else '"%s"' % key) + ': ')
+            if value is None:
+                pieces.append('null')
+            else:
+                encode_value(value, level)
+        def encode(value, level):
+            self._items('{', '}', sorted(value.iteritems()), encode_item,
+                        level)
+        return encode
+
+    def struct_encoder(self, cls, spec):
+        key = (cls, id(spec))
+        if key in self.structs:
+            return self.structs[key]
+        pieces = self.pieces
+        fields = []
+        def encode(struct, level):
+            if not fields:
+                pieces.append('{}')
+                return
+            separator = '{' + self.newline(level + 1)
+            comma = ',' + self.newline(level + 1)
+            for name, key, encode_value, names in fields:
+                value = getattr(struct, name, None)
+                if value is None:
+                    pieces.append(separator + key + 'null')
+                elif encode_value is None:
+                    pieces.append(separator + key + binary_summary(value))
+                elif names is not None and value in names:
+                    pieces.append(separator + key +
+                                  _encode_string(names[value]))
+                else:
+                    pieces.append(separator + key)
+                    encode_value(value, level + 1)
+                separator = comma
+            pieces.append(self.newline(level) + '}')
+            if len(pieces) >= FLUSH_PIECES:
+                self.flush()
+        # Registered before the fields are built, a struct may contain itself
+        self.structs[key] = encode
+        for entry in spec:
+            if entry is None:
+                continue
+            _, ttype, name, args = entry[:4]
+            binary = (cls, name) in BINARY_FIELDS
+            enum = ENUM_FIELDS.get((cls, name))
+            fields.append((name, _encode_string(name) + ': ',
+                           None if binary else self.value_encoder(ttype, args),
+                           enum._VALUES_TO_NAMES if enum else None))
+        return encode
+
+def write_json(thrift_struct, out, indent=4):
+    """ Writes the JSON of 'thrift_struct' to the file like 'out' as it is
+    produced"""
+    encoder = _Encoder(indent, out)
+    encoder.struct_encoder(thrift_struct.__class__,
+                           thrift_struct.thrift_spec)(thrift_struct, 0)
+    encoder.flush()
+
+def thrift_to_json(thrift_struct, indent=4):
+    encoder = _Encoder(indent)
+    encoder.struct_encoder(thrift_struct.__class__,
+                           thrift_struct.thrift_spec)(thrift_struct, 0)
+    return ''.join(encoder.pieces)
@@ -1,9 +1,12 @@
-import json
 import logging
-from kazoo.client import KazooClient
+import threading
 from concord.internal.thrift.ttypes import *
 from concord.internal.thrift import BoltSchedulerService
 from concord.utils import build_logger
+from concord.progress import MeteredSocket
+from concord.zk_utils import zk_session
+from concord import metadata_cache
+from concord.thrift_json import thrift_to_json
 from thrift import Thrift
 from thrift.protocol import (
     TJSONProtocol, TBinaryProtocol
@@ -11,26 +14,41 @@ from thrift.protocol import (
 from thrift.transport import (
     TSocket,TTransport
 )
+try:
+    from thrift.protocol import fastbinary
+except ImportError:
+    fastbinary = None
+try:
+    from thrift.protocol import TCompactProtocol
+except ImportError:
+    TCompactProtocol = None
 
 logging_format_string='%(levelname)s:%(asctime)s %(filename)s:%(lineno)d] %(message)s'
 logger = build_logger('cmd.thrift_utils', logging_format_string)
 
+def binary_protocol(transport):
+    """ The generated read() and write() only take their C fast path with
+    TBinaryProtocolAccelerated, and for reads only over a CReadableTransport
+    such as TMemoryBuffer or TFramedTransport. Same bytes on the wire either
+    way, plain TBinaryProtocol is used when the extension is missing"""
+    if fastbinary is not None:
+        return TBinaryProtocol.TBinaryProtocolAccelerated(transport)
+    return TBinaryProtocol.TBinaryProtocol(transport)
+
 def bytes_to_thrift(bytes, thrift_struct):
     transportIn = TTransport.TMemoryBuffer(bytes)
-    protocolIn = TBinaryProtocol.TBinaryProtocol(transportIn)
+    protocolIn = binary_protocol(transportIn)
     thrift_struct.read(protocolIn)
 
-def thrift_to_json(thrift_struct):
-    return json.dumps(thrift_struct, default=lambda o: o.__dict__,
-            sort_keys=True, indent=4)
+def thrift_to_bytes(thrift_struct):
+    transportOut = TTransport.TMemoryBuffer()
+    thrift_struct.write(binary_protocol(transportOut))
+    return transportOut.getvalue()
 
 def get_zookeeper_master_ip(zkurl, zkpath):
-    logger.info("Connecting to:%s" % zkurl)
-    zk = KazooClient(hosts=zkurl)
     ip = ""
     try:
-        logger.debug("Starting zk connection")
-        zk.start()
+        zk = zk_session(zkurl)
         if not zk.exists(zkpath):
             logger.error('Path on zk doesn\'t exist: ' + zkpath)
             return ip
@@ -40,44 +58,141 @@ def get_zookeeper_master_ip(zkurl, zkpath):
         ip = str(data)
     except Exception as e:
         logger.exception(e)
-    finally:
-        logger.debug("Closing zk connection")
-        zk.stop()
     return ip
 
-def get_zookeeper_metadata(zkurl, zkpath):
-    logger.info("Connecting to: %s" % zkurl)
-    zk = KazooClient(hosts=zkurl)
-    meta = TopologyMetadata()
+def get_zookeeper_metadata(zkurl, zkpath, cache_ttl=None, decode=None):
+    """ Reads the TopologyMetadata at 'zkpath'. With a 'cache_ttl' a local
+    copy at most that many seconds old is used when the znode is unchanged,
+    see concord.metadata_cache. 'decode' turns the znode contents into the
+    returned metadata, e.g. a partial decoder from concord.lazy_metadata.
+    It defaults to decoding everything"""
+    def decode_all(data):
+        meta = TopologyMetadata()
+        bytes_to_thrift(data, meta)
+        return meta
+    full = decode is None
+    decode = decode or decode_all
     try:
-        logger.debug("Starting zk connection")
-        zk.start()
-        if not zk.exists(zkpath):
+        zk = zk_session(zkurl)
+        stat = zk.exists(zkpath)
+        if not stat:
             logger.error('Path on zk doesn\'t exist')
             return None
+        if cache_ttl is not None:
+            cached = metadata_cache.lookup(zkurl, zkpath, stat, cache_ttl,
+                                           load_decoded=full)
+            if cached is not None:
+                data, decoded = cached
+                return decode(data) if decoded is None else decoded
         logger.debug("Serializing TopologyMetadata() from %s" % zkpath)
         data, stat = zk.get(zkpath)
         logger.debug("Status of 'getting' %s: %s" % (zkpath, str(stat)))
-        bytes_to_thrift(data, meta)
+        meta = decode(data)
+        if cache_ttl is not None:
+            metadata_cache.store(zkurl, zkpath, data, stat,
+                                 meta if full else None)
     except Exception as e:
         logger.exception(e)
         return None
-    finally:
-        logger.debug("Closing zk connection")
-        zk.stop()
 
     return meta
 
-def tproto(ip, port):
+# Protocols spoken to the scheduler, 'auto' probes for compact and falls
+# back to binary. TopologyMetadata in zookeeper is written by the scheduler
+# and always binary
+PROTOCOLS = ['accelerated', 'binary', 'compact', 'auto']
+DEFAULT_PROTOCOL = 'accelerated'
+# Order 'auto' tries protocols in
+PROBE_ORDER = ['compact', 'accelerated']
+# Seconds a probe waits for the scheduler to answer
+PROBE_TIMEOUT = 2.0
+# No computation can have this name, the scheduler answers with an error
+PROBE_COMPUTATION = ''
+
+def protocol_class(name):
+    """ Returns a callable building a protocol over a transport"""
+    if name == 'accelerated':
+        return binary_protocol
+    if name == 'binary':
+        return TBinaryProtocol.TBinaryProtocol
+    if name == 'compact':
+        if TCompactProtocol is None:
+            raise ValueError("This thrift has no compact protocol")
+        return TCompactProtocol.TCompactProtocol
+    raise ValueError("Unknown thrift protocol: %s" % name)
+
+def tsocket_proto(ip, port, protocol=DEFAULT_PROTOCOL):
+    """ (protocol, transport, socket) of a framed connection to ip:port,
+    'socket' being the TSocket under the transport"""
     socket = TSocket.TSocket(ip, port)
     transport = TTransport.TFramedTransport(socket)
-    protocol = TBinaryProtocol.TBinaryProtocol(transport)
-    return (protocol, transport)
+    return (protocol_class(protocol)(transport), transport, socket)
+
+def tproto(ip, port, protocol=DEFAULT_PROTOCOL):
+    (proto, transport, _) = tsocket_proto(ip, port, protocol)
+    return (proto, transport)
 
-def get_sched_service_client(ip, port):
-    (protocol, transport) = tproto(ip, port)
-    client = BoltSchedulerService.Client(protocol)
+def _open_client(ip, port, protocol, send_timeout, recv_timeout):
+    (proto, transport, sock) = tsocket_proto(ip, port, protocol)
+    client = BoltSchedulerService.Client(proto)
     transport.open()
-    return client
+    sock.handle = MeteredSocket(sock.handle, send_timeout, recv_timeout)
+    return (client, sock)
+
+def probe_protocol(ip, port, protocol, timeout=PROBE_TIMEOUT):
+    """ True when the scheduler at ip:port answers a call made with
+    'protocol'. A scheduler speaking another protocol fails to parse the
+    call and drops the connection. Errors opening the connection are raised,
+    they say nothing about the protocol"""
+    (client, _) = _open_client(ip, port, protocol, timeout, timeout)
+    try:
+        client.getComputationSlug(PROBE_COMPUTATION)
+    except (BoltError, Thrift.TApplicationException):
+        # An error from the scheduler, so it did read the call
+        pass
+    except (TTransport.TTransportException, EOFError, IOError) as e:
+        logger.debug("Scheduler at %s:%d does not speak %s: %s", ip, port,
+                     protocol, e)
+        return False
+    finally:
+        client._oprot.trans.close()
+    return True
+
+_negotiated = {}
+_negotiated_lock = threading.Lock()
+
+def negotiate_protocol(ip, port):
+    """ First protocol of PROBE_ORDER the scheduler at ip:port speaks. The
+    answer is kept for the rest of the process, a scheduler only changes
+    protocol with a restart that also moves the leader"""
+    address = (ip, port)
+    with _negotiated_lock:
+        if address in _negotiated:
+            return _negotiated[address]
+    candidates = [p for p in PROBE_ORDER
+                  if p != 'compact' or TCompactProtocol is not None]
+    chosen = candidates[-1]
+    for protocol in candidates[:-1]:
+        if probe_protocol(ip, port, protocol):
+            chosen = protocol
+            break
+    logger.debug("Using the %s protocol with scheduler %s:%d", chosen, ip,
+                 port)
+    with _negotiated_lock:
+        _negotiated[address] = chosen
+    return chosen
 
+def open_sched_service_client(ip, port, send_timeout=None, recv_timeout=None,
+                              protocol=DEFAULT_PROTOCOL):
+    """ (client, socket) where 'socket' is the TSocket the client talks
+    over, its handle a concord.progress.MeteredSocket. Timeouts are in
+    seconds, 'protocol' is one of PROTOCOLS"""
+    if protocol == 'auto':
+        protocol = negotiate_protocol(ip, port)
+    return _open_client(ip, port, protocol, send_timeout, recv_timeout)
 
+def get_sched_service_client(ip, port, send_timeout=None, recv_timeout=None,
+                             protocol=DEFAULT_PROTOCOL):
+    """ The client of open_sched_service_client alone"""
+    return open_sched_service_client(ip, port, send_timeout, recv_timeout,
+                                     protocol)[0]
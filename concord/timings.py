@@ -0,0 +1,66 @@
+"""
+Per phase timings of a deploy, printable as JSON and appendable to a local
+history file so regressions can be tracked across releases.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+from concord import constants
+from concord.utils import concord_home_path
+
+HISTORY_FILENAME = 'deploy_history.jsonl'
+
+def default_history_path():
+    return concord_home_path(HISTORY_FILENAME)
+
+class DeployTimings(object):
+    """ Collects (phase, seconds, bytes) records for one deploy. Phases are
+    kept in the order they were first recorded"""
+    def __init__(self, computation_name):
+        self.computation_name = computation_name
+        self.started = time.time()
+        self.finished = None
+        self.phases = []
+        self.info = {}
+
+    def record(self, name, seconds, nbytes=None):
+        entry = { 'phase': name, 'seconds': round(seconds, 6) }
+        if nbytes is not None:
+            entry['bytes'] = nbytes
+        self.phases.append(entry)
+
+    @contextmanager
+    def phase(self, name, nbytes=None):
+        """ Times the body of a with statement. Bytes may also be filled in
+        later through the yielded dict"""
+        start = time.time()
+        entry = { 'bytes': nbytes }
+        try:
+            yield entry
+        finally:
+            self.record(name, time.time() - start, entry['bytes'])
+
+    def finish(self):
+        """ Stops the clock of total_seconds"""
+        self.finished = time.time()
+
+    def summary(self):
+        end = self.finished or time.time()
+        result = { 'computation': self.computation_name,
+                   'started': self.started,
+                   'total_seconds': round(end - self.started, 6),
+                   'cli_version': constants.version,
+                   'phases': self.phases }
+        result.update(self.info)
+        return result
+
+    def to_json(self):
+        return json.dumps(self.summary(), indent=4, sort_keys=True,
+                          separators=(',', ': '))
+
+    def append_history(self, path=None):
+        """ Appends the summary as one line of JSON"""
+        path = path or default_history_path()
+        with open(path, 'a') as history:
+            history.write(json.dumps(self.summary(), sort_keys=True) + '\n')
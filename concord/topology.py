@@ -0,0 +1,169 @@
+"""
+Dependency ordering of the computations in a topology manifest. A topology
+manifest lists several computations along with the streams they consume
+and produce:
+
+{
+    "zookeeper_hosts": "127.0.0.1:2181",
+    "zookeeper_path": "/concord",
+    "computations": [
+        { "manifest": "source/config.json", "ostreams": ["words"] },
+        { "computation_name": "word-counter",
+          "executable_name": "counter",
+          "compress_files": ["counter"],
+          "istreams": ["words"] }
+    ]
+}
+
+Keys next to "computations" are defaults for every computation. An entry is
+either a reference to a regular manifest, relative to the topology file, or
+an inline manifest. Consumers are deployed before the computations feeding
+them so that nothing is produced before somebody is there to read it.
+"""
+
+import sys
+import Queue
+from multiprocessing.pool import ThreadPool
+
+STREAM_KEYS = ['istreams', 'ostreams']
+
+class TopologyError(Exception):
+    pass
+
+class SkippedDeploy(Exception):
+    """ Not deployed because a computation it feeds failed to deploy"""
+    pass
+
+class TopologyNode(object):
+    def __init__(self, name, request, config, istreams=[], ostreams=[]):
+        self.name = name
+        self.request = request
+        # Manifest the request was read from, paths are relative to it
+        self.config = config
+        self.istreams = list(istreams)
+        self.ostreams = list(ostreams)
+
+class Topology(object):
+    """ Computations linked by streams, a computation producing a stream
+    points to every computation consuming it. Streams produced or consumed
+    outside of the topology are allowed and ignored"""
+    def __init__(self, nodes):
+        self.nodes = []
+        self.by_name = {}
+        for node in nodes:
+            if node.name in self.by_name:
+                raise TopologyError("Computation '%s' is defined twice" %
+                                    node.name)
+            self.by_name[node.name] = node
+            self.nodes.append(node)
+
+        readers = {}
+        for node in self.nodes:
+            for stream in node.istreams:
+                readers.setdefault(stream, []).append(node.name)
+        self.consumers = dict((n.name, set()) for n in self.nodes)
+        self.producers = dict((n.name, set()) for n in self.nodes)
+        for node in self.nodes:
+            for stream in node.ostreams:
+                for reader in readers.get(stream, []):
+                    self.consumers[node.name].add(reader)
+                    self.producers[reader].add(node.name)
+
+    def find_cycle(self):
+        """ Returns the names along a cycle, first name repeated at the end,
+        or None when the topology is acyclic"""
+        WHITE, GREY, BLACK = 0, 1, 2
+        color = dict((n.name, WHITE) for n in self.nodes)
+        for start in sorted(color):
+            if color[start] != WHITE:
+                continue
+            # Iterative DFS, the stack holds the current path
+            path = [start]
+            todo = [iter(sorted(self.consumers[start]))]
+            color[start] = GREY
+            while todo:
+                child = next(todo[-1], None)
+                if child is None:
+                    color[path.pop()] = BLACK
+                    todo.pop()
+                elif color[child] == GREY:
+                    return path[path.index(child):] + [child]
+                elif color[child] == WHITE:
+                    color[child] = GREY
+                    path.append(child)
+                    todo.append(iter(sorted(self.consumers[child])))
+        return None
+
+    def check(self):
+        cycle = self.find_cycle()
+        if cycle is not None:
+            raise TopologyError("Streams form a cycle, cannot order the "
+                                "deploy: " + " -> ".join(cycle))
+
+    def levels(self):
+        """ Deploy waves, sinks first. Every computation comes after all of
+        its consumers"""
+        self.check()
+        waiting = dict((name, len(c)) for name, c in self.consumers.items())
+        wave = sorted(name for name, count in waiting.items() if count == 0)
+        levels = []
+        while wave:
+            levels.append(wave)
+            ready = []
+            for name in wave:
+                for producer in self.producers[name]:
+                    waiting[producer] -= 1
+                    if waiting[producer] == 0:
+                        ready.append(producer)
+            wave = sorted(ready)
+        return levels
+
+    def run(self, deploy, concurrency):
+        """ Calls deploy(node) for every node on a pool of 'concurrency'
+        threads. A node starts as soon as all of its consumers are deployed,
+        independent branches do not wait for each other. When a deploy raises
+        everything upstream of it is skipped. Returns { name: (result, error) }
+        """
+        self.check()
+        results = {}
+        done = Queue.Queue()
+        waiting = dict((name, set(c)) for name, c in self.consumers.items())
+
+        def run_one(node):
+            try:
+                return (node.name, deploy(node), None)
+            except Exception as e:
+                return (node.name, None, e)
+
+        def skip(name, cause):
+            for producer in self.producers[name]:
+                if producer not in results:
+                    results[producer] = (None, SkippedDeploy(
+                        "'%s' was not deployed" % cause))
+                    skip(producer, cause)
+
+        workers = ThreadPool(max(1, min(concurrency, len(self.nodes))))
+        try:
+            running = 0
+            for node in self.nodes:
+                if len(waiting[node.name]) == 0:
+                    workers.apply_async(run_one, (node,), callback=done.put)
+                    running += 1
+            while running > 0:
+                # A timeout so that ctrl-c reaches the main thread
+                name, result, error = done.get(True, sys.maxint)
+                running -= 1
+                results[name] = (result, error)
+                if error is not None:
+                    skip(name, name)
+                    continue
+                for producer in sorted(self.producers[name]):
+                    waiting[producer].discard(name)
+                    if len(waiting[producer]) == 0 and producer not in results:
+                        workers.apply_async(run_one, (self.by_name[producer],),
+                                            callback=done.put)
+                        running += 1
+        finally:
+            workers.close()
+            workers.join()
+        return results
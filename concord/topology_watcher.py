@@ -0,0 +1,166 @@
+"""
+Live view of the TopologyMetadata of a cluster for long running tools. A
+zookeeper watch keeps the decoded metadata current instead of polling
+get_zookeeper_metadata:
+
+    watcher = TopologyWatcher('localhost:2181', '/concord')
+    watcher.add_callback(lambda meta, diff: logger.info("%s", diff))
+    meta = watcher.wait()
+"""
+
+import sys
+import time
+import threading
+from kazoo.recipe.watchers import DataWatch
+from concord.internal.thrift.ttypes import TopologyMetadata
+from concord.thrift_utils import bytes_to_thrift
+from concord.zk_utils import zk_session
+from concord.utils import build_logger
+
+logger = build_logger('cmd.topology_watcher')
+
+def _computations(meta):
+    return meta is not None and meta.computations or {}
+
+def _task_ids(meta, skip=()):
+    """ { task id: computation name } of the computations of 'meta' not in
+    'skip'"""
+    return dict((node.taskId, name)
+                for name, layout in _computations(meta).iteritems()
+                if name not in skip for node in (layout.nodes or []))
+
+def _same_encoding(old, new):
+    """ True when both layouts are still encoded and the bytes match, their
+    nodes are then equal without decoding them"""
+    if not (hasattr(old, 'encoded') and hasattr(new, 'encoded')):
+        return False
+    old_bytes = old.encoded()
+    return old_bytes is not None and old_bytes == new.encoded()
+
+def _decode_all(data):
+    meta = TopologyMetadata()
+    bytes_to_thrift(data, meta)
+    return meta
+
+class TopologyDiff(object):
+    """ What changed between two versions of the metadata. Tasks are kept
+    as { task id: computation name } and worked out on first use, skipping
+    computations whose encoded layout did not change. With lazily decoded
+    metadata only the nodes of the computations that changed are decoded"""
+    def __init__(self, old, new):
+        self.old, self.new = old, new
+        old_names = set(_computations(old).keys())
+        new_names = set(_computations(new).keys())
+        self.added_computations = sorted(new_names - old_names)
+        self.removed_computations = sorted(old_names - new_names)
+        self._tasks = None
+
+    def _task_changes(self):
+        if self._tasks is None:
+            old, new = _computations(self.old), _computations(self.new)
+            unchanged = set(name for name in old if name in new and
+                            _same_encoding(old[name], new[name]))
+            old_tasks = _task_ids(self.old, unchanged)
+            new_tasks = _task_ids(self.new, unchanged)
+            self._tasks = (
+                dict((t, c) for t, c in new_tasks.iteritems()
+                     if t not in old_tasks),
+                dict((t, c) for t, c in old_tasks.iteritems()
+                     if t not in new_tasks))
+        return self._tasks
+
+    @property
+    def added_tasks(self):
+        return self._task_changes()[0]
+
+    @property
+    def removed_tasks(self):
+        return self._task_changes()[1]
+
+    def __nonzero__(self):
+        return bool(self.added_computations or self.removed_computations or
+                    self.added_tasks or self.removed_tasks)
+
+    def __str__(self):
+        parts = []
+        for label, names in [('+computations', self.added_computations),
+                             ('-computations', self.removed_computations),
+                             ('+tasks', sorted(self.added_tasks)),
+                             ('-tasks', sorted(self.removed_tasks))]:
+            if names:
+                parts.append("%s: %s" % (label, ", ".join(names)))
+        return "; ".join(parts) or "no changes"
+
+class TopologyWatcher(object):
+    """ Keeps 'metadata' equal to the decoded contents of 'zkpath'. Callbacks
+    are called as callback(metadata, diff) from the kazoo event thread each
+    time the znode is written, metadata is None once it is deleted. The znode
+    is only decoded again when its mzxid moved, a reconnect does not cost a
+    decode. 'decode' turns the znode contents into the metadata, as in
+    get_zookeeper_metadata, it defaults to decoding everything"""
+    def __init__(self, zkurl, zkpath, callback=None, decode=None):
+        self.path = zkpath
+        self.decode = decode or _decode_all
+        self.cond = threading.Condition()
+        self.callbacks = [] if callback is None else [callback]
+        self.metadata = None
+        self.stat = None
+        # Set once the first read completed, whether or not the node exists
+        self.loaded = False
+        self.stopped = False
+        DataWatch(zk_session(zkurl), zkpath, self._changed)
+
+    def add_callback(self, callback):
+        with self.cond:
+            self.callbacks.append(callback)
+
+    def _changed(self, data, stat):
+        if self.stopped:
+            # Tells kazoo to drop the watch
+            return False
+        with self.cond:
+            if self.loaded and (stat and stat.mzxid) == \
+                    (self.stat and self.stat.mzxid):
+                return
+            meta = None
+            if stat is not None:
+                try:
+                    meta = self.decode(data)
+                except Exception as e:
+                    logger.error("Could not decode metadata of %s: %s",
+                                 self.path, e)
+                    return
+            diff = TopologyDiff(self.metadata, meta)
+            self.metadata, self.stat, self.loaded = meta, stat, True
+            callbacks = list(self.callbacks)
+            self.cond.notify_all()
+        if diff:
+            logger.debug("Topology at %s changed: %s", self.path, diff)
+        for callback in callbacks:
+            try:
+                callback(meta, diff)
+            except Exception as e:
+                logger.exception(e)
+
+    def wait(self, timeout=None):
+        """ Current metadata, waits up to 'timeout' seconds for the first
+        read. None when the node does not exist or nothing was read in time"""
+        deadline = None if timeout is None else time.time() + timeout
+        with self.cond:
+            while not self.loaded:
+                # Never wait without a timeout, ctrl-c would not get through
+                remaining = sys.maxint if deadline is None else \
+                    deadline - time.time()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            return self.metadata
+
+    def task_ids(self):
+        """ { task id: computation name } of the current metadata"""
+        with self.cond:
+            return _task_ids(self.metadata)
+
+    def stop(self):
+        """ Stops watching, the watch is dropped at the next event"""
+        self.stopped = True
@@ -2,13 +2,18 @@ import os
 import json
 import logging
 import urllib2
+import tempfile
 from concord.dcos_utils import *
 
 CONCORD_FILENAME = '.concord.cfg'
 
+# Local state (slug cache, deploy records) lives here
+CONCORD_HOME = os.environ.get('CONCORD_HOME', os.path.expanduser('~/.concord'))
+
 CONCORD_DEFAULTS = { 'zookeeper_path' : '/concord',
                      'zookeeper_hosts' : 'localhost:2181',
-                     'runway_repository' : 'https://github.com/concord/runway/master/' }
+                     'runway_repository' : 'https://github.com/concord/runway/master/',
+                     'scheduler_protocol' : 'accelerated' }
 
 def build_logger(module_name, fmt_string=None):
     if fmt_string is not None:
@@ -58,7 +63,9 @@ def find_config(src, config_file):
 
 def fetch_config_opts(src, config_file):
     if ON_DCOS is True:
-        return dcos_config_data()
+        config_data = dcos_config_data()
+        validate_config(config_data, 'the DC/OS settings')
+        return config_data
 
     location = find_config(os.getcwd(), CONCORD_FILENAME)
     config_data = {}
@@ -67,10 +74,28 @@ def fetch_config_opts(src, config_file):
     else:
         with open(location, 'r') as data_file:
             config_data = json.load(data_file)
+        validate_config(config_data, location)
     return config_data
 
-def default_options(opts):
-    config_data = fetch_config_opts(os.getcwd(), CONCORD_FILENAME)
+def validate_config(config_data, source):
+    """ Raises ValueError when a setting of 'source' has an unusable value"""
+    # Imported here, thrift_utils depends on this module
+    from concord.thrift_utils import PROTOCOLS
+    protocol = config_data.get('scheduler_protocol')
+    if protocol is not None and protocol not in PROTOCOLS:
+        raise ValueError("Invalid scheduler_protocol '%s' in %s, expected "
+                         "one of: %s" % (protocol, source,
+                                         ", ".join(PROTOCOLS)))
+
+def default_options(opts, parser=None):
+    """ Fills the options left unset from the concord settings. Invalid
+    settings are reported as a usage error of 'parser' when given"""
+    try:
+        config_data = fetch_config_opts(os.getcwd(), CONCORD_FILENAME)
+    except ValueError as e:
+        if parser is None:
+            raise
+        parser.error(str(e))
     opts_methods = dir(opts)
     if 'zookeeper' in opts_methods:
         opts.zookeeper = config_data['zookeeper_hosts'] if opts.zookeeper is None \
@@ -81,6 +106,11 @@ def default_options(opts):
     if 'repository' in opts_methods:
         opts.repository = config_data['runway_repository'] if opts.repository is None \
                           else opts.repository
+    if 'protocol' in opts_methods:
+        # Settings files written before the option existed do not have it
+        opts.protocol = config_data.get('scheduler_protocol',
+                                        CONCORD_DEFAULTS['scheduler_protocol']) \
+                        if opts.protocol is None else opts.protocol
 
 def default_manifest_options(manifest, all_options):
     config_data = fetch_config_opts(os.getcwd(), CONCORD_FILENAME)
@@ -88,6 +118,42 @@ def default_manifest_options(manifest, all_options):
         if option in all_options and option not in manifest:
             manifest[option] = value
 
+def concord_home_path(*parts):
+    """ Returns a path inside CONCORD_HOME, creating the parent directory
+    if needed"""
+    path = os.path.join(CONCORD_HOME, *parts)
+    parent = os.path.dirname(path)
+    try:
+        os.makedirs(parent)
+    except OSError:
+        if not os.path.isdir(parent):
+            raise
+    return path
+
+def write_atomic(path, data):
+    """ Writes 'data' to a temporary file next to 'path' then renames it into
+    place, readers in other processes never see a partial file"""
+    handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(handle, 'wb') as out:
+            out.write(data)
+        os.rename(tmp_path, path)
+    except:
+        os.remove(tmp_path)
+        raise
+
+def load_json(path):
+    """ Contents of the JSON file at 'path', None when it does not exist or
+    cannot be parsed"""
+    try:
+        with open(path) as data_file:
+            return json.load(data_file)
+    except IOError:
+        return None
+    except ValueError as e:
+        logger.warning("Ignoring unreadable %s: %s", path, e)
+        return None
+
 def human_readable_units(num, suffix='B'):
     for unit in ['','K','M','G','T','P','E','Z']:
         if abs(num) < 1024.0:
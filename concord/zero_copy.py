@@ -0,0 +1,106 @@
+"""
+Sends deployComputation calls without ever holding the slug in memory. The
+call is serialized with a placeholder in place of the slug, then written to
+the scheduler socket as: frame size, the bytes before the slug, the slug
+header, the slug itself a chunk at a time and the bytes after it. What goes
+on the wire is identical to BoltSchedulerService.Client.deployComputation.
+"""
+
+import copy
+import uuid
+import struct
+from concord.internal.thrift.BoltSchedulerService import deployComputation_args
+from concord.slug import CHUNK_SIZE
+from concord.utils import build_logger
+from thrift.Thrift import TMessageType
+from thrift.protocol import TBinaryProtocol
+from thrift.transport import TSocket, TTransport
+
+logger = build_logger('cmd.zero_copy')
+
+def _binary_string_header(size):
+    return struct.pack('!i', size)
+
+def _varint(n):
+    out = []
+    while True:
+        if n & ~0x7f == 0:
+            out.append(chr(n))
+            return ''.join(out)
+        out.append(chr((n & 0x7f) | 0x80))
+        n >>= 7
+
+# Bytes a protocol writes before the contents of a string or binary field.
+# Protocols missing from here fall back to the regular, buffered call
+STRING_HEADERS = [(TBinaryProtocol.TBinaryProtocol, _binary_string_header)]
+try:
+    from thrift.protocol import TCompactProtocol
+    STRING_HEADERS.append((TCompactProtocol.TCompactProtocol, _varint))
+except ImportError:
+    pass
+
+def _string_header(protocol):
+    for cls, header in STRING_HEADERS:
+        if isinstance(protocol, cls):
+            return header
+    return None
+
+def can_stream(cli, sock):
+    """ True when the calls of 'cli' can be written straight to 'sock', the
+    TSocket under its TFramedTransport"""
+    return _string_header(cli._oprot) is not None and \
+        isinstance(cli._oprot.trans, TTransport.TFramedTransport) and \
+        isinstance(sock, TSocket.TSocket)
+
+def split_message(cli, req):
+    """ Serializes the deployComputation call of 'req' the way 'cli' would
+    and returns the bytes before and after the contents of req.slug"""
+    placeholder = uuid.uuid4().hex
+    header = _string_header(cli._oprot)
+    buf = TTransport.TMemoryBuffer()
+    # Same protocol and settings as the client, writing into memory
+    protocol = copy.copy(cli._oprot)
+    protocol.trans = buf
+    saved = req.slug
+    req.slug = placeholder
+    try:
+        protocol.writeMessageBegin('deployComputation', TMessageType.CALL,
+                                   cli._seqid)
+        args = deployComputation_args()
+        args.request = req
+        args.write(protocol)
+        protocol.writeMessageEnd()
+    finally:
+        req.slug = saved
+    message = buf.getvalue()
+    marker = header(len(placeholder)) + placeholder
+    at = message.index(marker)
+    return (message[:at], message[at + len(marker):])
+
+def send_deploy_computation(cli, req, slug, chunk_size=CHUNK_SIZE, sock=None):
+    """ cli.send_deployComputation(req) with req.slug taken from 'slug'.
+    Memory use is bounded by 'chunk_size' rather than the size of the slug.
+    'sock' is the TSocket the client was opened over, see
+    thrift_utils.open_sched_service_client. Falls back to the regular call
+    without it or when the client is not framed"""
+    if not can_stream(cli, sock):
+        logger.debug("Transport does not support streaming, sending in one go")
+        req.slug = slug.read()
+        try:
+            return cli.send_deployComputation(req)
+        finally:
+            req.slug = None
+    header = _string_header(cli._oprot)
+    prefix, suffix = split_message(cli, req)
+    slug_header = header(slug.size)
+    frame = len(prefix) + len(slug_header) + slug.size + len(suffix)
+    handle = sock.handle
+    handle.sendall(struct.pack('!i', frame) + prefix + slug_header)
+    for chunk in slug.chunks(chunk_size):
+        handle.sendall(chunk)
+    handle.sendall(suffix)
+
+def deploy_computation(cli, req, slug, chunk_size=CHUNK_SIZE, sock=None):
+    """ cli.deployComputation(req) with the slug streamed from 'slug'"""
+    send_deploy_computation(cli, req, slug, chunk_size, sock)
+    return cli.recv_deployComputation()
@@ -0,0 +1,74 @@
+"""
+ZooKeeper sessions shared by the whole process. Every subcommand asks for
+the session of an ensemble instead of starting its own client, so a command
+touching zookeeper several times only pays for one handshake. Sessions are
+opened on first use and closed when the process exits.
+"""
+
+import time
+import atexit
+import threading
+from kazoo.client import KazooClient
+from concord.utils import build_logger
+
+logger = build_logger('cmd.zk_utils')
+
+class ZookeeperSessions(object):
+    """ One started KazooClient per host string. Kazoo reconnects on its
+    own after a connection loss, watches set on a session carry over"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clients = {}
+        # Seconds taken by the first handshake and requests served since
+        self.handshake = {}
+        self.reuses = {}
+
+    def get(self, hosts):
+        """ The started client of 'hosts', connects on first use"""
+        with self.lock:
+            zk = self.clients.get(hosts)
+            if zk is not None:
+                self.reuses[hosts] += 1
+                logger.debug("Reusing zookeeper session to %s, saved a %.3fs "
+                             "handshake", hosts, self.handshake[hosts])
+                return zk
+            logger.info("Connecting to:%s" % hosts)
+            zk = KazooClient(hosts=hosts)
+            start = time.time()
+            zk.start()
+            self.handshake[hosts] = time.time() - start
+            self.reuses.setdefault(hosts, 0)
+            self.clients[hosts] = zk
+            logger.debug("Zookeeper handshake with %s took %.3fs", hosts,
+                         self.handshake[hosts])
+            return zk
+
+    def saved_seconds(self):
+        """ Handshake time avoided so far, estimated from the first one"""
+        return sum(self.handshake[hosts] * reuses
+                   for hosts, reuses in self.reuses.items())
+
+    def _stop(self, zk):
+        try:
+            zk.stop()
+            zk.close()
+        except Exception as e:
+            logger.debug("Error closing zookeeper session: %s", e)
+
+    def close(self):
+        with self.lock:
+            if self.clients:
+                logger.debug("Closing %d zookeeper session(s), reuse saved "
+                             "%.3fs of handshakes", len(self.clients),
+                             self.saved_seconds())
+            for zk in self.clients.values():
+                self._stop(zk)
+            self.clients = {}
+
+_sessions = ZookeeperSessions()
+atexit.register(_sessions.close)
+
+def zk_session(hosts):
+    """ Started KazooClient for 'hosts', shared with the rest of the process.
+    Do not stop it, it is closed at exit"""
+    return _sessions.get(hosts)
@@ -0,0 +1,58 @@
+import os
+import shutil
+import urllib2
+import tempfile
+import unittest
+from concord.artifact_server import *
+from concord.slug import build_slug
+from testing_utilities import *
+
+class TestArtifactServer(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dirname = tempfile.mkdtemp()
+        self.store = os.path.join(self.temp_dirname, 'store')
+        os.mkdir(self.store)
+        self.server = start_server(self.store, '127.0.0.1')
+        self.base_url = 'http://127.0.0.1:%d/' % self.server.server_address[1]
+        path = os.path.join(self.temp_dirname, 'op/run')
+        create_temporary_file(path)
+        with open(path, 'w') as data_file:
+            data_file.write('run' * 1000)
+        self.slug = build_slug(['op/run'], root=self.temp_dirname)
+
+    def tearDown(self):
+        self.slug.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.temp_dirname)
+
+    def test_publish(self):
+        url = publish_slug(self.base_url, self.slug)
+        self.assertEqual(url, self.base_url + artifact_name(self.slug))
+        self.assertTrue(artifact_name(self.slug).endswith('.tar.gz'))
+        self.assertEqual(urllib2.urlopen(url).read(), self.slug.read())
+        self.assertTrue(artifact_exists(url, self.slug.size))
+        # Published again without an upload
+        mtime = os.path.getmtime(os.path.join(self.store,
+                                              artifact_name(self.slug)))
+        self.assertEqual(publish_slug(self.base_url, self.slug), url)
+        self.assertEqual(os.path.getmtime(
+            os.path.join(self.store, artifact_name(self.slug))), mtime)
+
+    def test_published_mode(self):
+        publish_slug(self.base_url, self.slug)
+        path = os.path.join(self.store, artifact_name(self.slug))
+        self.assertEqual(os.stat(path).st_mode & 0777, 0644)
+
+    def test_digest_mismatch(self):
+        self.slug.digest = 'sha256:' + '0' * 64
+        self.assertRaises(urllib2.HTTPError, publish_slug, self.base_url,
+                          self.slug)
+        self.assertListEqual(os.listdir(self.store), [])
+
+    def test_missing_artifact(self):
+        self.assertFalse(artifact_exists(self.base_url + 'nope.tar.gz', 1))
+
+if __name__ == '__main__':
+    unittest.main()
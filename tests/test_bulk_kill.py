@@ -0,0 +1,123 @@
+import time
+import threading
+import unittest
+from concord.bulk_kill import *
+from concord.internal.thrift.ttypes import BoltError
+from thrift.transport.TTransport import TTransportException
+
+class FakeClient(object):
+    def __init__(self, pool):
+        self.pool = pool
+        self.attempts = 0
+
+    def killTask(self, task_id):
+        self.attempts = 1
+        with self.pool.lock:
+            self.pool.running += 1
+            self.pool.most = max(self.pool.most, self.pool.running)
+        try:
+            time.sleep(0.01)
+            if task_id in self.pool.errors:
+                raise self.pool.errors[task_id]
+            self.pool.killed.append(task_id)
+        finally:
+            with self.pool.lock:
+                self.pool.running -= 1
+
+class FakePool(object):
+    """ SchedulerPool handing out FakeClients, 'errors' maps task ids to
+    what killing them raises"""
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.lock = threading.Lock()
+        self.running = 0
+        self.most = 0
+        self.killed = []
+        self.released = []
+
+    def acquire(self, zkurl, zkpath):
+        return FakeClient(self)
+
+    def release(self, zkurl, zkpath, cli, reusable=True):
+        self.released.append(reusable)
+
+class TestBulkKill(unittest.TestCase):
+
+    def test_kills_everything_in_order(self):
+        pool = FakePool()
+        task_ids = ['task-%d' % i for i in xrange(20)]
+        results = kill_tasks(pool, 'zk', '/concord', task_ids, concurrency=4)
+        self.assertEqual([r.task_id for r in results], task_ids)
+        self.assertEqual(sorted(pool.killed), sorted(task_ids))
+        self.assertEqual(failed(results), [])
+        self.assertTrue(1 < pool.most <= 4)
+
+    def test_failures_do_not_stop_the_rest(self):
+        pool = FakePool({ 'task-1': BoltError(reason='unknown task'),
+                          'task-3': TTransportException(
+                              TTransportException.END_OF_FILE) })
+        task_ids = ['task-%d' % i for i in xrange(5)]
+        results = kill_tasks(pool, 'zk', '/concord', task_ids, concurrency=2)
+        self.assertEqual([r.task_id for r in failed(results)],
+                         ['task-1', 'task-3'])
+        self.assertEqual(sorted(pool.killed), ['task-0', 'task-2', 'task-4'])
+        # Only a broken connection is not handed out again
+        self.assertEqual(pool.released.count(False), 1)
+        self.assertIn('Killed 3 of 5 tasks, 2 failed', results_table(results))
+        report = results_json(results)
+        self.assertEqual([r['ok'] for r in report],
+                         [True, False, True, False, True])
+
+    def test_shared_client(self):
+        # Every worker gets the same client, what a result reports must be
+        # read before the client is handed out again
+        class SharedClient(object):
+            def __init__(self):
+                self.attempts = 0
+
+            def killTask(self, task_id):
+                self.attempts = int(task_id.split('-')[1])
+                time.sleep(0.005)
+
+        class SharedPool(FakePool):
+            def __init__(self):
+                FakePool.__init__(self)
+                self.cli = SharedClient()
+
+            def acquire(self, zkurl, zkpath):
+                return self.cli
+
+            def release(self, zkurl, zkpath, cli, reusable=True):
+                # Another task picking it up right away
+                cli.attempts = -1
+
+        task_ids = ['task-%d' % i for i in xrange(1, 9)]
+        results = kill_tasks(SharedPool(), 'zk', '/concord', task_ids,
+                             concurrency=1)
+        self.assertEqual([r.attempts for r in results], range(1, 9))
+
+    def test_acquire_failure(self):
+        class NoLeaderPool(FakePool):
+            def acquire(self, zkurl, zkpath):
+                raise TTransportException(TTransportException.NOT_OPEN,
+                                          'No scheduler leader found')
+
+        results = kill_tasks(NoLeaderPool(), 'zk', '/concord',
+                             ['task-1', 'task-2'])
+        self.assertEqual([r.task_id for r in failed(results)],
+                         ['task-1', 'task-2'])
+        self.assertIn('No scheduler leader found', results[0].error)
+        self.assertEqual(results[0].attempts, 0)
+
+    def test_rate(self):
+        limiter = RateLimiter(100)
+        start = time.time()
+        for _ in xrange(11):
+            limiter.acquire()
+        self.assertTrue(time.time() - start >= 0.1)
+
+    def test_nothing_to_kill(self):
+        self.assertEqual(kill_tasks(FakePool(), 'zk', '/concord', []), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import copy
+import unittest
+from concord.compact_metadata import *
+from concord.internal.thrift.ttypes import TopologyMetadata
+from concord.thrift_utils import bytes_to_thrift, thrift_to_bytes
+from testing_utilities import *
+
+class TestCompactMetadata(unittest.TestCase):
+
+    def setUp(self):
+        with open(test_filepath('test_topology_metadata')) as data_file:
+            self.data = data_file.read()
+        self.meta = TopologyMetadata()
+        bytes_to_thrift(self.data, self.meta)
+
+    def test_same_fields(self):
+        model = compact(self.meta)
+        self.assertEqual(model.frameworkID, self.meta.frameworkID)
+        for name, layout in self.meta.computations.items():
+            computation = model.computations[name]
+            self.assertEqual(list(computation.ostreams), layout.ostreams)
+            self.assertEqual([(s.name, s.grouping) for s in layout.istreams],
+                             list(computation.istreams))
+            for task, node in zip(computation.nodes, layout.nodes):
+                for field in Task.__slots__:
+                    if field != 'taskHelper':
+                        self.assertEqual(getattr(task, field),
+                                         getattr(node, field))
+                helper = task.taskHelper
+                self.assertEqual(helper.execName, node.taskHelper.execName)
+                self.assertEqual(list(helper.environmentExtra),
+                                 node.taskHelper.environmentExtra)
+                self.assertEqual(helper.client.ip, node.taskHelper.client.ip)
+                self.assertEqual(helper.client.port,
+                                 node.taskHelper.client.port)
+        self.assertEqual(compact_metadata(self.data), model)
+
+    def test_shared_values(self):
+        layout = self.meta.computations.values()[0]
+        twin = copy.deepcopy(layout.nodes[0])
+        twin.taskId = 'twin'
+        layout.nodes.append(twin)
+        model = compact_metadata(thrift_to_bytes(self.meta))
+        first, second = model.computations[layout.name].nodes[-2:]
+        self.assertIs(first.taskHelper.client, second.taskHelper.client)
+        self.assertIs(first.taskHelper.environmentExtra,
+                      second.taskHelper.environmentExtra)
+        self.assertIs(first.slaveId, second.slaveId)
+
+    def test_read_only(self):
+        task = compact(self.meta).computations.values()[0].nodes[0]
+        self.assertRaises(AttributeError, setattr, task, 'mem', 1)
+        self.assertRaises(AttributeError, setattr, task, 'extra', 1)
+
+if __name__ == '__main__':
+    unittest.main()
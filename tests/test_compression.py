@@ -0,0 +1,91 @@
+import os
+import gzip
+import shutil
+import random
+import tempfile
+import unittest
+from cStringIO import StringIO
+from concord.compression import *
+
+class TestCompression(unittest.TestCase):
+
+    def gunzip(self, data):
+        return gzip.GzipFile(fileobj=StringIO(data), mode='rb').read()
+
+    def test_parallel_gzip_roundtrip(self):
+        rand = random.Random(7)
+        payload = ''.join(chr(rand.randint(0, 8)) for _ in xrange(100000))
+        for workers in [1, 3]:
+            out = StringIO()
+            with ParallelGzipWriter(out, workers, block_size=4096) as gz:
+                # Uneven writes must not matter, blocks are cut at block_size
+                for i in xrange(0, len(payload), 3000):
+                    gz.write(payload[i:i + 3000])
+            self.assertEqual(self.gunzip(out.getvalue()), payload)
+
+    def test_parallel_gzip_empty(self):
+        out = StringIO()
+        ParallelGzipWriter(out, 2).close()
+        self.assertEqual(self.gunzip(out.getvalue()), '')
+
+    def test_gzip_single_worker(self):
+        payload = 'concord ' * 10000
+        writer = open_writer(StringIO(), 'gzip', DEFAULT_LEVEL, 1)
+        self.assertIsInstance(writer, gzip.GzipFile)
+        writer.close()
+        # Deterministic output does not depend on the worker count
+        outputs = []
+        for workers in [1, 3]:
+            out = StringIO()
+            with open_writer(out, 'gzip', DEFAULT_LEVEL, workers,
+                             deterministic=True) as writer:
+                writer.write(payload)
+            outputs.append(out.getvalue())
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual(self.gunzip(outputs[0]), payload)
+
+    def test_parse_codec(self):
+        self.assertEqual(parse_codec('gzip'), ('gzip', DEFAULT_LEVEL))
+        self.assertEqual(parse_codec('gzip:9'), ('gzip', 9))
+        self.assertEqual(parse_codec('none'), ('none', 0))
+        self.assertEqual(parse_codec('auto'), (AUTO, None))
+        for bad in ['gzip:10', 'gzip:x', 'rar', 'auto:3', '']:
+            self.assertRaises(ValueError, parse_codec, bad)
+
+    def test_codec_roundtrip(self):
+        decompress = { 'none': lambda d: d, 'gzip': self.gunzip }
+        if lzma is not None:
+            decompress['xz'] = lzma.decompress
+        if zstandard is not None:
+            decompress['zstd'] = lambda d: \
+                zstandard.ZstdDecompressor().decompressobj().decompress(d)
+        if lz4frame is not None:
+            decompress['lz4'] = lz4frame.decompress
+
+        payload = 'concord ' * 10000
+        for name, fn in decompress.iteritems():
+            for workers in [1, 2]:
+                out = StringIO()
+                with open_writer(out, name, CODECS[name].default_level,
+                                 workers) as writer:
+                    writer.write(payload)
+                self.assertEqual(fn(out.getvalue()), payload)
+
+    def test_choose_codec(self):
+        temp_dirname = tempfile.mkdtemp()
+        try:
+            text = os.path.join(temp_dirname, 'text')
+            with open(text, 'w') as f:
+                f.write('concord stream operator\n' * 100000)
+            noise = os.path.join(temp_dirname, 'noise')
+            with open(noise, 'w') as f:
+                f.write(os.urandom(1 << 20))
+
+            # Over a very slow link anything that compresses text wins
+            name, level = choose_codec([text], [os.path.getsize(text)], 1024)
+            self.assertNotEqual(name, 'none')
+            # Random data on an infinitely fast link is not worth compressing
+            name, level = choose_codec([noise], [1 << 20], float(1 << 50))
+            self.assertEqual(name, 'none')
+        finally:
+            shutil.rmtree(temp_dirname)
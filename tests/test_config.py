@@ -0,0 +1,70 @@
+import os
+import json
+import shutil
+import argparse
+import tempfile
+import unittest
+from concord.config import write_defaults
+from concord.thrift_utils import PROTOCOLS
+from concord.utils import *
+
+class TestConfig(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dirname = tempfile.mkdtemp()
+        self.current_dir = os.getcwd()
+        os.chdir(self.temp_dirname)
+
+    def tearDown(self):
+        os.chdir(self.current_dir)
+        shutil.rmtree(self.temp_dirname)
+
+    def write_config(self, protocol):
+        with open(CONCORD_FILENAME, 'w') as config_file:
+            json.dump({ 'zookeeper_hosts': 'localhost:2181',
+                        'zookeeper_path': '/concord',
+                        'scheduler_protocol': protocol }, config_file)
+
+    def test_valid_protocols(self):
+        for protocol in PROTOCOLS:
+            self.write_config(protocol)
+            self.assertEqual(fetch_config_opts(self.temp_dirname,
+                                               CONCORD_FILENAME)
+                             ['scheduler_protocol'], protocol)
+
+    def test_invalid_protocol(self):
+        self.write_config('json')
+        with self.assertRaises(ValueError) as context:
+            fetch_config_opts(self.temp_dirname, CONCORD_FILENAME)
+        self.assertIn("'json'", str(context.exception))
+        self.assertIn(CONCORD_FILENAME, str(context.exception))
+
+    def test_invalid_protocol_usage_error(self):
+        self.write_config('json')
+        parser = argparse.ArgumentParser()
+        parser.add_argument("--protocol")
+        errors = []
+        def error(message):
+            errors.append(message)
+            raise SystemExit(2)
+        parser.error = error
+        options = parser.parse_args([])
+        self.assertRaises(SystemExit, default_options, options, parser)
+        self.assertIn("'json'", errors[0])
+
+    def test_write_defaults(self):
+        write_defaults({ 'scheduler_protocol': 'auto' },
+                       CONCORD_DEFAULTS.copy(), CONCORD_FILENAME)
+        self.assertEqual(fetch_config_opts(self.temp_dirname,
+                                           CONCORD_FILENAME)
+                         ['scheduler_protocol'], 'auto')
+        self.assertRaises(ValueError, write_defaults,
+                          { 'scheduler_protocol': 'bogus' },
+                          CONCORD_DEFAULTS.copy(), CONCORD_FILENAME)
+        # The stored settings are left as they were
+        self.assertEqual(fetch_config_opts(self.temp_dirname,
+                                           CONCORD_FILENAME)
+                         ['scheduler_protocol'], 'auto')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import concord.utils
+from concord.delta import *
+from testing_utilities import *
+
+class TestDelta(unittest.TestCase):
+
+    def setUp(self):
+        self.current_dir = os.getcwd()
+        self.temp_dirname = tempfile.mkdtemp()
+        self.old_home = concord.utils.CONCORD_HOME
+        concord.utils.CONCORD_HOME = os.path.join(self.temp_dirname,
+                                                  '.concord')
+        os.chdir(self.temp_dirname)
+        self.files = ['op/run', 'op/lib.so', 'op/model.bin']
+        for f in self.files:
+            create_temporary_file(os.path.join(self.temp_dirname, f))
+            with open(f, 'w') as data_file:
+                data_file.write(f * 1000)
+
+    def tearDown(self):
+        concord.utils.CONCORD_HOME = self.old_home
+        shutil.rmtree(self.temp_dirname)
+        os.chdir(self.current_dir)
+
+    def test_diff(self):
+        base = file_manifest(self.files)
+        self.assertEqual(diff(base, file_manifest(self.files, base)), ([], []))
+
+        with open('op/run', 'w') as data_file:
+            data_file.write('changed')
+        create_temporary_file(os.path.join(self.temp_dirname, 'op/new'))
+        current = file_manifest(['op/run', 'op/lib.so', 'op/new'], base)
+        self.assertEqual(diff(base, current),
+                         (['op/new', 'op/run'], ['op/model.bin']))
+
+    def test_file_manifest_reuses_digests(self):
+        base = file_manifest(self.files)
+        # A stale digest is trusted as long as size and mtime match
+        base['op/run'] = base['op/run'][:2] + ['stale']
+        self.assertEqual(file_manifest(self.files, base)['op/run'][2], 'stale')
+        os.utime('op/run', (0, 0))
+        self.assertNotEqual(file_manifest(self.files, base)['op/run'][2],
+                            'stale')
+
+    def test_worth_patching(self):
+        manifest = file_manifest(self.files)
+        self.assertTrue(worth_patching(['op/run'], manifest))
+        self.assertFalse(worth_patching(self.files, manifest))
+
+    def test_base_record(self):
+        hosts, path = 'localhost:2181', '/concord'
+        self.assertIsNone(load_base(hosts, path, 'op'))
+        manifest = file_manifest(self.files)
+        save_base(hosts, path, 'op', 'sha256:abc', manifest)
+        base = load_base(hosts, path, 'op')
+        self.assertEqual(base['digest'], 'sha256:abc')
+        self.assertEqual(base['files'], json.loads(json.dumps(manifest)))
+        with open(concord.delta._base_path(hosts, path, 'op'), 'w') as f:
+            f.write('{"digest": "sha256:abc"')
+        self.assertIsNone(load_base(hosts, path, 'op'))
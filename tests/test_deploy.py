@@ -3,6 +3,7 @@ import json
 import tempfile
 import shutil
 import re
+from concord import deploy
 from concord.deploy import *
 from testing_utilities import *
 from subprocess import call
@@ -142,11 +143,135 @@ class TestDeployScript(unittest.TestCase):
                 create_temporary_file(f)
 
             # Assert that only elements on the white list remain
-            all_include = tar_file_list(white_list, black_list)
-            all_include.sort()
+            all_include = sorted(tar_file_list(white_list, black_list))
             successful.sort()
             self.assertListEqual(all_include, successful)
         finally:
             # Remove temporary directory and change back to original dir
             shutil.rmtree(temp_dirname)
             os.chdir(current_dir)
+
+    def test_validate_compression(self):
+        req_dict = dict.fromkeys(self.requiredKeys)
+        for spec in ['gzip', 'gzip:1', 'none', 'auto']:
+            req_dict['compression'] = spec
+            validate_json_raw_config(req_dict, self.stub)
+        for spec in ['gzip:0', 'snappy']:
+            req_dict['compression'] = spec
+            self.assertRaises(RuntimeError, validate_json_raw_config,
+                              req_dict, self.stub)
+
+    def test_slug_executor_args(self):
+        class FakeSlug(object):
+            digest = 'sha256:abc'
+            codec = DEFAULT_CODEC
+            delta_base = None
+        self.assertEqual(slug_executor_args(FakeSlug()),
+                         ['--slug_digest=sha256:abc'])
+        # Nothing older executors would not know
+        self.assertEqual(slug_executor_args(FakeSlug(), send_digest=False),
+                         [])
+        self.assertEqual(slug_executor_args(FakeSlug(), delta=True,
+                                            send_digest=False),
+                         ['--slug_digest=sha256:abc'])
+        self.assertEqual(slug_executor_args(FakeSlug(), 'http://a/s',
+                                            send_digest=False),
+                         ['--slug_digest=sha256:abc', '--slug_url=http://a/s'])
+
+    def test_tar_file_list_prunes_directories(self):
+        total_files = [ 'op/a1', 'op/.git/objects/x1', 'op/.git/HEAD',
+                        'op/node_modules/dep/index.js', 'op/sub/b1' ]
+        # Overlapping white list entries produce each file once
+        white_list = [ 'op', 'op/a1' ]
+        black_list = [ '.git', 'node_modules' ]
+        succ_list = [ 'op/a1', 'op/sub/b1' ]
+        self.tar_tester_driver(total_files, white_list, black_list, succ_list)
+
+    def test_tar_file_list_black_list_groups(self):
+        total_files = [ 'op/zcc', 'op/zcd', 'op/a1', 'op/b2', 'op/c3' ]
+        white_list = [ 'op' ]
+        # Each regex keeps its own group numbers and names
+        black_list = [ '(.)x', 'z(.)\\1', '(?P<n>a)1', '(?P<n>b)2' ]
+        succ_list = [ 'op/zcd', 'op/c3' ]
+        self.tar_tester_driver(total_files, white_list, black_list, succ_list)
+
+    def test_tar_file_list_ignore_file(self):
+        total_files = [ 'build/out', 'src/build/x', 'src/a.o', 'src/a.c',
+                        'src/keep.o' ]
+        ignore = IgnoreMatcher(['/build/', '*.o', '!keep.o'])
+        temp_dirname = tempfile.mkdtemp()
+        current_dir = os.getcwd()
+        try:
+            os.chdir(temp_dirname)
+            for f in total_files:
+                create_temporary_file(temp_dirname + '/' + f)
+            self.assertListEqual(
+                sorted(tar_file_list(['build', 'src', './build/out'], [],
+                                     ignore)),
+                ['src/a.c', 'src/build/x', 'src/keep.o'])
+        finally:
+            shutil.rmtree(temp_dirname)
+            os.chdir(current_dir)
+
+    def test_tar_file_list_root(self):
+        temp_dirname = tempfile.mkdtemp()
+        try:
+            for f in ['op/a1', 'op/sub/b1', 'op/.git/HEAD', 'c1']:
+                create_temporary_file(temp_dirname + '/' + f)
+            # Paths stay relative to the root, the cwd is not involved
+            self.assertListEqual(
+                sorted(tar_file_list(['op', 'c1'], ['.git'], root=temp_dirname)),
+                ['c1', 'op/a1', 'op/sub/b1'])
+        finally:
+            shutil.rmtree(temp_dirname)
+
+    def test_tar_file_list_root_ignore_file(self):
+        temp_dirname = tempfile.mkdtemp()
+        try:
+            for f in ['build/out', 'src/a.o', 'src/a.c']:
+                create_temporary_file(temp_dirname + '/' + f)
+            # Patterns match relative to the root, not to the cwd
+            ignore = IgnoreMatcher(['/build/', '*.o'])
+            self.assertListEqual(
+                sorted(tar_file_list(['build', 'src',
+                                      temp_dirname + '/build/out'], [],
+                                     ignore, root=temp_dirname)),
+                ['src/a.c'])
+        finally:
+            shutil.rmtree(temp_dirname)
+
+    def test_expand_configs(self):
+        temp_dirname = tempfile.mkdtemp()
+        try:
+            for f in ['topo/a.json', 'topo/b.json', 'topo/notes.txt',
+                      'c.json']:
+                create_temporary_file(temp_dirname + '/' + f)
+            topo = temp_dirname + '/topo'
+            self.assertListEqual(
+                expand_configs([topo, temp_dirname + '/*.json',
+                                topo + '/a.json'], self.stub),
+                [topo + '/a.json', topo + '/b.json', temp_dirname + '/c.json'])
+            self.assertRaises(RuntimeError, expand_configs,
+                              [temp_dirname + '/*.yaml'], self.stub)
+        finally:
+            shutil.rmtree(temp_dirname)
+
+    def test_register_protocol(self):
+        pools = []
+        class FakePool(object):
+            def __init__(self, protocol):
+                self.protocol = protocol
+                self.closed = False
+                pools.append(self)
+            def close(self):
+                self.closed = True
+        patched = (deploy.SchedulerPool, deploy.deploy_request)
+        deploy.SchedulerPool = FakePool
+        deploy.deploy_request = lambda request, config, timings, pool, \
+            progress: pool.protocol
+        try:
+            self.assertEqual(register({ 'computation_name': 'c' }, 'c.json',
+                                      protocol='compact'), 'compact')
+        finally:
+            deploy.SchedulerPool, deploy.deploy_request = patched
+        self.assertTrue(pools[0].closed)
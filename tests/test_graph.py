@@ -1,5 +1,6 @@
 import os
 import unittest
+from concord import print_graph
 from concord.internal.thrift.ttypes import *
 from concord.print_graph import *
 from testing_utilities import *
@@ -38,3 +39,39 @@ class TestPrintGraph(unittest.TestCase):
             self.assertEquals(test_data, self.test_topology_graph)
         finally:
             os.unlink(temp_file_name)
+
+    def test_watch_dot_opens_viewer_once_rendered(self):
+        renders = []
+        class FakeDigraph(object):
+            def __init__(self, **kwargs):
+                pass
+            def node(self, *args):
+                pass
+            def edge(self, *args, **kwargs):
+                pass
+            def render(self, filename, view, cleanup):
+                renders.append(view)
+        metadata = self.stubbed_metadata
+        class FakeWatcher(object):
+            def __init__(self, zkurl, zkpath, callback, decode):
+                # The znode does not exist yet, then shows up twice
+                callback(None, None)
+                callback(metadata, None)
+                callback(metadata, None)
+            def stop(self):
+                pass
+        class Interrupted(object):
+            @staticmethod
+            def sleep(seconds):
+                raise KeyboardInterrupt()
+        patched = (print_graph.Digraph, print_graph.TopologyWatcher,
+                   print_graph.time)
+        print_graph.Digraph = FakeDigraph
+        print_graph.TopologyWatcher = FakeWatcher
+        print_graph.time = Interrupted
+        try:
+            watch_dot('zk:2181', '/concord', 'graph')
+        finally:
+            (print_graph.Digraph, print_graph.TopologyWatcher,
+             print_graph.time) = patched
+        self.assertEqual(renders, [True, False])
@@ -0,0 +1,54 @@
+import unittest
+from concord.ignore import *
+
+class TestIgnore(unittest.TestCase):
+
+    def assertIgnored(self, patterns, ignored, kept):
+        matcher = IgnoreMatcher(patterns)
+        for path in ignored:
+            is_dir = path.endswith('/')
+            self.assertTrue(matcher.ignored(path.rstrip('/'), is_dir),
+                            '%s should be ignored by %s' % (path, patterns))
+        for path in kept:
+            is_dir = path.endswith('/')
+            self.assertFalse(matcher.ignored(path.rstrip('/'), is_dir),
+                             '%s should be kept by %s' % (path, patterns))
+
+    def test_comments_and_blank_lines(self):
+        self.assertIgnored(['# comment', '', '   ', '\\#hash'],
+                           ['#hash', 'a/#hash'], ['comment', '# comment'])
+
+    def test_unanchored_patterns(self):
+        self.assertIgnored(['*.o', 'tmp'],
+                           ['a.o', 'src/lib/b.o', 'tmp', 'src/tmp/x.c'],
+                           ['a.c', 'src/a.oo', 'tmpfile'])
+
+    def test_anchored_patterns(self):
+        self.assertIgnored(['/build/', 'docs/*.md'],
+                           ['build/', 'build/out.bin', 'docs/a.md'],
+                           ['src/build/', 'src/build/x', 'build',
+                            'docs/sub/a.md', 'src/docs/a.md'])
+
+    def test_directory_only_patterns(self):
+        self.assertIgnored(['logs/'], ['logs/', 'a/logs/', 'logs/x'],
+                           ['logs', 'a/logs'])
+
+    def test_double_star(self):
+        self.assertIgnored(['**/cache', 'out/**', 'a/**/z'],
+                           ['cache', 'x/y/cache', 'out/a', 'out/a/b',
+                            'a/z', 'a/b/c/z'],
+                           ['out', 'a/zz', 'b/a/z'])
+
+    def test_character_classes(self):
+        self.assertIgnored(['file[0-9].txt', 'v[!a-z]'],
+                           ['file1.txt', 'v1'], ['filea.txt', 'va'])
+
+    def test_negation(self):
+        # The last matching pattern wins
+        self.assertIgnored(['*.log', '!keep.log', 'keep.log.old'],
+                           ['a.log', 'sub/b.log', 'keep.log.old'],
+                           ['keep.log', 'sub/keep.log'])
+        self.assertIgnored(['!keep.log', '*.log'], ['keep.log'], [])
+        # Files can't be re-included when a parent directory is excluded
+        self.assertIgnored(['vendor/', '!vendor/keep.c'],
+                           ['vendor/keep.c'], [])
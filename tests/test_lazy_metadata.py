@@ -0,0 +1,63 @@
+import unittest
+from concord import lazy_metadata
+from concord.lazy_metadata import *
+from concord.internal.thrift.ttypes import *
+from concord.thrift_utils import bytes_to_thrift
+from testing_utilities import *
+
+class TestLazyMetadata(unittest.TestCase):
+
+    def setUp(self):
+        with open(test_filepath('test_topology_metadata')) as data_file:
+            self.data = data_file.read()
+        self.meta = TopologyMetadata()
+        bytes_to_thrift(self.data, self.meta)
+        self.fastbinary = lazy_metadata.fastbinary
+
+    def tearDown(self):
+        lazy_metadata.fastbinary = self.fastbinary
+
+    def check_decode(self):
+        lazy = decode_metadata(self.data)
+        self.assertEqual(lazy.version, self.meta.version)
+        self.assertEqual(lazy.frameworkID, self.meta.frameworkID)
+        self.assertEqual(sorted(lazy.computations),
+                         sorted(self.meta.computations))
+        for name, layout in self.meta.computations.items():
+            computation = lazy.computations[name]
+            self.assertEqual(computation.name, layout.name)
+            self.assertEqual(computation.istreams, layout.istreams)
+            self.assertEqual(computation.ostreams, layout.ostreams)
+            self.assertEqual(computation._nodes, None)
+            self.assertEqual(computation.nodes, layout.nodes)
+
+        lazy = decode_metadata(self.data, ['taskId', 'taskHelper.execName'])
+        for name, layout in self.meta.computations.items():
+            for node, full in zip(lazy.computations[name].nodes, layout.nodes):
+                self.assertEqual(node.taskId, full.taskId)
+                self.assertEqual(node.taskHelper.execName,
+                                 full.taskHelper.execName)
+                self.assertIsNone(node.slaveId)
+                self.assertIsNone(node.taskHelper.client)
+
+    def test_decode(self):
+        self.check_decode()
+
+    def test_decode_without_fastbinary(self):
+        lazy_metadata.fastbinary = None
+        self.check_decode()
+
+    def test_prune_spec(self):
+        spec = prune_spec(PhysicalComputationMetadata.thrift_spec,
+                          ['mem', 'taskHelper.client'])
+        self.assertEqual(len(spec), len(PhysicalComputationMetadata.thrift_spec))
+        self.assertEqual([e[2] for e in spec if e is not None],
+                         ['mem', 'taskHelper'])
+        helper_spec = spec[6][3][1]
+        self.assertEqual([e[2] for e in helper_spec if e is not None],
+                         ['client'])
+        self.assertRaises(ValueError, prune_spec,
+                          PhysicalComputationMetadata.thrift_spec, ['mem.x'])
+
+if __name__ == '__main__':
+    unittest.main()
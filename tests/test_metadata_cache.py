@@ -0,0 +1,60 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+import concord.utils
+from concord import metadata_cache
+from concord.internal.thrift.ttypes import TopologyMetadata
+from concord.thrift_utils import bytes_to_thrift
+from kazoo.protocol.states import ZnodeStat
+from testing_utilities import *
+
+def make_stat(version, data_length):
+    return ZnodeStat(czxid=1, mzxid=10 + version, ctime=0, mtime=0,
+                     version=version, cversion=0, aversion=0,
+                     ephemeralOwner=0, dataLength=data_length,
+                     numChildren=0, pzxid=1)
+
+class TestMetadataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dirname = tempfile.mkdtemp()
+        self.old_home = concord.utils.CONCORD_HOME
+        concord.utils.CONCORD_HOME = self.temp_dirname
+        with open(test_filepath('test_topology_metadata')) as data_file:
+            self.data = data_file.read()
+        self.meta = TopologyMetadata()
+        bytes_to_thrift(self.data, self.meta)
+        self.stat = make_stat(3, len(self.data))
+        metadata_cache.store('zk:2181', '/concord', self.data, self.stat,
+                             self.meta)
+
+    def tearDown(self):
+        concord.utils.CONCORD_HOME = self.old_home
+        shutil.rmtree(self.temp_dirname)
+
+    def test_hit(self):
+        data, decoded = metadata_cache.lookup('zk:2181', '/concord', self.stat)
+        self.assertEqual(data, self.data)
+        self.assertEqual(decoded, self.meta)
+
+    def test_miss(self):
+        self.assertIsNone(metadata_cache.lookup('zk:2181', '/other',
+                                                self.stat))
+        self.assertIsNone(metadata_cache.lookup(
+            'zk:2181', '/concord', make_stat(4, len(self.data))))
+        # Past the ttl
+        self.assertIsNone(metadata_cache.lookup('zk:2181', '/concord',
+                                                self.stat, ttl=-1))
+
+    def test_unreadable_pickle(self):
+        path = metadata_cache._cache_path('zk:2181', '/concord', '.pickle')
+        with open(path, 'w') as pickle_file:
+            pickle_file.write('garbage')
+        data, decoded = metadata_cache.lookup('zk:2181', '/concord', self.stat)
+        self.assertEqual(data, self.data)
+        self.assertIsNone(decoded)
+
+if __name__ == '__main__':
+    unittest.main()
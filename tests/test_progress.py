@@ -0,0 +1,52 @@
+import socket
+import unittest
+from StringIO import StringIO
+from concord.progress import *
+from thrift.transport.TTransport import TTransportException
+
+class FakeTerminal(StringIO):
+    def isatty(self):
+        return True
+
+class TestProgress(unittest.TestCase):
+
+    def setUp(self):
+        self.ours, self.theirs = socket.socketpair()
+
+    def tearDown(self):
+        self.ours.close()
+        self.theirs.close()
+
+    def test_counts_bytes(self):
+        sock = MeteredSocket(self.ours)
+        terminal = FakeTerminal()
+        sock.watch(ProgressBar('word-counter', 1000, stream=terminal))
+        sock.sendall('x' * 600)
+        sock.send('y' * 400)
+        self.assertEqual(sock.sent, 1000)
+        self.theirs.sendall('reply')
+        self.assertEqual(sock.recv(5), 'reply')
+        self.assertEqual(sock.received, 5)
+        sock.progress.finish(sock.sent)
+        self.assertIn('100% 1000.0B/1000.0B', terminal.getvalue())
+        self.assertTrue(terminal.getvalue().endswith('\n'))
+        sock.watch(None)
+        self.assertEqual((sock.sent, sock.send_seconds()), (0, 0.0))
+
+    def test_recv_timeout(self):
+        sock = MeteredSocket(self.ours, recv_timeout=0.1)
+        self.assertRaises(TTransportException, sock.recv, 1)
+
+    def test_send_timeout(self):
+        sock = MeteredSocket(self.ours, send_timeout=0.1)
+        # Nobody reads the other end, the socket buffers fill up
+        self.assertRaises(TTransportException, sock.sendall, 'x' * (64 << 20))
+        self.assertGreater(sock.sent, 0)
+
+    def test_format_eta(self):
+        self.assertEqual(format_eta(None), '--:--')
+        self.assertEqual(format_eta(75), '01:15')
+        self.assertEqual(format_eta(3725), '1:02:05')
+
+if __name__ == '__main__':
+    unittest.main()
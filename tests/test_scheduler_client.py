@@ -0,0 +1,87 @@
+import threading
+import unittest
+from concord import scheduler_client
+from concord.scheduler_client import *
+from thrift.transport.TTransport import TTransportException
+
+class FakeLeader(object):
+    def __init__(self, *addresses):
+        self.addresses = list(addresses)
+
+    def wait(self, timeout=None):
+        if len(self.addresses) > 1:
+            return self.addresses.pop(0)
+        return self.addresses[0]
+
+class FakeThriftClient(object):
+    def __init__(self, address, failures):
+        self.address = address
+        self.failures = failures
+        self.killed = []
+
+    def killTask(self, task_id):
+        if self.failures:
+            self.failures.pop()
+            raise TTransportException(TTransportException.END_OF_FILE)
+        self.killed.append(task_id)
+
+class FakeSchedulerClient(SchedulerClient):
+    """ Hands out fake thrift clients, 'failures' calls fail before any
+    succeeds"""
+    def __init__(self, leader, failures=0, retries=DEFAULT_RETRIES):
+        SchedulerClient.__init__(self, leader, retries=retries)
+        self.failures = [None] * failures
+        self.connected = []
+
+    def connect(self):
+        address = self.leader.wait()
+        if self.client is None or address != self.address:
+            self.client = FakeThriftClient(address, self.failures)
+            self.address = address
+            self.connected.append(address)
+        return self.client
+
+    def close(self):
+        self.client = None
+
+class TestSchedulerClient(unittest.TestCase):
+
+    def setUp(self):
+        self.sleep = scheduler_client.time.sleep
+        scheduler_client.time.sleep = lambda seconds: None
+
+    def tearDown(self):
+        scheduler_client.time.sleep = self.sleep
+
+    def test_backoff(self):
+        for attempt in xrange(20):
+            delay = backoff(attempt)
+            self.assertTrue(0 <= delay <= MAX_BACKOFF)
+        self.assertTrue(backoff(0) <= BASE_BACKOFF)
+
+    def test_retries_on_new_leader(self):
+        cli = FakeSchedulerClient(FakeLeader('a:1', 'b:2'), failures=1)
+        cli.killTask('task-1')
+        self.assertEqual(cli.connected, ['a:1', 'b:2'])
+        self.assertEqual(cli.client.killed, ['task-1'])
+
+    def test_gives_up(self):
+        cli = FakeSchedulerClient(FakeLeader('a:1'), failures=3, retries=2)
+        self.assertRaises(TTransportException, cli.killTask, 'task-1')
+        self.assertEqual(len(cli.connected), 3)
+
+    def test_leader_watch(self):
+        watch = LeaderWatch.__new__(LeaderWatch)
+        watch.path = '/concord/masterip'
+        watch.cond = threading.Condition()
+        watch.address = None
+        self.assertRaises(TTransportException, watch.wait, 0.01)
+        watch._changed('10.0.0.1:11219', None)
+        self.assertEqual(watch.wait(0), '10.0.0.1:11219')
+        watch._changed('10.0.0.2:11219', None)
+        self.assertEqual(watch.wait(0), '10.0.0.2:11219')
+        watch._changed(None, None)
+        self.assertRaises(TTransportException, watch.wait, 0.01)
+
+if __name__ == '__main__':
+    unittest.main()
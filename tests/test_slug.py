@@ -0,0 +1,178 @@
+import os
+import shutil
+import hashlib
+import tarfile
+import tempfile
+import unittest
+import concord.utils
+from concord.slug import *
+from concord import slug_cache
+from testing_utilities import *
+
+class TestSlug(unittest.TestCase):
+
+    def setUp(self):
+        self.current_dir = os.getcwd()
+        self.temp_dirname = tempfile.mkdtemp()
+        self.old_home = concord.utils.CONCORD_HOME
+        concord.utils.CONCORD_HOME = os.path.join(self.temp_dirname, '.concord')
+        os.chdir(self.temp_dirname)
+        self.files = ['operator/bin/run', 'operator/lib/a.so', 'config.json']
+        for f in self.files:
+            create_temporary_file(os.path.join(self.temp_dirname, f))
+            with open(f, 'w') as data_file:
+                data_file.write(f * 100)
+
+    def tearDown(self):
+        concord.utils.CONCORD_HOME = self.old_home
+        shutil.rmtree(self.temp_dirname)
+        os.chdir(self.current_dir)
+
+    def assertSlugContains(self, slug, names):
+        slug.fileobj.seek(0)
+        with tarfile.open(fileobj=slug.fileobj, mode="r:*") as tar:
+            members = [m.name for m in tar.getmembers() if m.isfile()]
+            self.assertListEqual(sorted(members), sorted(names))
+            for name in names:
+                self.assertEqual(tar.extractfile(name).read(), name * 100)
+
+    def test_build_slug_in_memory(self):
+        slug = build_slug(self.files)
+        try:
+            self.assertEqual(len(slug.read()), slug.size)
+            self.assertSlugContains(slug, self.files)
+        finally:
+            slug.close()
+
+    def test_build_slug_spills_past_threshold(self):
+        slug = build_slug(self.files, spool_threshold=1)
+        try:
+            self.assertTrue(slug.fileobj._rolled)
+            self.assertEqual(len(slug.read()), slug.size)
+            self.assertSlugContains(slug, self.files)
+        finally:
+            slug.close()
+
+    def test_slug_cache(self):
+        key = slug_cache.fingerprint(self.files)
+        self.assertIsNone(slug_cache.lookup(key))
+
+        slug = slug_cache.store(key, build_slug(self.files))
+        slug.close()
+        self.assertTrue(slug.digest.startswith('sha256:'))
+
+        cached = slug_cache.lookup(key)
+        try:
+            self.assertEqual(cached.digest, slug.digest)
+            self.assertEqual(cached.size, slug.size)
+            self.assertSlugContains(cached, self.files)
+        finally:
+            cached.close()
+
+        # Touching a file changes the key, even when only the mtime moves
+        st = os.stat(self.files[0])
+        os.utime(self.files[0], (st.st_atime, st.st_mtime + 10))
+        self.assertNotEqual(slug_cache.fingerprint(self.files), key)
+        self.assertNotEqual(slug_cache.fingerprint(self.files, digests=True),
+                            slug_cache.fingerprint(self.files))
+
+    def test_slug_cache_limit(self):
+        key = slug_cache.fingerprint(self.files)
+        slug = build_slug(self.files)
+        slug_cache.store(key, slug, max_bytes=slug.size - 1)
+        slug.close()
+        self.assertIsNone(slug_cache.lookup(key))
+
+    def test_evict_skips_vanished_files(self):
+        slug = build_slug(self.files)
+        for key in ['a', 'b', 'c']:
+            slug_cache.store(key, slug)
+        slug.close()
+        # Another deploy evicting at the same time removes files between
+        # the listing and the stat or remove
+        stat, remove = os.stat, os.remove
+        def racing_stat(path):
+            if path.endswith('a.slug'):
+                remove(path)
+            return stat(path)
+        def racing_remove(path):
+            remove(path)
+            if path.endswith('.slug'):
+                remove(path)
+        slug_cache.os.stat = racing_stat
+        slug_cache.os.remove = racing_remove
+        try:
+            slug_cache.evict(0)
+        finally:
+            slug_cache.os.stat = stat
+            slug_cache.os.remove = remove
+        self.assertIsNone(slug_cache.lookup('b'))
+        self.assertIsNone(slug_cache.lookup('c'))
+
+    def test_deployed_unchanged(self):
+        request = { 'zookeeper_hosts': 'localhost:2181',
+                    'zookeeper_path': '/concord',
+                    'computation_name': 'word-count' }
+        slug = build_slug(self.files)
+        slug.close()
+        self.assertFalse(slug_cache.deployed_unchanged(request, slug))
+        slug_cache.record_deploy(request['zookeeper_hosts'],
+                                 request['zookeeper_path'],
+                                 request['computation_name'], slug.digest)
+        self.assertTrue(slug_cache.deployed_unchanged(request, slug))
+        request['zookeeper_path'] = '/other'
+        self.assertFalse(slug_cache.deployed_unchanged(request, slug))
+
+    def test_throughput_record(self):
+        hosts, path = 'localhost:2181', '/concord'
+        self.assertIsNone(slug_cache.last_throughput(hosts, path))
+        slug_cache.record_throughput(hosts, path, 2000, 2)
+        self.assertEqual(slug_cache.last_throughput(hosts, path), 1000)
+        # A truncated record counts as no history
+        with open(slug_cache._throughput_path(hosts, path), 'w') as f:
+            f.write('{"bytes_per')
+        self.assertIsNone(slug_cache.last_throughput(hosts, path))
+        self.assertListEqual(os.listdir(os.path.dirname(
+            slug_cache._throughput_path(hosts, path))),
+            [os.path.basename(slug_cache._throughput_path(hosts, path))])
+
+    def test_build_slug_parallel(self):
+        slug = build_slug(self.files, workers=2)
+        try:
+            self.assertSlugContains(slug, self.files)
+        finally:
+            slug.close()
+
+    def test_build_slug_uncompressed(self):
+        slug = build_slug(self.files, codec='none', level=0)
+        try:
+            self.assertEqual(slug.codec, 'none')
+            self.assertSlugContains(slug, self.files)
+        finally:
+            slug.close()
+
+    def test_build_slug_deterministic(self):
+        def build(**kwargs):
+            slug = build_slug(self.files, deterministic=True, **kwargs)
+            try:
+                return (slug.digest, slug.read())
+            finally:
+                slug.close()
+
+        first = build(workers=1)
+        # Timestamps, listing order and worker count must not matter
+        for f in self.files:
+            os.utime(f, (1234567, 1234567))
+        self.files.reverse()
+        second = build(workers=3)
+        self.assertEqual(first, second)
+        self.assertEqual(first[0], 'sha256:' + hashlib.sha256(first[1]).hexdigest())
+
+        slug = build_slug(self.files, deterministic=True)
+        try:
+            with tarfile.open(fileobj=slug.fileobj, mode="r:gz") as tar:
+                for member in tar.getmembers():
+                    self.assertEqual(member.mtime, 0)
+                    self.assertEqual((member.uid, member.gid), (0, 0))
+        finally:
+            slug.close()
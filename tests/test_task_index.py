@@ -0,0 +1,73 @@
+import unittest
+from concord.task_index import *
+from concord.lazy_metadata import decode_metadata
+from concord.thrift_utils import thrift_to_bytes
+from concord.internal.thrift.ttypes import *
+
+def task(task_id, slave, ip, mem, docker, reconciling=False):
+    return PhysicalComputationMetadata(
+        taskId=task_id, slaveId=slave, cpus=0.5, mem=mem,
+        needsReconciliation=reconciling,
+        taskHelper=ExecutorTaskInfoHelper(
+            client=Endpoint(ip=ip, port=31000), dockerContainer=docker))
+
+def topology():
+    layouts = {
+        'word-source': [
+            task('source-1', 'S1', '10.0.0.1', 1024, 'concord/source:1.0'),
+            task('source-2', 'S2', '10.0.0.2', 8192, 'concord/source:1.1')],
+        'word-counter': [
+            task('counter-1', 'S1', '10.0.0.1', 4096, 'registry:5000/counter',
+                 reconciling=True),
+            task('counter-2', 'S3', '10.0.0.3', 8192, 'registry:5000/counter')],
+        'sink': [task('sink-1', 'S2', '10.0.0.2', 2048, '', True)],
+    }
+    return TopologyMetadata(computations=dict(
+        (name, PhysicalComputationLayout(name=name, istreams=[], ostreams=[],
+                                         nodes=nodes))
+        for name, nodes in layouts.items()))
+
+class TestTaskIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = TaskIndex(topology())
+
+    def ids(self, **criteria):
+        return [t.node.taskId for t in self.index.select(**criteria)]
+
+    def test_all(self):
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(self.ids(), ['sink-1', 'counter-1', 'counter-2',
+                                      'source-1', 'source-2'])
+
+    def test_selectors(self):
+        self.assertEqual(self.ids(computation='^word-c'),
+                         ['counter-1', 'counter-2'])
+        self.assertEqual(self.ids(slave='S1'), ['counter-1', 'source-1'])
+        self.assertEqual(self.ids(slave='10.0.0.2'), ['sink-1', 'source-2'])
+        self.assertEqual(self.ids(reconciling=True), ['sink-1', 'counter-1'])
+        self.assertEqual(self.ids(mem_gt=4096), ['counter-2', 'source-2'])
+        self.assertEqual(self.ids(docker='concord/source:1.1'), ['source-2'])
+        self.assertEqual(self.ids(docker='concord/source'),
+                         ['source-1', 'source-2'])
+        # A registry port is not a tag
+        self.assertEqual(self.ids(docker='registry:5000/counter'),
+                         ['counter-1', 'counter-2'])
+        self.assertEqual(self.ids(docker='registry'), [])
+
+    def test_combined(self):
+        self.assertEqual(self.ids(computation='word', slave='S1',
+                                  mem_gt=2048), ['counter-1'])
+        self.assertEqual(self.ids(reconciling=True, mem_gt=2048),
+                         ['counter-1'])
+        self.assertEqual(self.ids(computation='nothing', slave='S1'), [])
+
+    def test_lazy_metadata(self):
+        meta = decode_metadata(thrift_to_bytes(topology()),
+                               node_fields=INDEX_FIELDS)
+        index = TaskIndex(meta)
+        self.assertEqual([t.node.taskId for t in index.select(slave='S2')],
+                         ['sink-1', 'source-2'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import json
+import hashlib
+import unittest
+from StringIO import StringIO
+from concord.thrift_json import *
+from concord.internal.thrift.ttypes import *
+from concord.thrift_utils import bytes_to_thrift
+from testing_utilities import *
+
+class TestThriftJson(unittest.TestCase):
+
+    def setUp(self):
+        with open(test_filepath('test_topology_metadata')) as data_file:
+            self.meta = TopologyMetadata()
+            bytes_to_thrift(data_file.read(), self.meta)
+
+    def test_same_content(self):
+        old = json.loads(json.dumps(self.meta, default=lambda o: o.__dict__))
+        new = json.loads(thrift_to_json(self.meta))
+        for layout in old['computations'].values():
+            for stream in layout['istreams']:
+                stream['grouping'] = \
+                    StreamGrouping._VALUES_TO_NAMES[stream['grouping']]
+        self.assertEqual(old, new)
+
+    def test_spec_order(self):
+        endpoint = Endpoint(ip='127.0.0.1', port=31001)
+        self.assertEqual(thrift_to_json(endpoint),
+                         '{\n    "ip": "127.0.0.1",\n    "port": 31001\n}')
+        self.assertEqual(thrift_to_json(Endpoint()),
+                         '{\n    "ip": null,\n    "port": null\n}')
+
+    def test_enum_by_name(self):
+        stream = StreamMetadata(name='words', grouping=StreamGrouping.SHUFFLE)
+        self.assertEqual(json.loads(thrift_to_json(stream)),
+                         { 'name': 'words', 'grouping': 'SHUFFLE' })
+
+    def test_slug_summarized(self):
+        slug = '\x89PNG\x00' * 1000
+        req = BoltComputationRequest(slug=slug, instances=1)
+        dumped = thrift_to_json(req)
+        self.assertNotIn('PNG', dumped)
+        self.assertEqual(json.loads(dumped)['slug'],
+                         { 'size': len(slug),
+                           'sha256': hashlib.sha256(slug).hexdigest() })
+
+    def test_binary_string_summarized(self):
+        endpoint = Endpoint(ip='\xff\xfe', port=1)
+        self.assertEqual(json.loads(thrift_to_json(endpoint))['ip']['size'], 2)
+
+    def test_write_json(self):
+        out = StringIO()
+        write_json(self.meta, out)
+        self.assertEqual(out.getvalue(), thrift_to_json(self.meta))
+
+if __name__ == '__main__':
+    unittest.main()
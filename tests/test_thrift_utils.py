@@ -0,0 +1,121 @@
+import socket
+import threading
+import unittest
+from concord import thrift_utils
+from concord.thrift_utils import *
+from concord.internal.thrift.ttypes import *
+from concord.internal.thrift import BoltSchedulerService
+from thrift.protocol import TBinaryProtocol, TCompactProtocol
+from thrift.transport import TSocket, TTransport
+from testing_utilities import *
+
+def plain_bytes(thrift_struct):
+    transport = TTransport.TMemoryBuffer()
+    thrift_struct.write(TBinaryProtocol.TBinaryProtocol(transport))
+    return transport.getvalue()
+
+class Handler(object):
+    def __init__(self):
+        self.killed = []
+
+    def getComputationSlug(self, computation_name):
+        raise BoltError(reason='No computation named: ' + computation_name)
+
+    def killTask(self, task_id):
+        self.killed.append(task_id)
+
+class FakeScheduler(object):
+    """ Scheduler on a local port that only speaks 'protocol'"""
+    def __init__(self, protocol):
+        self.protocol = protocol
+        self.handler = Handler()
+        self.connections = 0
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(5)
+        self.port = self.sock.getsockname()[1]
+        thread = threading.Thread(target=self.serve)
+        thread.daemon = True
+        thread.start()
+
+    def serve(self):
+        processor = BoltSchedulerService.Processor(self.handler)
+        while True:
+            conn, _ = self.sock.accept()
+            self.connections += 1
+            trans = TSocket.TSocket()
+            trans.handle = conn
+            trans = TTransport.TFramedTransport(trans)
+            proto = self.protocol(trans)
+            try:
+                while True:
+                    processor.process(proto, proto)
+            except Exception:
+                # Garbage or end of the connection
+                pass
+            conn.close()
+
+class TestThriftUtils(unittest.TestCase):
+
+    def setUp(self):
+        with open(test_filepath('test_topology_metadata')) as data_file:
+            self.data = data_file.read()
+
+    def test_accelerated_when_available(self):
+        protocol = binary_protocol(TTransport.TMemoryBuffer())
+        if thrift_utils.fastbinary is not None:
+            self.assertIsInstance(protocol,
+                                  TBinaryProtocol.TBinaryProtocolAccelerated)
+
+    def test_same_bytes_either_way(self):
+        meta = TopologyMetadata()
+        bytes_to_thrift(self.data, meta)
+        plain = TopologyMetadata()
+        plain.read(TBinaryProtocol.TBinaryProtocol(
+            TTransport.TMemoryBuffer(self.data)))
+        self.assertEqual(meta, plain)
+        self.assertEqual(thrift_to_bytes(meta), plain_bytes(meta))
+
+    def test_fallback(self):
+        fastbinary = thrift_utils.fastbinary
+        thrift_utils.fastbinary = None
+        try:
+            protocol = binary_protocol(TTransport.TMemoryBuffer())
+            self.assertIs(protocol.__class__, TBinaryProtocol.TBinaryProtocol)
+            meta = TopologyMetadata()
+            bytes_to_thrift(self.data, meta)
+            self.assertEqual(thrift_to_bytes(meta), plain_bytes(meta))
+        finally:
+            thrift_utils.fastbinary = fastbinary
+
+    def test_protocols(self):
+        (protocol, _) = tproto('127.0.0.1', 1, 'binary')
+        self.assertIs(protocol.__class__, TBinaryProtocol.TBinaryProtocol)
+        (protocol, _) = tproto('127.0.0.1', 1, 'compact')
+        self.assertIsInstance(protocol, TCompactProtocol.TCompactProtocol)
+        self.assertRaises(ValueError, tproto, '127.0.0.1', 1, 'json')
+
+    def test_probe(self):
+        binary = FakeScheduler(TBinaryProtocol.TBinaryProtocol)
+        compact = FakeScheduler(TCompactProtocol.TCompactProtocol)
+        self.assertTrue(probe_protocol('127.0.0.1', binary.port, 'binary'))
+        self.assertFalse(probe_protocol('127.0.0.1', binary.port, 'compact'))
+        self.assertTrue(probe_protocol('127.0.0.1', compact.port, 'compact'))
+
+    def test_negotiate(self):
+        for server, expected in [
+                (FakeScheduler(TBinaryProtocol.TBinaryProtocol), 'accelerated'),
+                (FakeScheduler(TCompactProtocol.TCompactProtocol), 'compact')]:
+            cli = get_sched_service_client('127.0.0.1', server.port,
+                                           protocol='auto')
+            cli.killTask('task-1')
+            self.assertEqual(server.handler.killed, ['task-1'])
+            cli._oprot.trans.close()
+            # Probed once, the answer is remembered
+            connections = server.connections
+            self.assertEqual(negotiate_protocol('127.0.0.1', server.port),
+                             expected)
+            self.assertEqual(server.connections, connections)
+
+if __name__ == '__main__':
+    unittest.main()
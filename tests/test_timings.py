@@ -0,0 +1,43 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from concord.timings import DeployTimings
+
+class TestTimings(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dirname = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dirname)
+
+    def test_phases(self):
+        timings = DeployTimings('word-counter')
+        with timings.phase('collect_files'):
+            pass
+        with timings.phase('deploy_rpc') as entry:
+            entry['bytes'] = 1024
+        timings.record('compress', 0.5, 2048)
+        timings.info['scheduler'] = '127.0.0.1:11219'
+
+        summary = json.loads(timings.to_json())
+        self.assertEqual(summary['computation'], 'word-counter')
+        self.assertEqual(summary['scheduler'], '127.0.0.1:11219')
+        self.assertEqual([p['phase'] for p in summary['phases']],
+                         ['collect_files', 'deploy_rpc', 'compress'])
+        self.assertNotIn('bytes', summary['phases'][0])
+        self.assertEqual(summary['phases'][1]['bytes'], 1024)
+        self.assertEqual(summary['phases'][2]['seconds'], 0.5)
+
+    def test_history(self):
+        path = os.path.join(self.temp_dirname, 'history.jsonl')
+        for name in ['a', 'b']:
+            DeployTimings(name).append_history(path)
+        with open(path) as history:
+            lines = [json.loads(l) for l in history]
+        self.assertEqual([l['computation'] for l in lines], ['a', 'b'])
+
+if __name__ == '__main__':
+    unittest.main()
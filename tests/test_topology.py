@@ -0,0 +1,97 @@
+import os
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from concord.topology import *
+from concord.deploy import parse_nodes
+from testing_utilities import *
+
+class StubParser:
+    def error(self, error_string):
+        raise RuntimeError(error_string)
+
+def node(name, istreams=[], ostreams=[]):
+    return TopologyNode(name, None, None, istreams, ostreams)
+
+class TestTopology(unittest.TestCase):
+
+    def setUp(self):
+        # source -> split -> count -> sink, source -> audit
+        self.topology = Topology([
+            node('source', [], ['lines']),
+            node('split', ['lines'], ['words']),
+            node('count', ['words'], ['counts']),
+            node('sink', ['counts', 'external']),
+            node('audit', ['lines'])])
+
+    def test_levels(self):
+        self.assertEqual(self.topology.levels(),
+                         [['audit', 'sink'], ['count'], ['split'], ['source']])
+
+    def test_cycle(self):
+        topology = Topology([node('a', ['z'], ['x']), node('b', ['x'], ['y']),
+                             node('c', ['y'], ['z']), node('d', ['x'])])
+        self.assertEqual(topology.find_cycle(), ['a', 'b', 'c', 'a'])
+        self.assertRaises(TopologyError, topology.levels)
+        self.assertEqual(self.topology.find_cycle(), None)
+
+    def test_duplicate_names(self):
+        self.assertRaises(TopologyError, Topology, [node('a'), node('a')])
+
+    def test_run_order(self):
+        order = []
+        lock = threading.Lock()
+        def deploy(n):
+            with lock:
+                order.append(n.name)
+            return n.name
+        results = self.topology.run(deploy, 3)
+        self.assertEqual(sorted(results), sorted(self.topology.by_name))
+        for name, consumers in self.topology.consumers.items():
+            for consumer in consumers:
+                self.assertLess(order.index(consumer), order.index(name))
+
+    def test_run_skips_upstream_of_failure(self):
+        def deploy(n):
+            if n.name == 'count':
+                raise ValueError('boom')
+            return n.name
+        results = self.topology.run(deploy, 2)
+        self.assertEqual(results['sink'], ('sink', None))
+        self.assertEqual(results['audit'], ('audit', None))
+        self.assertIsInstance(results['count'][1], ValueError)
+        self.assertIsInstance(results['split'][1], SkippedDeploy)
+        self.assertIsInstance(results['source'][1], SkippedDeploy)
+
+    def test_parse_topology_manifest(self):
+        temp_dirname = tempfile.mkdtemp()
+        try:
+            create_temporary_file(temp_dirname + '/source/config.json')
+            with open(temp_dirname + '/source/config.json', 'w') as f:
+                json.dump({ 'computation_name': 'source',
+                            'executable_name': 'run',
+                            'compress_files': ['run'] }, f)
+            with open(temp_dirname + '/topology.json', 'w') as f:
+                json.dump({ 'zookeeper_hosts': 'localhost:2181',
+                            'zookeeper_path': '/concord',
+                            'computations': [
+                                { 'manifest': 'source/config.json',
+                                  'ostreams': ['words'] },
+                                { 'computation_name': 'counter',
+                                  'executable_name': 'counter',
+                                  'compress_files': ['counter'],
+                                  'istreams': ['words'] }]}, f)
+            nodes = parse_nodes(temp_dirname + '/topology.json', StubParser())
+            self.assertEqual([n.name for n in nodes], ['source', 'counter'])
+            self.assertEqual(nodes[0].config,
+                             temp_dirname + '/source/config.json')
+            self.assertEqual(nodes[0].request['zookeeper_path'], '/concord')
+            self.assertEqual(nodes[1].config, temp_dirname + '/topology.json')
+            self.assertEqual(Topology(nodes).levels(), [['counter'], ['source']])
+        finally:
+            shutil.rmtree(temp_dirname)
+
+if __name__ == '__main__':
+    unittest.main()
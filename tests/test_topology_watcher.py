@@ -0,0 +1,116 @@
+import copy
+import unittest
+from concord import topology_watcher
+from concord.topology_watcher import *
+from concord.internal.thrift.ttypes import *
+from concord.thrift_utils import bytes_to_thrift, thrift_to_bytes
+from concord.lazy_metadata import decode_metadata
+from kazoo.protocol.states import ZnodeStat
+from testing_utilities import *
+
+def make_stat(mzxid):
+    return ZnodeStat(1, mzxid, 0, 0, mzxid, 0, 0, 0, 0, 0, 1)
+
+class FakeDataWatch(object):
+    def __init__(self, zk, path, func):
+        self.func = func
+        FakeDataWatch.last = self
+
+class TestTopologyWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.patched = (topology_watcher.DataWatch, topology_watcher.zk_session)
+        topology_watcher.DataWatch = FakeDataWatch
+        topology_watcher.zk_session = lambda hosts: None
+        with open(test_filepath('test_topology_metadata')) as data_file:
+            self.data = data_file.read()
+        self.meta = TopologyMetadata()
+        bytes_to_thrift(self.data, self.meta)
+
+    def tearDown(self):
+        topology_watcher.DataWatch, topology_watcher.zk_session = self.patched
+
+    def test_diff(self):
+        name, layout = self.meta.computations.items()[0]
+        grown = copy.deepcopy(self.meta)
+        extra = copy.deepcopy(layout.nodes[0])
+        extra.taskId = 'new-task'
+        grown.computations[name].nodes.append(extra)
+        grown.computations['other'] = PhysicalComputationLayout(name='other',
+                                                                nodes=[])
+        diff = TopologyDiff(self.meta, grown)
+        self.assertEqual(diff.added_computations, ['other'])
+        self.assertEqual(diff.added_tasks, { 'new-task': name })
+        self.assertFalse(diff.removed_tasks)
+        diff = TopologyDiff(grown, None)
+        self.assertEqual(len(diff.removed_tasks), len(layout.nodes) + 1)
+        self.assertFalse(TopologyDiff(self.meta, self.meta))
+
+    def test_decodes_on_change(self):
+        calls = []
+        watcher = TopologyWatcher('zk:2181', '/concord',
+                                  lambda meta, diff: calls.append(diff))
+        FakeDataWatch.last.func(self.data, make_stat(5))
+        self.assertEqual(watcher.wait(0), self.meta)
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(calls[0].added_computations)
+        # Same znode version, e.g. after a reconnect
+        FakeDataWatch.last.func(self.data, make_stat(5))
+        self.assertEqual(len(calls), 1)
+        changed = copy.deepcopy(self.meta)
+        changed.computations = {}
+        FakeDataWatch.last.func(thrift_to_bytes(changed), make_stat(6))
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(calls[1].removed_computations)
+        FakeDataWatch.last.func(None, None)
+        self.assertIsNone(watcher.wait(0))
+        watcher.stop()
+        self.assertFalse(FakeDataWatch.last.func(self.data, make_stat(7)))
+
+    def test_decode(self):
+        decoded = []
+        def decode(data):
+            decoded.append(data)
+            return self.meta
+        watcher = TopologyWatcher('zk:2181', '/concord', decode=decode)
+        FakeDataWatch.last.func(self.data, make_stat(5))
+        self.assertEqual(decoded, [self.data])
+        self.assertEqual(watcher.wait(0), self.meta)
+        ids = watcher.task_ids()
+        self.assertEqual(len(ids), sum(len(layout.nodes) for layout in
+                                       self.meta.computations.itervalues()))
+        FakeDataWatch.last.func(None, None)
+        self.assertEqual(watcher.task_ids(), {})
+
+    def test_diff_skips_unchanged_layouts(self):
+        name, layout = self.meta.computations.items()[0]
+        two = copy.deepcopy(self.meta)
+        other = copy.deepcopy(layout)
+        other.name = 'other'
+        for node in other.nodes:
+            node.taskId = 'other-' + node.taskId
+        two.computations['other'] = other
+        grown = copy.deepcopy(two)
+        extra = copy.deepcopy(other.nodes[0])
+        extra.taskId = 'other-new'
+        grown.computations['other'].nodes.append(extra)
+
+        old = decode_metadata(thrift_to_bytes(two))
+        new = decode_metadata(thrift_to_bytes(grown))
+        diff = TopologyDiff(old, new)
+        self.assertEqual(diff.added_tasks, { 'other-new': 'other' })
+        self.assertFalse(diff.removed_tasks)
+        # Same bytes, the nodes were never decoded
+        self.assertIsNotNone(old.computations[name].encoded())
+        self.assertIsNotNone(new.computations[name].encoded())
+        self.assertIsNone(new.computations['other'].encoded())
+        # Nothing decoded until the tasks are asked for
+        old = decode_metadata(thrift_to_bytes(two))
+        diff = TopologyDiff(old, decode_metadata(thrift_to_bytes(two)))
+        self.assertEqual(diff.added_computations, [])
+        self.assertIsNotNone(old.computations['other'].encoded())
+        self.assertFalse(diff)
+        self.assertIsNotNone(old.computations['other'].encoded())
+
+if __name__ == '__main__':
+    unittest.main()
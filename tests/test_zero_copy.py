@@ -0,0 +1,103 @@
+import os
+import shutil
+import tempfile
+import unittest
+from concord.internal.thrift import BoltSchedulerService
+from concord.internal.thrift.BoltSchedulerService import deployComputation_result
+from concord.internal.thrift.ttypes import *
+from concord.slug import Slug
+from concord.zero_copy import *
+from thrift.Thrift import TMessageType
+from thrift.protocol import TBinaryProtocol, TCompactProtocol
+from thrift.transport import TSocket, TTransport
+
+def as_bytes(data):
+    return data.tobytes() if isinstance(data, memoryview) else str(data)
+
+class RecordingSocket(object):
+    def __init__(self):
+        self.sent = []
+
+    def sendall(self, data):
+        self.sent.append(as_bytes(data))
+
+def framed_reply(protocol_class):
+    buf = TTransport.TMemoryBuffer()
+    framed = TTransport.TFramedTransport(buf)
+    protocol = protocol_class(framed)
+    protocol.writeMessageBegin('deployComputation', TMessageType.REPLY, 0)
+    deployComputation_result().write(protocol)
+    protocol.writeMessageEnd()
+    framed.flush()
+    return buf.getvalue()
+
+def client(protocol_class):
+    """ A client writing to a recorded socket and reading a canned reply"""
+    sock = TSocket.TSocket()
+    sock.handle = RecordingSocket()
+    oprot = protocol_class(TTransport.TFramedTransport(sock))
+    iprot = protocol_class(TTransport.TFramedTransport(
+        TTransport.TMemoryBuffer(framed_reply(protocol_class))))
+    return (BoltSchedulerService.Client(iprot, oprot), sock)
+
+def expected_bytes(protocol_class, req):
+    buf = TTransport.TMemoryBuffer()
+    cli = BoltSchedulerService.Client(
+        protocol_class(TTransport.TFramedTransport(buf)))
+    cli.send_deployComputation(req)
+    return buf.getvalue()
+
+class TestZeroCopy(unittest.TestCase):
+
+    def setUp(self):
+        self.req = BoltComputationRequest(name='word-counter', instances=2,
+                                          executorArgs=['--slug_digest=x'],
+                                          taskHelper=ExecutorTaskInfoHelper(
+                                              execName='run'))
+        self.contents = ''.join(chr(i % 251) for i in xrange(300000))
+        self.temp_dirname = tempfile.mkdtemp()
+        path = os.path.join(self.temp_dirname, 'slug')
+        with open(path, 'wb') as f:
+            f.write(self.contents)
+        self.slug = Slug(open(path, 'rb'), len(self.contents), 0)
+
+    def tearDown(self):
+        self.slug.close()
+        shutil.rmtree(self.temp_dirname)
+
+    def check_protocol(self, protocol_class):
+        cli, sock = client(protocol_class)
+        self.assertTrue(can_stream(cli, sock))
+        deploy_computation(cli, self.req, self.slug, chunk_size=4096,
+                           sock=sock)
+        self.assertIsNone(self.req.slug)
+        self.assertTrue(max(map(len, sock.handle.sent[1:-1])) <= 4096)
+        self.req.slug = self.contents
+        self.assertEqual(''.join(sock.handle.sent),
+                         expected_bytes(protocol_class, self.req))
+
+    def test_binary(self):
+        self.check_protocol(TBinaryProtocol.TBinaryProtocol)
+
+    def test_compact(self):
+        self.check_protocol(TCompactProtocol.TCompactProtocol)
+
+    def test_in_memory_slug(self):
+        slug = Slug(tempfile.SpooledTemporaryFile(max_size=1 << 30),
+                    len(self.contents), 0)
+        slug.fileobj.write(self.contents)
+        self.assertEqual(''.join(map(as_bytes, slug.chunks(1000))), self.contents)
+        self.assertEqual(''.join(map(as_bytes, self.slug.chunks(1000))),
+                         self.contents)
+        slug.close()
+
+    def test_fallback(self):
+        buf = TTransport.TMemoryBuffer()
+        cli = BoltSchedulerService.Client(
+            TBinaryProtocol.TBinaryProtocol(buf))
+        self.assertFalse(can_stream(cli, None))
+        # A socket given for a client that is not framed
+        self.assertFalse(can_stream(cli, TSocket.TSocket()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from concord import zk_utils
+from concord.zk_utils import ZookeeperSessions
+
+class FakeKazooClient(object):
+    started = []
+
+    def __init__(self, hosts):
+        self.hosts = hosts
+        self.stopped = False
+
+    def start(self):
+        FakeKazooClient.started.append(self.hosts)
+
+    def stop(self):
+        self.stopped = True
+
+    def close(self):
+        pass
+
+class TestZookeeperSessions(unittest.TestCase):
+
+    def setUp(self):
+        self.kazoo = zk_utils.KazooClient
+        zk_utils.KazooClient = FakeKazooClient
+        FakeKazooClient.started = []
+
+    def tearDown(self):
+        zk_utils.KazooClient = self.kazoo
+
+    def test_one_session_per_hosts(self):
+        sessions = ZookeeperSessions()
+        first = sessions.get('a:2181')
+        self.assertIs(sessions.get('a:2181'), first)
+        self.assertIsNot(sessions.get('b:2181'), first)
+        self.assertEqual(FakeKazooClient.started, ['a:2181', 'b:2181'])
+        self.assertEqual(sessions.reuses, { 'a:2181': 1, 'b:2181': 0 })
+        sessions.close()
+        self.assertTrue(first.stopped)
+        sessions.get('a:2181')
+        self.assertEqual(len(FakeKazooClient.started), 3)
+
+if __name__ == '__main__':
+    unittest.main()